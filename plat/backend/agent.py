@@ -0,0 +1,110 @@
+import os
+import logging
+import threading
+import subprocess
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# google.generativeai is slow to import, so it is loaded and configured on the first agent request
+genai = None
+_genai_lock = threading.Lock()
+
+def get_genai():
+    """Returns the configured generative AI module, importing it on first use."""
+    global genai
+    with _genai_lock:
+        if genai is None:
+            api_key = os.getenv("GOOGLE_API_KEY")
+            if not api_key:
+                raise HTTPException(status_code=503, detail="GOOGLE_API_KEY not found in .env file or is empty")
+            import google.generativeai as generativeai
+            generativeai.configure(api_key=api_key)
+            genai = generativeai
+    return genai
+
+class ChatRequest(BaseModel):
+    prompt: str
+    model: Optional[str] = 'gemini-pro'
+
+@router.get("/models")
+async def list_agent_models():
+    # The first call imports the client, so keep it off the event loop
+    genai = await run_in_threadpool(get_genai)
+    try:
+        # Filter models that support the 'generateContent' method
+        models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+        # We only want the user-friendly name (e.g., 'gemini-pro') not 'models/gemini-pro'
+        cleaned_models = [name.replace('models/', '') for name in models]
+        return {"models": cleaned_models}
+    except Exception as e:
+        logger.error(f"Error listing models: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Failed to retrieve models.")
+
+def run_aws_command(command: str) -> str:
+    """Executes an AWS CLI command and returns the output."""
+    try:
+        # Security Note: In a real-world scenario, you'd want to sanitize this command string.
+        # For this demo, we'll assume the commands are safe.
+        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.stdout
+    except subprocess.CalledProcessError as e:
+        return f"Error executing command: {e}\nStderr: {e.stderr}"
+
+def run_gcp_command(command: str) -> str:
+    """Executes a GCP CLI (gcloud) command and returns the output."""
+    try:
+        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        return result.stdout
+    except subprocess.CalledProcessError as e:
+        return f"Error executing command: {e}\nStderr: {e.stderr}"
+
+@router.post("/chat")
+async def agent_chat(request: ChatRequest):
+    # The first call imports the client, so keep it off the event loop
+    genai = await run_in_threadpool(get_genai)
+    try:
+        model_name = request.model if request.model else 'gemini-pro'
+        
+        # Define the tools the model can use. The library inspects the function signature.
+        tools = [run_aws_command, run_gcp_command]
+        model = genai.GenerativeModel(model_name=model_name, tools=tools)
+        
+        # Start a chat session
+        chat = model.start_chat()
+        response = chat.send_message(request.prompt)
+
+        # Handle tool calls from the model
+        while response.parts and response.parts[0].function_call:
+            function_call = response.parts[0].function_call
+            
+            available_tools = {
+                "run_aws_command": run_aws_command,
+                "run_gcp_command": run_gcp_command
+            }
+            
+            function_name = function_call.name
+            tool_function = available_tools.get(function_name)
+
+            if tool_function:
+                function_args = {key: value for key, value in function_call.args.items()}
+                tool_output = tool_function(**function_args)
+                
+                # Send the tool's output back to the model in the correct format
+                response = chat.send_message(
+                    [dict(function_response=dict(name=function_name, response={"output": tool_output}))]
+                )
+            else:
+                response = chat.send_message(
+                    [dict(function_response=dict(name=function_name, response={"error": f"Tool '{function_name}' not found."}))]
+                )
+
+        return {"response": response.text}
+    except Exception as e:
+        logger.error(f"Error in /api/agent/chat: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
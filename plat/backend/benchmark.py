@@ -0,0 +1,242 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import warnings
+from datetime import datetime
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+import split_data
+from simulate_heartbeats import generate_heartbeat_stream
+
+# Timed runs repeat the same request, so the result cache is off to measure the actual computation
+os.environ.setdefault("QUERY_CACHE_SIZE", "0")
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCALES = [10_000, 1_000_000, 10_000_000]
+DATA_END = datetime(2025, 7, 1)
+DATA_DAYS = 540
+SUMMARY_WORDS = np.array("alert config drift bucket policy public access role key rotation logging disabled".split())
+
+
+def generate_tickets(num_records: int, num_app_codes: int = 200, num_config_rules: int = 300, seed: int = 0) -> pd.DataFrame:
+    """Vectorized version of generate_data.py's distribution, fast enough for tens of millions of rows."""
+    rng = np.random.default_rng(seed)
+    app_codes = np.array([f"A{i:04d}" for i in range(num_app_codes)])
+    config_rules = np.array([f"AWS-{i:03d}" for i in range(num_config_rules)])
+
+    csp = np.where(rng.random(num_records) < 0.5, 'AWS', 'GCP')
+    env_choice = rng.choice(['PROD', 'Non Prod', 'Uat', 'Dev', 'Unknown'], num_records)
+    narrow = np.where(env_choice == 'PROD', 'Prod', env_choice)
+    non_prod = env_choice == 'Non Prod'
+    narrow[non_prod] = rng.choice(['Uat', 'Dev', 'Unknown'], int(non_prod.sum()))
+
+    is_aws = csp == 'AWS'
+    created = pd.Timestamp(DATA_END, tz='UTC') - pd.to_timedelta(rng.uniform(0, DATA_DAYS * 86400, num_records), unit='s')
+    resolve_delta = pd.to_timedelta(rng.integers(1, 721, num_records), unit='h')
+    words = SUMMARY_WORDS[rng.integers(0, len(SUMMARY_WORDS), (num_records, 4))]
+    summary = words[:, 0]
+    for i in range(1, words.shape[1]):
+        summary = np.char.add(np.char.add(summary, ' '), words[:, i])
+
+    return pd.DataFrame({
+        'CSP': csp,
+        'Environment': env_choice,
+        'NarrowEnvironment': narrow,
+        'AlertType': rng.choice(['Alert', 'System', 'GuardDuty'], num_records),
+        'Priority': rng.choice(['High', 'Medium', 'Low', 'unknown'], num_records),
+        'Key': np.char.add('CSD-', np.arange(10000, 10000 + num_records).astype(str)),
+        'AppCode': app_codes[rng.integers(0, num_app_codes, num_records)],
+        'ConfigRule': np.where(is_aws, config_rules[rng.integers(0, num_config_rules, num_records)], 'Unknown'),
+        'Summary': summary,
+        'Account': np.where(is_aws, rng.integers(10**11, 10**12 - 1, num_records).astype(str), 'Unknown'),
+        'tCreated': created,
+        'tResolved': created + resolve_delta,
+        'TimeToResolve': resolve_delta.astype(str),
+    })
+
+
+def write_dataset(directory: str, num_records: int, store: str, seed: int):
+    """Writes the CSVs (and partitions or SQLite file for the other stores) the backend loads on startup."""
+    tickets = generate_tickets(num_records, seed=seed)
+    for csp in ['AWS', 'GCP']:
+        tickets[tickets['CSP'] == csp].to_csv(os.path.join(directory, f'{csp.lower()}_ticket_data.csv'), index=False)
+
+    for csp in ['AWS', 'GCP']:
+        heartbeats = generate_heartbeat_stream(
+            csp, num_rules=20, interval_seconds=7200, duration_seconds=180 * 86400,
+            start=DATA_END - pd.Timedelta(days=180), seed=seed,
+        )
+        heartbeats.to_csv(os.path.join(directory, f'{csp.lower()}_heartbeat_ticket_data.csv'), index=False)
+
+    if store in ('partitioned', 'sqlite'):
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            if store == 'partitioned':
+                split_data.partition_ticket_data()
+            else:
+                split_data.build_ticket_database()
+        finally:
+            os.chdir(cwd)
+    return tickets
+
+
+def build_scenarios(tickets: pd.DataFrame, page_size: int = 25) -> List[Tuple[str, str]]:
+    """Requests exercised at every scale, parameterized from the generated data."""
+    year = int(tickets['tCreated'].dt.year.max())
+    top_codes = tickets.loc[tickets['CSP'] == 'AWS', 'AppCode'].value_counts().index[:5]
+    app_codes = ','.join(top_codes)
+    deep_page = max(len(tickets) // page_size - 1, 1)
+    return [
+        ('tickets_first_page', f'/api/tickets?page=1&size={page_size}'),
+        ('tickets_sorted_filtered', f'/api/tickets?page=3&size={page_size}&sort_by=Summary&sort_order=desc&Priority=high&year={year}'),
+        ('tickets_deep_page', f'/api/tickets?page={deep_page}&size={page_size}&sort_by=tCreated&sort_order=asc'),
+        ('tickets_filter_options', '/api/tickets-filter-options'),
+        ('environment_summary_all', '/api/environment-summary'),
+        ('environment_summary_year', f'/api/environment-summary?year={year}&environment=Non%20Prod'),
+        ('report_ticket_count', f'/api/reports/ticket-count-by-appcode?year={year}&csp=AWS'),
+        ('report_total_count', f'/api/reports/total-ticket-count-by-appcode?year={year}&csp=AWS'),
+        ('report_control_count', f'/api/reports/control-count-by-appcode?year={year}&csp=AWS'),
+        ('report_heatmap', f'/api/reports/heatmap?year={year}&csp=AWS'),
+        ('trends_monthly', f'/api/appcode-trends?year={year}&csp=AWS&app_codes={app_codes}'),
+        ('trends_daily', f'/api/appcode-trends-daily?year={year}&month=3&csp=AWS&app_codes={app_codes}'),
+        ('trends_configrule', f'/api/appcode-configrule-trends?year={year}&csp=AWS&app_codes={app_codes}'),
+        ('heartbeat_status', f'/api/heartbeat-status?csp=aws&year={year}'),
+        ('heartbeat_configrule', f'/api/configrule-heartbeat?csp=aws&start_date={year}-01-01&end_date={year}-03-31'),
+        ('csv_export', f'/api/download_tickets?sortField=tCreated&sortOrder=asc&global_year={year}&filters=Priority:high'),
+    ]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3)
+
+
+def run_scale(num_records: int, store: str, repeat: int, seed: int) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    import main
+
+    with tempfile.TemporaryDirectory(prefix='ticket-bench-') as directory:
+        print(f"Generating {num_records} tickets ({store} store)...")
+        tickets = write_dataset(directory, num_records, store, seed)
+        scenarios = build_scenarios(tickets)
+        del tickets
+
+        cwd = os.getcwd()
+        os.chdir(directory)
+        main.TICKET_STORE = store
+        try:
+            start = time.perf_counter()
+            with TestClient(main.app) as client:
+                listening_seconds = time.perf_counter() - start
+                while client.get('/readyz').status_code != 200:
+                    time.sleep(0.05)
+                startup_seconds = time.perf_counter() - start
+                results = {}
+                for name, url in scenarios:
+                    client.get(url).raise_for_status()  # warm-up
+                    latencies = []
+                    for _ in range(repeat):
+                        t0 = time.perf_counter()
+                        response = client.get(url)
+                        latencies.append((time.perf_counter() - t0) * 1000)
+                    # One extra traced run for peak memory, kept out of the latency numbers
+                    tracemalloc.start()
+                    client.get(url)
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                    results[name] = {
+                        "p50_ms": _percentile(latencies, 50),
+                        "p95_ms": _percentile(latencies, 95),
+                        "p99_ms": _percentile(latencies, 99),
+                        "mean_ms": round(float(np.mean(latencies)), 3),
+                        "peak_mb": round(peak / 1e6, 2),
+                        "response_bytes": len(response.content),
+                    }
+                    print(f"  {name:28s} p50 {results[name]['p50_ms']:10.2f} ms  "
+                          f"p99 {results[name]['p99_ms']:10.2f} ms  peak {results[name]['peak_mb']:9.2f} MB")
+        finally:
+            os.chdir(cwd)
+
+    return {
+        "rows": num_records,
+        "store": store,
+        "listening_seconds": round(listening_seconds, 3),
+        "startup_seconds": round(startup_seconds, 3),
+        "scenarios": results,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Lists every metric that got worse than the baseline by more than `tolerance` (a fraction)."""
+    regressions = []
+    for scale, current in results.items():
+        base = baseline.get(scale)
+        if not base:
+            continue
+        if current["startup_seconds"] > base["startup_seconds"] * (1 + tolerance):
+            regressions.append(f"{scale} startup: {base['startup_seconds']}s -> {current['startup_seconds']}s")
+        for name, metrics in current["scenarios"].items():
+            base_metrics = base["scenarios"].get(name)
+            if not base_metrics:
+                continue
+            for key in ("p50_ms", "p95_ms", "peak_mb"):
+                if metrics[key] > base_metrics[key] * (1 + tolerance):
+                    regressions.append(f"{scale} {name} {key}: {base_metrics[key]} -> {metrics[key]}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend endpoints in-process on synthetic data.")
+    parser.add_argument('--scales', type=int, nargs='+', default=DEFAULT_SCALES, help="Ticket counts to benchmark.")
+    parser.add_argument('--store', default='csv', choices=['csv', 'partitioned', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=20, help="Timed requests per scenario.")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', default=os.path.join(BACKEND_DIR, 'benchmark_baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed slowdown before flagging, e.g. 0.2 = 20%%.")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    sys.path.insert(0, BACKEND_DIR)
+    results = {}
+    for scale in args.scales:
+        results[f"{args.store}:{scale}"] = run_scale(scale, args.store, args.repeat, args.seed)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline updated at {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline to create one.")
+        return
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("Regressions against baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
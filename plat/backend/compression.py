@@ -0,0 +1,243 @@
+import os
+import time
+import zlib
+import hashlib
+from contextvars import ContextVar
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+import metrics
+
+# brotli and zstandard are optional; without them responses are only ever gzip-compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Responses smaller than this are sent as they are
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+# Bodies at least this large are compressed in the threadpool instead of on the event loop
+COMPRESSION_THREADPOOL_BYTES = int(os.getenv("COMPRESSION_THREADPOOL_BYTES", "262144"))
+
+_COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml', 'image/svg+xml')
+
+COMPRESSED_RESPONSES = metrics.Counter(
+    'compression_responses_total',
+    'Compressed responses by encoding and source: compressed, precompressed (bytes reused from the query cache) or streamed.',
+    ['encoding', 'source'],
+)
+BYTES_IN = metrics.Counter('compression_bytes_in_total', 'Response bytes before compression.', ['encoding'])
+BYTES_OUT = metrics.Counter('compression_bytes_out_total', 'Response bytes after compression.', ['encoding'])
+BYTES_SAVED = metrics.Counter('compression_bytes_saved_total', 'Response bytes saved by compression.', ['encoding'])
+CPU_SECONDS = metrics.Counter('compression_cpu_seconds_total', 'CPU time spent compressing responses.', ['encoding'])
+
+
+def _gzip_stream():
+    compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _brotli_stream():
+    compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+    return compressor.process, compressor.finish
+
+
+def _zstd_stream():
+    compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+    return compressor.compress, compressor.flush
+
+
+# Content-Encoding -> factory of a (compress chunk, finish) pair, most preferred first
+CODECS: Dict[str, Callable[[], Tuple[Callable[[bytes], bytes], Callable[[], bytes]]]] = {}
+if zstandard is not None:
+    CODECS['zstd'] = _zstd_stream
+if brotli is not None:
+    CODECS['br'] = _brotli_stream
+CODECS['gzip'] = _gzip_stream
+
+# Per-request slot through which query_cache hands over the cache entry a response was built from
+_cache_slot: ContextVar[Optional[Dict[str, Any]]] = ContextVar('compression_cache_slot', default=None)
+
+
+def attach_cache_entry(entry: Dict[str, Any]):
+    """Marks the current response as built from a query cache entry, so its compressed bytes are kept there."""
+    slot = _cache_slot.get()
+    if slot is not None:
+        slot['entry'] = entry
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The supported encoding the client accepts with the highest q-value, ties going to CODECS order."""
+    accepted = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name.strip():
+            accepted[name.strip().lower()] = q
+    wildcard = accepted.get('*', 0.0)
+    best, best_q = None, 0.0
+    for name in CODECS:
+        q = accepted.get(name, wildcard)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+def compress(encoding: str, body: bytes) -> Tuple[bytes, float]:
+    """The compressed body and the CPU seconds it took."""
+    start = time.thread_time()
+    compress_chunk, finish = CODECS[encoding]()
+    data = compress_chunk(body) + finish()
+    return data, time.thread_time() - start
+
+
+def _digest(body: bytes) -> bytes:
+    return hashlib.blake2b(body, digest_size=16).digest()
+
+
+def _compressible(status: int, headers: Headers) -> bool:
+    content_type = headers.get('content-type', '')
+    return (status not in (204, 304) and 'content-encoding' not in headers and 'content-range' not in headers
+            and content_type.startswith(_COMPRESSIBLE_TYPES) and not content_type.startswith('text/event-stream'))
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses with the best encoding the client accepts (zstd, br or gzip). Whole
+    responses under COMPRESSION_MIN_BYTES are left alone; streamed ones are compressed chunk by chunk,
+    except server-sent events. Compressed bytes of query-cached results are stored in the cache
+    entry, keyed by a digest of the body they were made from, so repeat hits skip recompression
+    without the entry also holding the uncompressed body.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get('accept-encoding', ''))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        slot: Dict[str, Any] = {}
+        token = _cache_slot.set(slot)
+        try:
+            await self.app(scope, receive, _CompressingSender(encoding, slot, send).send)
+        finally:
+            _cache_slot.reset(token)
+
+
+class _CompressingSender:
+    def __init__(self, encoding: str, slot: Dict[str, Any], send):
+        self.encoding = encoding
+        self.slot = slot
+        self._send = send
+        self.start: Optional[Dict[str, Any]] = None
+        # None until the first body message decides: 'whole', 'stream' or 'passthrough'
+        self.mode: Optional[str] = None
+        self.stream = None
+        self.streamed_in = self.streamed_out = 0
+
+    async def send(self, message):
+        if message['type'] == 'http.response.start':
+            self.start = message
+            return
+        if message['type'] != 'http.response.body' or self.mode == 'passthrough':
+            await self._send(message)
+            return
+
+        body = message.get('body', b'')
+        more_body = message.get('more_body', False)
+        if self.mode == 'stream':
+            await self._send_chunk(body, more_body)
+            return
+
+        headers = MutableHeaders(raw=self.start['headers'])
+        if not _compressible(self.start['status'], headers) or (not more_body and len(body) < COMPRESSION_MIN_BYTES):
+            self.mode = 'passthrough'
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        headers.add_vary_header('Accept-Encoding')
+        if more_body:
+            self.mode = 'stream'
+            self.stream = CODECS[self.encoding]()
+            headers['Content-Encoding'] = self.encoding
+            del headers['Content-Length']
+            COMPRESSED_RESPONSES.inc(self.encoding, 'streamed')
+            await self._send(self.start)
+            await self._send_chunk(body, more_body)
+            return
+
+        self.mode = 'whole'
+        data = await self._compress_whole(body)
+        if data is None:
+            await self._send(self.start)
+            await self._send(message)
+            return
+        headers['Content-Encoding'] = self.encoding
+        headers['Content-Length'] = str(len(data))
+        await self._send(self.start)
+        await self._send({'type': 'http.response.body', 'body': data})
+
+    async def _compress_whole(self, body: bytes) -> Optional[bytes]:
+        """The compressed body, reused from the cache entry when possible; None if it would not be smaller."""
+        entry = self.slot.get('entry')
+        encoded = entry.setdefault('encoded', {}) if entry is not None else None
+        digest = _digest(body) if encoded is not None else None
+        if encoded is not None and encoded.get('digest') == digest and self.encoding in encoded:
+            data = encoded[self.encoding]
+            COMPRESSED_RESPONSES.inc(self.encoding, 'precompressed')
+        else:
+            if len(body) >= COMPRESSION_THREADPOOL_BYTES:
+                data, cpu_seconds = await run_in_threadpool(compress, self.encoding, body)
+            else:
+                data, cpu_seconds = compress(self.encoding, body)
+            CPU_SECONDS.inc(self.encoding, amount=cpu_seconds)
+            if len(data) >= len(body):
+                return None
+            if encoded is not None:
+                if encoded.get('digest') != digest:
+                    encoded.clear()
+                    encoded['digest'] = digest
+                encoded[self.encoding] = data
+            COMPRESSED_RESPONSES.inc(self.encoding, 'compressed')
+        BYTES_IN.inc(self.encoding, amount=len(body))
+        BYTES_OUT.inc(self.encoding, amount=len(data))
+        BYTES_SAVED.inc(self.encoding, amount=len(body) - len(data))
+        return data
+
+    async def _send_chunk(self, body: bytes, more_body: bool):
+        compress_chunk, finish = self.stream
+        start = time.thread_time()
+        data = compress_chunk(body)
+        if not more_body:
+            data += finish()
+        CPU_SECONDS.inc(self.encoding, amount=time.thread_time() - start)
+        BYTES_IN.inc(self.encoding, amount=len(body))
+        BYTES_OUT.inc(self.encoding, amount=len(data))
+        self.streamed_in += len(body)
+        self.streamed_out += len(data)
+        if not more_body:
+            # Chunks can come out larger than they went in; only the whole stream's saving is counted
+            BYTES_SAVED.inc(self.encoding, amount=max(self.streamed_in - self.streamed_out, 0))
+        await self._send({'type': 'http.response.body', 'body': data, 'more_body': more_body})
@@ -0,0 +1,361 @@
+import re
+import copy
+import html
+import math
+import heapq
+import threading
+from collections import Counter
+from html.parser import HTMLParser
+from typing import Optional, List, Dict, Any
+
+from fastapi import APIRouter, HTTPException, Query
+
+router = APIRouter()
+
+# Mock Confluence Data
+confluence_page_tree = [
+    {
+        "id": "1",
+        "text": "Project Alpha",
+        "items": [
+            {"id": "11", "text": "Overview"},
+            {"id": "12", "text": "Requirements"},
+            {
+                "id": "13",
+                "text": "Design",
+                "items": [
+                    {"id": "131", "text": "API Design"},
+                    {"id": "132", "text": "Database Schema"},
+                ],
+            },
+        ],
+    },
+    {
+        "id": "2",
+        "text": "Onboarding Guide",
+        "items": [
+            {"id": "21", "text": "First Steps"},
+            {"id": "22", "text": "Development Setup"},
+        ],
+    },
+]
+
+confluence_pages = {
+    "11": "<h1>Project Alpha Overview</h1><p>This is the overview page for Project Alpha.</p><h2>Goals</h2><p>Our goal is to build the best dashboard ever.</p>",
+    "12": "<h1>Requirements</h1><p>The requirements are extensive.</p><h2>Functional</h2><ul><li>Must do X</li><li>Must do Y</li></ul>",
+    "131": "<h1>API Design</h1><p>The API is RESTful.</p><h2>Endpoints</h2><h3>GET /api/tickets</h3><p>Returns a list of tickets.</p>",
+    "132": "<h1>Database Schema</h1><p>We use PostgreSQL.</p><h2>Tables</h2><h3>Users</h3><p>Stores user information.</p>",
+    "21": "<h1>First Steps</h1><p>Welcome to the team!</p><h2>Account Setup</h2><p>Please create your accounts.</p>",
+    "22": "<h1>Development Setup</h1><p>Clone the repository and run npm install.</p><h2>Prerequisites</h2><p>You will need Node.js and Python.</p>",
+}
+
+# BM25 parameters; a title match counts as TITLE_WEIGHT body matches
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 3
+SNIPPET_WORDS = 30
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token.lower() for token in _TOKEN.findall(text)]
+
+
+class _TextExtractor(HTMLParser):
+    _BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "tr", "td", "th", "table", "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style"):
+            self._skip += 1
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style"):
+            self._skip = max(self._skip - 1, 0)
+        elif tag in self._BLOCK_TAGS:
+            self.parts.append(" ")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(content: str) -> str:
+    """The visible text of an HTML page, with block elements separated by whitespace."""
+    extractor = _TextExtractor()
+    extractor.feed(content)
+    extractor.close()
+    return re.sub(r"\s+", " ", "".join(extractor.parts)).strip()
+
+
+class SearchIndex:
+    """
+    Inverted index over page titles and bodies with BM25 ranking. Pages are added, replaced and
+    removed one at a time, touching only the postings of their own terms, so keeping the index in
+    step with a changing space never needs a rebuild. A query only reads the postings of its terms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    def upsert(self, page_id: str, title: str, content: str):
+        """Indexes a page, replacing its previous version if any."""
+        text = html_to_text(content)
+        frequencies = Counter({term: TITLE_WEIGHT * count for term, count in Counter(tokenize(title)).items()})
+        frequencies.update(tokenize(text))
+        length = sum(frequencies.values())
+        with self._lock:
+            self._remove(page_id)
+            for term, count in frequencies.items():
+                self._postings.setdefault(term, {})[page_id] = count
+            self._docs[page_id] = {"title": title, "text": text, "terms": list(frequencies), "length": length}
+            self._total_length += length
+
+    def remove(self, page_id: str):
+        with self._lock:
+            self._remove(page_id)
+
+    def _remove(self, page_id: str):
+        doc = self._docs.pop(page_id, None)
+        if doc is None:
+            return
+        for term in doc["terms"]:
+            postings = self._postings[term]
+            del postings[page_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= doc["length"]
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Dict[str, Any]:
+        """Pages matching any query term, best BM25 score first, with a highlighted snippet each."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        with self._lock:
+            num_docs = len(self._docs)
+            if not terms or not num_docs:
+                return {"total": 0, "results": []}
+            average_length = self._total_length / num_docs
+            scores: Dict[str, float] = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for page_id, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._docs[page_id]["length"] / average_length)
+                    scores[page_id] = scores.get(page_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            ranked = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))[offset:]
+            docs = [(page_id, score, self._docs[page_id]) for page_id, score in ranked]
+
+        results = [
+            {
+                "id": page_id,
+                "title": doc["title"],
+                "score": round(score, 4),
+                "title_highlighted": highlight(doc["title"], set(terms)),
+                "snippet": snippet(doc["text"], set(terms)),
+            }
+            for page_id, score, doc in docs
+        ]
+        return {"total": len(scores), "results": results}
+
+
+def highlight(text: str, terms: set) -> str:
+    """HTML-escaped text with every query term wrapped in <mark>."""
+    return _highlight(text, list(_TOKEN.finditer(text)), terms, 0, len(text))
+
+
+def _highlight(text: str, tokens: List[re.Match], terms: set, start: int, end: int) -> str:
+    parts, position = [], start
+    for token in tokens:
+        if token.start() < start or token.end() > end:
+            continue
+        if token.group().lower() in terms:
+            parts.append(html.escape(text[position:token.start()]))
+            parts.append(f"<mark>{html.escape(token.group())}</mark>")
+            position = token.end()
+    parts.append(html.escape(text[position:end]))
+    return "".join(parts)
+
+
+def snippet(text: str, terms: set) -> str:
+    """The SNIPPET_WORDS-word window of the body with the most query term matches, highlighted."""
+    tokens = list(_TOKEN.finditer(text))
+    if not tokens:
+        return ""
+    hits = [1 if token.group().lower() in terms else 0 for token in tokens]
+    window = min(SNIPPET_WORDS, len(tokens))
+    best_start, best_hits, current = 0, sum(hits[:window]), sum(hits[:window])
+    for start in range(1, len(tokens) - window + 1):
+        current += hits[start + window - 1] - hits[start - 1]
+        if current > best_hits:
+            best_start, best_hits = start, current
+    first, last = tokens[best_start], tokens[best_start + window - 1]
+    start = 0 if best_start == 0 else first.start()
+    end = len(text) if best_start + window == len(tokens) else last.end()
+    result = _highlight(text, tokens, terms, start, end)
+    return ("…" if start else "") + result + ("…" if end < len(text) else "")
+
+
+def _walk(nodes: List[Dict[str, Any]], parent: Optional[Dict[str, Any]] = None):
+    for node in nodes:
+        yield node, parent
+        yield from _walk(node.get("items", []), node)
+
+
+_tree_lock = threading.Lock()
+# page id -> (tree node, parent node or None), kept in step with confluence_page_tree
+_nodes: Dict[str, tuple] = {}
+index = SearchIndex()
+
+
+def _rebuild_nodes():
+    _nodes.clear()
+    for node, parent in _walk(confluence_page_tree):
+        _nodes[node["id"]] = (node, parent)
+
+
+def _index_page(page_id: str):
+    node, _ = _nodes[page_id]
+    index.upsert(page_id, node["text"], confluence_pages.get(page_id, ""))
+
+
+def build_index():
+    """Indexes every page of the tree; pages without content (sections) are found by title."""
+    with _tree_lock:
+        _rebuild_nodes()
+        for page_id in _nodes:
+            _index_page(page_id)
+
+
+def _path(page_id: str) -> List[str]:
+    path = []
+    node, parent = _nodes[page_id]
+    while parent is not None:
+        path.append(parent["text"])
+        parent = _nodes[parent["id"]][1]
+    return path[::-1]
+
+
+def _attach(node: Dict[str, Any], parent_id: Optional[str]):
+    """Appends `node` under `parent_id`, or at the top level."""
+    if parent_id is None:
+        confluence_page_tree.append(node)
+        _nodes[node["id"]] = (node, None)
+    elif parent_id in _nodes:
+        parent = _nodes[parent_id][0]
+        parent.setdefault("items", []).append(node)
+        _nodes[node["id"]] = (node, parent)
+    else:
+        raise KeyError(f"Parent page '{parent_id}' not found.")
+
+
+def _detach(page_id: str) -> Dict[str, Any]:
+    """Takes a page (with its subtree) out of its parent's items and returns its node."""
+    node, parent = _nodes[page_id]
+    siblings = parent["items"] if parent is not None else confluence_page_tree
+    siblings.remove(node)
+    if parent is not None and not siblings:
+        del parent["items"]
+    return node
+
+
+def _lazy(nodes: List[Dict[str, Any]], depth: int) -> List[Dict[str, Any]]:
+    result = []
+    for node in nodes:
+        children = node.get("items", [])
+        item = {"id": node["id"], "text": node["text"], "has_children": bool(children)}
+        if children and depth > 1:
+            item["items"] = _lazy(children, depth - 1)
+        result.append(item)
+    return result
+
+
+build_index()
+
+
+
+def upsert_page(page_id: str, html_content: str, title: Optional[str] = None, parent_id: Optional[str] = None) -> int:
+    """
+    Creates or replaces a page (e.g. from the mirror sync) and reindexes just that page; returns the
+    number of indexed pages. A new page goes under `parent_id`, or at the top level; an existing one
+    is moved, with its subtree, when `parent_id` names a different parent. Not exposed over HTTP:
+    the content is served as HTML as it is.
+    """
+    with _tree_lock:
+        if page_id in _nodes:
+            node, parent = _nodes[page_id]
+            if parent_id is not None and parent_id != (parent["id"] if parent is not None else None):
+                if parent_id not in _nodes:
+                    raise KeyError(f"Parent page '{parent_id}' not found.")
+                if any(descendant["id"] == parent_id for descendant, _ in _walk([node])):
+                    raise ValueError(f"Cannot move page '{page_id}' under its own subtree.")
+                _attach(_detach(page_id), parent_id)
+            if title:
+                node["text"] = title
+        else:
+            _attach({"id": page_id, "text": title or page_id}, parent_id)
+        confluence_pages[page_id] = html_content
+        _index_page(page_id)
+        return len(index)
+
+
+def remove_page(page_id: str) -> List[str]:
+    """Removes a page and its subtree from the tree and the index; returns the removed page ids."""
+    with _tree_lock:
+        if page_id not in _nodes:
+            raise KeyError(f"Page '{page_id}' not found.")
+        node = _detach(page_id)
+        removed = [descendant["id"] for descendant, _ in _walk([node])]
+        for removed_id in removed:
+            confluence_pages.pop(removed_id, None)
+            index.remove(removed_id)
+            del _nodes[removed_id]
+        return removed
+
+@router.get("/page-tree")
+async def get_confluence_page_tree(parent_id: Optional[str] = None, depth: Optional[int] = Query(None, ge=1)):
+    """
+    The page hierarchy. Without parameters the whole tree; with `parent_id` and/or `depth` only the
+    children of `parent_id` (the top level by default) down to `depth` levels (1 by default), each
+    node flagged with has_children so the sidebar can fetch a subtree when it is expanded.
+    """
+    with _tree_lock:
+        if parent_id is None and depth is None:
+            # A copy, so serializing it cannot race with a concurrent upsert_page or remove_page
+            return copy.deepcopy(confluence_page_tree)
+        if parent_id is None:
+            nodes = confluence_page_tree
+        elif parent_id in _nodes:
+            nodes = _nodes[parent_id][0].get("items", [])
+        else:
+            raise HTTPException(status_code=404, detail=f"Page '{parent_id}' not found.")
+        return _lazy(nodes, depth or 1)
+
+
+@router.get("/page/{page_id}")
+async def get_confluence_page(page_id: str):
+    return {"html_content": confluence_pages.get(page_id, "<h1>Page Not Found</h1>")}
+
+
+@router.get("/search")
+def search_confluence(q: str, limit: int = Query(10, ge=1, le=100), offset: int = Query(0, ge=0)):
+    """Full-text search over page titles and bodies, ranked by BM25, with highlighted snippets."""
+    result = index.search(q, limit, offset)
+    with _tree_lock:
+        for item in result["results"]:
+            item["path"] = _path(item["id"]) if item["id"] in _nodes else []
+    return {"query": q, **result}
+
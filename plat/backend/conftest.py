@@ -0,0 +1,28 @@
+import os
+import sys
+import time
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+# Keep test runs from writing the query log into the working tree or warming from it
+os.environ.setdefault("QUERY_LOG_PATH", os.path.join(tempfile.mkdtemp(), "query_log.json"))
+
+
+@pytest.fixture(scope="module")
+def client():
+    """A TestClient over the app with the bundled CSV data loaded."""
+    from fastapi.testclient import TestClient
+    import main
+
+    cwd = os.getcwd()
+    os.chdir(BACKEND_DIR)
+    try:
+        with TestClient(main.app) as test_client:
+            while test_client.get("/readyz").status_code != 200:
+                time.sleep(0.05)
+            yield test_client
+    finally:
+        os.chdir(cwd)
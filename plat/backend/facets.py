@@ -0,0 +1,135 @@
+import re
+import logging
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Columns with a dictionary-encoded facet; the first five are the ones the filter dropdowns show
+FACET_COLUMNS = ["Priority", "CSP", "AppCode", "Environment", "NarrowEnvironment", "AlertType", "ConfigRule"]
+FILTER_OPTION_COLUMNS = FACET_COLUMNS[:5]
+# Facets with at most this many distinct values keep one packed bitmap per value; larger ones
+# (AppCode, ConfigRule) are filtered and counted from their codes instead to bound memory
+BITMAP_MAX_VALUES = 64
+
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+def _popcount(bits: np.ndarray) -> int:
+    if hasattr(np, 'bitwise_count'):
+        return int(np.bitwise_count(bits).sum(dtype=np.int64))
+    return int(_POPCOUNT_TABLE[bits].sum())
+
+
+def _matches(pattern: str, value: Any) -> bool:
+    """Same test as Series.str.contains(pattern, case=False, na=False) for a single value."""
+    return isinstance(value, str) and re.search(pattern, value, flags=re.IGNORECASE) is not None
+
+
+class _Facet:
+    def __init__(self, column: pd.Series, num_rows: int):
+        codes, uniques = pd.factorize(column, use_na_sentinel=True)
+        # Values are ordered by their string form, which is how the dropdowns list them
+        order = sorted(range(len(uniques)), key=lambda i: str(uniques[i]))
+        remap = np.empty(len(uniques) + 1, dtype=np.int32)
+        remap[np.array(order, dtype=np.int64)] = np.arange(len(order), dtype=np.int32)
+        remap[-1] = -1
+        self.values = [uniques[i] for i in order]
+        self.codes = remap[codes]
+        self.totals = np.bincount(self.codes[self.codes >= 0], minlength=len(self.values))
+        self.bitmaps = None
+        if len(self.values) <= BITMAP_MAX_VALUES:
+            self.bitmaps = [np.packbits(self.codes == code) for code in range(len(self.values))]
+        self.num_rows = num_rows
+
+    def select(self, codes: List[int]) -> np.ndarray:
+        """Packed bitmap of the rows holding any of the given value codes."""
+        if self.bitmaps is not None:
+            selected = np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+            for code in codes:
+                selected |= self.bitmaps[code]
+            return selected
+        return np.packbits(np.isin(self.codes, codes))
+
+    def counts(self, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Count per value among the rows set in the packed bitmap (all rows when None)."""
+        if rows is None:
+            return self.totals
+        if self.bitmaps is not None:
+            return np.array([_popcount(rows & bitmap) for bitmap in self.bitmaps], dtype=np.int64)
+        codes = self.codes[np.unpackbits(rows, count=self.num_rows).view(bool)]
+        return np.bincount(codes[codes >= 0], minlength=len(self.values))
+
+
+class FacetIndex:
+    """
+    Distinct values and counts per facet column, precomputed once when the tickets are loaded.
+    Counts under the global filters and the table's column filters are computed by intersecting packed
+    row bitmaps, so a filter dropdown only lists values still reachable without rescanning the frame.
+    Like multi-select facets elsewhere, a column's own filter is left out when counting that column.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.num_rows = len(df)
+        self._frame = df
+        self._facets = {column: _Facet(df[column], self.num_rows) for column in FACET_COLUMNS if column in df.columns}
+        self._years = _Facet(df['tCreated'].dt.year, self.num_rows)
+
+    def _exact(self, facet: _Facet, value: Any) -> np.ndarray:
+        return facet.select([code for code, v in enumerate(facet.values) if v == value])
+
+    def _contains(self, column: str, pattern: str) -> np.ndarray:
+        facet = self._facets.get(column)
+        if facet is not None:
+            return facet.select([code for code, v in enumerate(facet.values) if _matches(pattern, v)])
+        # Free-text columns (Key, Summary, Account) have no facet; only these are scanned
+        values = self._frame[column]
+        if values.dtype != object and not pd.api.types.is_string_dtype(values):
+            return np.zeros((self.num_rows + 7) // 8, dtype=np.uint8)
+        return np.packbits(values.str.contains(pattern, case=False, na=False).to_numpy(dtype=bool))
+
+    @staticmethod
+    def _intersect(bitmaps: List[np.ndarray]) -> Optional[np.ndarray]:
+        if not bitmaps:
+            return None
+        rows = bitmaps[0].copy()
+        for bitmap in bitmaps[1:]:
+            rows &= bitmap
+        return rows
+
+    def counts(
+        self,
+        year: Optional[int] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+        contains: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Returns {"total_count": n, "facets": {column: [{"value", "count"}, ...]}} for the tickets matching
+        the filters; values with no matching ticket are left out.
+        """
+        global_filters = []
+        if year:
+            global_filters.append(self._exact(self._years, year))
+        if environment and environment != 'All':
+            global_filters.append(self._exact(self._facets['Environment'], environment))
+        if narrow_environment and narrow_environment != 'All':
+            global_filters.append(self._exact(self._facets['NarrowEnvironment'], narrow_environment))
+        column_filters = {column: self._contains(column, pattern) for column, pattern in (contains or {}).items()}
+
+        all_rows = self._intersect(global_filters + list(column_filters.values()))
+        total = self.num_rows if all_rows is None else _popcount(all_rows)
+        facets = {}
+        for column, facet in self._facets.items():
+            if column in column_filters:
+                rows = self._intersect(global_filters + [b for c, b in column_filters.items() if c != column])
+            else:
+                rows = all_rows
+            counts = facet.counts(rows)
+            facets[column] = [
+                {"value": str(value), "count": int(count)}
+                for value, count in zip(facet.values, counts) if count
+            ]
+        return {"total_count": total, "facets": facets}
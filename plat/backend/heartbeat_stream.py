@@ -0,0 +1,174 @@
+import os
+import json
+import asyncio
+import threading
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+
+# A subscriber too slow to keep up has its pending deltas merged; past this many distinct
+# (csp, rule, date) keys they are dropped and the subscriber is sent a fresh snapshot instead
+HEARTBEAT_STREAM_MAX_PENDING = int(os.getenv("HEARTBEAT_STREAM_MAX_PENDING", "5000"))
+HEARTBEAT_STREAM_KEEPALIVE_SECONDS = float(os.getenv("HEARTBEAT_STREAM_KEEPALIVE_SECONDS", "15"))
+
+SUBSCRIBERS = metrics.Gauge('heartbeat_stream_subscribers', 'Connected live heartbeat subscribers.')
+EVENTS_PUBLISHED = metrics.Counter('heartbeat_stream_events_total', 'Heartbeat tickets published to subscribers.')
+RESYNCS = metrics.Counter('heartbeat_stream_resyncs_total', 'Snapshots re-sent to subscribers that fell too far behind.')
+
+# (csp, config rule, date, environment, narrow environment) -> [success, failed]
+DeltaKey = Tuple[str, str, str, str, str]
+
+
+def heartbeat_deltas(batch: pd.DataFrame) -> Dict[DeltaKey, List[int]]:
+    """Success/failure counts per key for a batch of heartbeat tickets, classified like /api/heartbeat-status."""
+    if batch.empty:
+        return {}
+    frame = pd.DataFrame({
+        'csp': batch['CSP'].astype(str).str.lower(),
+        'rule': batch['ConfigRule'].astype(str),
+        'date': batch['tCreated'].dt.strftime('%Y-%m-%d'),
+        'environment': batch['Environment'].astype(str) if 'Environment' in batch else '',
+        'narrow': batch['NarrowEnvironment'].astype(str) if 'NarrowEnvironment' in batch else '',
+        'success': batch['Summary'].astype(str).str.contains('Success', regex=False).astype(int),
+    })
+    frame['failed'] = 1 - frame['success']
+    grouped = frame.groupby(['csp', 'rule', 'date', 'environment', 'narrow'])[['success', 'failed']].sum()
+    return {key: [int(success), int(failed)] for key, (success, failed) in zip(grouped.index, grouped.to_numpy())}
+
+
+class Subscription:
+    """
+    One connected client: its filters, how to compute its snapshot, and the deltas merged since it
+    was last sent anything.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        snapshot: Callable[[], Dict[DeltaKey, List[int]]],
+        csp: Optional[str] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+    ):
+        self.loop = loop
+        self.snapshot = snapshot
+        self.csp = csp.lower() if csp else None
+        self.environment = environment if environment and environment != 'All' else None
+        self.narrow_environment = narrow_environment if narrow_environment and narrow_environment != 'All' else None
+        self.pending: Dict[Tuple[str, str, str], List[int]] = {}
+        self.resync = False
+        self.seq = 0
+        self.ready = asyncio.Event()
+
+    def matches(self, key: DeltaKey) -> bool:
+        csp, _, _, environment, narrow = key
+        return ((self.csp is None or csp == self.csp)
+                and (self.environment is None or environment == self.environment)
+                and (self.narrow_environment is None or narrow == self.narrow_environment))
+
+    def offer(self, deltas: Dict[DeltaKey, List[int]], seq: int):
+        """Merges a published delta into the pending one; called with the broadcaster lock held."""
+        changed = False
+        for key, (success, failed) in deltas.items():
+            if not self.matches(key):
+                continue
+            counts = self.pending.setdefault(key[:3], [0, 0])
+            counts[0] += success
+            counts[1] += failed
+            changed = True
+        if not changed:
+            return
+        self.seq = seq
+        if len(self.pending) > HEARTBEAT_STREAM_MAX_PENDING:
+            self.pending.clear()
+            self.resync = True
+        self.loop.call_soon_threadsafe(self.ready.set)
+
+
+def _rows(counts: Dict[Tuple[str, str, str], List[int]]) -> List[Dict[str, Any]]:
+    return [
+        {"csp": csp, "config_rule": rule, "date": date, "success": success, "failed": failed}
+        for (csp, rule, date), (success, failed) in sorted(counts.items())
+    ]
+
+
+class HeartbeatBroadcaster:
+    """
+    Fans heartbeat deltas out to live subscribers. Each ingested batch is aggregated once
+    (heartbeat_deltas) and merged into every matching subscriber's pending delta, so the cost is
+    O(new events) per batch and a slow client's backlog is bounded by distinct keys, not events.
+    Appending to the heartbeat data and publishing happen under one lock with snapshots, so a
+    subscriber's snapshot plus the deltas after it always add up to the current data.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = 0
+        self._subscriptions: List[Subscription] = []
+
+    def publish(self, deltas: Dict[DeltaKey, List[int]]):
+        """Publishes a batch's deltas; call with `lock` held, right after appending the batch."""
+        if not deltas:
+            return
+        self.seq += 1
+        EVENTS_PUBLISHED.inc(amount=sum(success + failed for success, failed in deltas.values()))
+        for subscription in self._subscriptions:
+            subscription.offer(deltas, self.seq)
+
+    def subscribe(self, subscription: Subscription) -> Dict[str, Any]:
+        """Registers a subscriber and returns its initial snapshot event. Blocking: run it in the threadpool."""
+        with self.lock:
+            self._subscriptions.append(subscription)
+            SUBSCRIBERS.set(value=len(self._subscriptions))
+            return self._snapshot_event(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+            SUBSCRIBERS.set(value=len(self._subscriptions))
+
+    def _snapshot_event(self, subscription: Subscription) -> Dict[str, Any]:
+        counts: Dict[Tuple[str, str, str], List[int]] = {}
+        for key, (success, failed) in subscription.snapshot().items():
+            if subscription.matches(key):
+                merged = counts.setdefault(key[:3], [0, 0])
+                merged[0] += success
+                merged[1] += failed
+        subscription.pending.clear()
+        subscription.resync = False
+        subscription.seq = self.seq
+        return {"type": "snapshot", "seq": self.seq, "counts": _rows(counts)}
+
+    def _take(self, subscription: Subscription) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if subscription.resync:
+                RESYNCS.inc()
+                return self._snapshot_event(subscription)
+            pending, subscription.pending = subscription.pending, {}
+            seq = subscription.seq
+        if not pending:
+            return None
+        return {"type": "delta", "seq": seq, "counts": _rows(pending)}
+
+    async def next_event(self, subscription: Subscription) -> Optional[Dict[str, Any]]:
+        """The next event for a subscriber, or None if nothing arrived within the keep-alive interval."""
+        try:
+            await asyncio.wait_for(subscription.ready.wait(), HEARTBEAT_STREAM_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            return None
+        subscription.ready.clear()
+        # A resync recomputes the snapshot, so keep it off the event loop
+        return await run_in_threadpool(self._take, subscription)
+
+
+def sse_format(event: Optional[Dict[str, Any]]) -> str:
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"event: {event['type']}\nid: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+
+
+broadcaster = HeartbeatBroadcaster()
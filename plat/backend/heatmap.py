@@ -0,0 +1,129 @@
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Label of the bucket that collects every row/column outside the top N
+OTHER_LABEL = "(other)"
+ENCODINGS = ('dense', 'coo')
+
+
+def _top_n(counts: pd.DataFrame, column: str, n: Optional[int]) -> Tuple[pd.DataFrame, List[Any]]:
+    """
+    Keeps the n labels of `column` with the largest totals (ties by label) and folds the rest into
+    OTHER_LABEL. Returns the counts and the label order: by total when limited, by label otherwise.
+    """
+    totals = counts.groupby(column)['count'].sum()
+    if n is None or n >= len(totals):
+        return counts, sorted(totals.index.tolist())
+    ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    kept = [label for label, _ in ranked[:n]]
+    counts = counts.assign(**{column: counts[column].where(counts[column].isin(kept), OTHER_LABEL)})
+    return counts, kept + [OTHER_LABEL]
+
+
+def _tile(
+    counts: pd.DataFrame,
+    row_column: str,
+    column_column: str,
+    values: List[str],
+    top_rows: Optional[int],
+    top_columns: Optional[int],
+    row_offset: int,
+    row_limit: Optional[int],
+    column_offset: int,
+    column_limit: Optional[int],
+) -> Tuple[pd.DataFrame, List[Any], List[Any], int, int]:
+    """
+    The non-zero cells of one tile of the top-N reduced matrix as (row, column, *values) with
+    tile-relative codes and the values summed per cell, its row and column labels, and the full
+    matrix's row and column counts.
+    """
+    counts = counts[[row_column, column_column] + values]
+    counts, row_labels = _top_n(counts, row_column, top_rows)
+    counts, column_labels = _top_n(counts, column_column, top_columns)
+
+    rows_window = row_labels[row_offset:row_offset + row_limit if row_limit is not None else None]
+    columns_window = column_labels[column_offset:column_offset + column_limit if column_limit is not None else None]
+
+    # -1 for labels outside the window
+    row_codes = pd.Index(rows_window).get_indexer(counts[row_column])
+    column_codes = pd.Index(columns_window).get_indexer(counts[column_column])
+    inside = (row_codes >= 0) & (column_codes >= 0)
+    tile = pd.DataFrame({'row': row_codes[inside], 'column': column_codes[inside],
+                         **{value: counts[value].to_numpy()[inside] for value in values}})
+    tile = tile.groupby(['row', 'column'], sort=True)[values].sum().reset_index()
+    tile = tile[tile['count'] != 0]
+    return tile, rows_window, columns_window, len(row_labels), len(column_labels)
+
+
+def matrix_view(
+    counts: pd.DataFrame,
+    row_column: str,
+    column_column: str,
+    encoding: str = 'dense',
+    top_rows: Optional[int] = None,
+    top_columns: Optional[int] = None,
+    row_offset: int = 0,
+    row_limit: Optional[int] = None,
+    column_offset: int = 0,
+    column_limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Shapes long-form (row, column, count) counts into one tile of a (possibly top-N reduced) matrix,
+    dense or as COO triplets, without materializing the full dense pivot. Tile coordinates in
+    "coo" are relative to the tile's own row and column labels.
+    """
+    tile, rows_window, columns_window, total_rows, total_columns = _tile(
+        counts, row_column, column_column, ['count'], top_rows, top_columns, row_offset, row_limit, column_offset, column_limit,
+    )
+
+    result = {
+        "encoding": encoding,
+        "rows": [str(label) for label in rows_window],
+        "columns": [str(label) for label in columns_window],
+        "total_rows": total_rows,
+        "total_columns": total_columns,
+        "row_offset": row_offset,
+        "column_offset": column_offset,
+    }
+    if encoding == 'coo':
+        result["coo"] = {
+            "row": tile['row'].tolist(),
+            "column": tile['column'].tolist(),
+            "value": tile['count'].astype(int).tolist(),
+        }
+    else:
+        dense = np.zeros((len(rows_window), len(columns_window)), dtype=np.int64)
+        dense[tile['row'].to_numpy(), tile['column'].to_numpy()] = tile['count'].to_numpy()
+        result["data"] = dense.tolist()
+    return result
+
+
+def tile_counts(
+    counts: pd.DataFrame,
+    row_column: str,
+    column_column: str,
+    top_rows: Optional[int] = None,
+    top_columns: Optional[int] = None,
+    row_offset: int = 0,
+    row_limit: Optional[int] = None,
+    column_offset: int = 0,
+    column_limit: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    The long-form counts of just the cells matrix_view returns for the same options, with every
+    numeric column (e.g. confidence bounds) summed into OTHER_LABEL cells like the counts.
+    """
+    values = [column for column in counts.columns
+              if column not in (row_column, column_column) and pd.api.types.is_numeric_dtype(counts[column])]
+    tile, rows_window, columns_window, _, _ = _tile(
+        counts, row_column, column_column, values, top_rows, top_columns, row_offset, row_limit, column_offset, column_limit,
+    )
+    result = pd.DataFrame({
+        row_column: [str(rows_window[code]) for code in tile['row']],
+        column_column: [str(columns_window[code]) for code in tile['column']],
+        **{value: tile[value].to_numpy() for value in values},
+    })
+    result.attrs = dict(counts.attrs)
+    return result
@@ -0,0 +1,291 @@
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from types import SimpleNamespace
+from collections import defaultdict
+from urllib.parse import urlsplit
+from typing import List, Dict, Any, Tuple, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds the fake model takes per message; read by the server process, set by the harness
+FAKE_MODEL_LATENCY = float(os.getenv("LOADTEST_FAKE_MODEL_LATENCY", "0.2"))
+
+
+class _FakeResponse:
+    def __init__(self, text: str):
+        self.parts = []
+        self.text = text
+
+
+class _FakeChat:
+    def send_message(self, message):
+        # Blocks like the real (synchronous) client does
+        time.sleep(FAKE_MODEL_LATENCY)
+        return _FakeResponse(f"Fake answer to: {str(message)[:80]}")
+
+
+class _FakeModel:
+    def __init__(self, model_name: str, tools=None):
+        self.model_name = model_name
+
+    def start_chat(self):
+        return _FakeChat()
+
+
+fake_genai = SimpleNamespace(
+    configure=lambda **kwargs: None,
+    list_models=lambda: [SimpleNamespace(name='models/fake-model', supported_generation_methods=['generateContent'])],
+    GenerativeModel=_FakeModel,
+)
+
+
+def create_app():
+    """uvicorn factory: the real app with the generative model replaced by a local fake."""
+    os.environ.setdefault("GOOGLE_API_KEY", "loadtest")
+    import main
+    import agent
+    agent.genai = fake_genai
+    return main.app
+
+
+# Page loads as the frontend issues them; each entry is (weight, page name, request builder)
+def _dashboard(ctx) -> List[Tuple[str, str, Optional[dict]]]:
+    year = ctx['year']
+    return [
+        ('GET', '/api/tickets-filter-options', None),
+        ('GET', f'/api/environment-summary?year={year}', None),
+        ('GET', f'/api/heartbeat-status?csp=aws&year={year}', None),
+        ('GET', f'/api/heartbeat-status?csp=gcp&year={year}', None),
+        ('GET', f'/api/tickets?page=1&size=25&year={year}', None),
+    ]
+
+
+def _ticket_paging(ctx):
+    year = ctx['year']
+    sort_by = random.choice(['Key', 'tCreated', 'AppCode', 'Priority', 'Summary'])
+    params = f"page={random.randint(1, 40)}&size=25&sort_by={sort_by}&sort_order={random.choice(['asc', 'desc'])}&year={year}"
+    if random.random() < 0.5:
+        params += f"&AppCode={random.choice(ctx['app_codes'])}"
+    if random.random() < 0.3:
+        params += f"&Priority={random.choice(['High', 'Medium', 'Low'])}"
+    if random.random() < 0.3:
+        params += "&global_environment=PROD"
+    return [('GET', f'/api/tickets?{params}', None)]
+
+
+def _reports(ctx):
+    year, csp = ctx['year'], random.choice(['AWS', 'GCP'])
+    env = random.choice(['', '&environment=PROD', '&environment=Non%20Prod'])
+    return [
+        ('GET', f'/api/reports/ticket-count-by-appcode?year={year}&csp={csp}{env}', None),
+        ('GET', f'/api/reports/total-ticket-count-by-appcode?year={year}&csp={csp}{env}', None),
+        ('GET', f'/api/reports/control-count-by-appcode?year={year}&csp={csp}{env}', None),
+        ('GET', f'/api/reports/heatmap?year={year}&csp={csp}{env}', None),
+    ]
+
+
+def _trends(ctx):
+    year = ctx['year']
+    codes = ','.join(random.sample(ctx['app_codes'], min(3, len(ctx['app_codes']))))
+    return [
+        ('GET', f'/api/appcode-trends?year={year}&csp=AWS&app_codes={codes}', None),
+        ('GET', f'/api/appcode-configrule-trends?year={year}&csp=AWS&app_codes={codes}', None),
+        ('GET', f'/api/appcode-trends-daily?year={year}&month={random.randint(1, 6)}&csp=AWS&app_codes={codes}', None),
+    ]
+
+
+def _heartbeat(ctx):
+    return [
+        ('GET', f'/api/configrule-heartbeat?csp={csp}&start_date={ctx["heartbeat_start"]}&end_date={ctx["heartbeat_end"]}', None)
+        for csp in ['aws', 'gcp']
+    ]
+
+
+def _agent_chat(ctx):
+    return [('POST', '/api/agent/chat', {"prompt": "List my S3 buckets", "model": "fake-model"})]
+
+
+PAGE_MIX = [
+    (30, 'dashboard', _dashboard),
+    (30, 'ticket_paging', _ticket_paging),
+    (15, 'reports', _reports),
+    (10, 'trends', _trends),
+    (10, 'heartbeat', _heartbeat),
+    (5, 'agent_chat', _agent_chat),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, ok: bool):
+        self.latencies[route].append(seconds * 1000)
+        if not ok:
+            self.errors[route] += 1
+
+    @staticmethod
+    def _summary(values: List[float], errors: int, duration: float) -> Dict[str, float]:
+        return {
+            "requests": len(values),
+            "errors": errors,
+            "rps": round(len(values) / duration, 2),
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+        }
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        all_values = [v for values in self.latencies.values() for v in values]
+        if not all_values:
+            return {"total": {"requests": 0, "errors": 0, "rps": 0.0}, "routes": {}}
+        return {
+            "total": self._summary(all_values, sum(self.errors.values()), duration),
+            "routes": {
+                route: self._summary(values, self.errors[route], duration)
+                for route, values in sorted(self.latencies.items())
+            },
+        }
+
+
+async def _virtual_user(client: httpx.AsyncClient, ctx: dict, recorder: Recorder, deadline: float, think_time: float):
+    weights = [w for w, _, _ in PAGE_MIX]
+    while time.perf_counter() < deadline:
+        _, _, builder = random.choices(PAGE_MIX, weights=weights)[0]
+
+        async def fire(method, url, body):
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=body)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            recorder.record(urlsplit(url).path, time.perf_counter() - start, ok)
+
+        # Widgets on a page load in parallel, as in the browser
+        await asyncio.gather(*(fire(*request) for request in builder(ctx)))
+        if think_time:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+
+async def run_stage(base_url: str, ctx: dict, concurrency: int, seconds: float, think_time: float) -> Dict[str, Any]:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency * 6, max_keepalive_connections=concurrency * 6)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + seconds
+        await asyncio.gather(*(_virtual_user(client, ctx, recorder, deadline, think_time) for _ in range(concurrency)))
+        duration = time.perf_counter() - start
+    return {"concurrency": concurrency, "duration_seconds": round(duration, 2), **recorder.summary(duration)}
+
+
+def find_saturation(stages: List[Dict[str, Any]], min_gain: float = 0.05, max_error_rate: float = 0.01) -> Optional[int]:
+    """The last concurrency level where adding users still raised throughput without errors piling up."""
+    for previous, current in zip(stages, stages[1:]):
+        total = current["total"]
+        error_rate = total["errors"] / total["requests"] if total["requests"] else 1
+        if error_rate > max_error_rate or total["rps"] < previous["total"]["rps"] * (1 + min_gain):
+            return previous["concurrency"]
+    return None
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    command = [
+        sys.executable, '-m', 'uvicorn', 'loadtest:create_app', '--factory',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning',
+    ]
+    return subprocess.Popen(command, cwd=BACKEND_DIR)
+
+
+def wait_until_ready(base_url: str, timeout: float = 120) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            if httpx.get(f'{base_url}/readyz', timeout=5).status_code == 200:
+                return time.perf_counter() - start
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready within {timeout}s")
+
+
+def build_context(base_url: str, year: int) -> dict:
+    options = httpx.get(f'{base_url}/api/tickets-filter-options', timeout=30).json()
+    return {
+        "year": year,
+        "app_codes": options.get("AppCode") or ['UNKNOWN'],
+        "heartbeat_start": f"{year}-01-01",
+        "heartbeat_end": f"{year}-01-31",
+    }
+
+
+def _print_stage(stage: Dict[str, Any]):
+    total = stage["total"]
+    if not total["requests"]:
+        print(f"  users {stage['concurrency']:4d}: no completed requests")
+        return
+    print(f"  users {stage['concurrency']:4d}: {total['rps']:8.1f} req/s  p50 {total['p50_ms']:8.1f} ms  "
+          f"p95 {total['p95_ms']:8.1f} ms  p99 {total['p99_ms']:8.1f} ms  errors {total['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent dashboard load test against a local uvicorn server.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="uvicorn worker counts to test.")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64],
+                        help="Concurrent virtual users per stage, in increasing order.")
+    parser.add_argument('--stage-seconds', type=float, default=20)
+    parser.add_argument('--think-time', type=float, default=0.0, help="Mean pause between page loads per user.")
+    parser.add_argument('--fake-model-latency', type=float, default=FAKE_MODEL_LATENCY)
+    parser.add_argument('--year', type=int, default=2025)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--output', default='loadtest_results.json')
+    args = parser.parse_args()
+
+    os.environ["LOADTEST_FAKE_MODEL_LATENCY"] = str(args.fake_model_latency)
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = {}
+    for workers in args.workers:
+        print(f"Starting server with {workers} worker(s)...")
+        server = start_server(args.port, workers)
+        try:
+            startup = wait_until_ready(base_url)
+            ctx = build_context(base_url, args.year)
+            stages = []
+            for concurrency in args.concurrency:
+                stage = asyncio.run(run_stage(base_url, ctx, concurrency, args.stage_seconds, args.think_time))
+                stages.append(stage)
+                _print_stage(stage)
+            saturation = find_saturation(stages)
+            peak = max(stages, key=lambda s: s["total"]["rps"])
+            print(f"  saturation at {saturation or 'n/a (still scaling)'} users, peak {peak['total']['rps']} req/s")
+            print(f"  per-route latency at {peak['concurrency']} users:")
+            for route, stats in peak["routes"].items():
+                print(f"    {route:45s} p50 {stats['p50_ms']:8.1f}  p95 {stats['p95_ms']:8.1f}  "
+                      f"p99 {stats['p99_ms']:8.1f} ms  errors {stats['errors']}")
+            results[str(workers)] = {
+                "startup_seconds": round(startup, 2),
+                "saturation_concurrency": saturation,
+                "peak_rps": peak["total"]["rps"],
+                "stages": stages,
+            }
+        finally:
+            server.terminate()
+            server.wait()
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,77 +1,73 @@
 import os
 import json
-import subprocess
+import asyncio
+import time
 import logging
+import threading
 from io import StringIO
 from typing import Optional, List, Dict, Any
 
 import pandas as pd
-import google.generativeai as genai
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, Query, HTTPException, Body, Response
+from fastapi import FastAPI, Query, HTTPException, Body, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
+import agent
 import atc
+import confluence
+import metrics
+import profiling
+import query_cache
+from metrics import MetricsMiddleware
+from compression import CompressionMiddleware
+from ticket_store import PartitionedTicketStore, prepare_tickets
+from ticket_db import SQLiteTicketStore
+from facets import FacetIndex, FACET_COLUMNS, FILTER_OPTION_COLUMNS
+import heatmap
+import heartbeat_stream
+import pyramid
+from pyramid import TrendPyramid
+from sketches import ResolutionSketches, GROUP_COLUMNS as RESOLUTION_GROUP_COLUMNS
+import sampling
+from sampling import StratifiedSample
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Configure the generative AI model with the API key
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY not found in .env file or is empty")
-genai.configure(api_key=api_key)
-
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Mock Confluence Data
-confluence_page_tree = [
-    {
-        "id": "1",
-        "text": "Project Alpha",
-        "items": [
-            {"id": "11", "text": "Overview"},
-            {"id": "12", "text": "Requirements"},
-            {
-                "id": "13",
-                "text": "Design",
-                "items": [
-                    {"id": "131", "text": "API Design"},
-                    {"id": "132", "text": "Database Schema"},
-                ],
-            },
-        ],
-    },
-    {
-        "id": "2",
-        "text": "Onboarding Guide",
-        "items": [
-            {"id": "21", "text": "First Steps"},
-            {"id": "22", "text": "Development Setup"},
-        ],
-    },
-]
-
-confluence_pages = {
-    "11": "<h1>Project Alpha Overview</h1><p>This is the overview page for Project Alpha.</p><h2>Goals</h2><p>Our goal is to build the best dashboard ever.</p>",
-    "12": "<h1>Requirements</h1><p>The requirements are extensive.</p><h2>Functional</h2><ul><li>Must do X</li><li>Must do Y</li></ul>",
-    "131": "<h1>API Design</h1><p>The API is RESTful.</p><h2>Endpoints</h2><h3>GET /api/tickets</h3><p>Returns a list of tickets.</p>",
-    "132": "<h1>Database Schema</h1><p>We use PostgreSQL.</p><h2>Tables</h2><h3>Users</h3><p>Stores user information.</p>",
-    "21": "<h1>First Steps</h1><p>Welcome to the team!</p><h2>Account Setup</h2><p>Please create your accounts.</p>",
-    "22": "<h1>Development Setup</h1><p>Clone the repository and run npm install.</p><h2>Prerequisites</h2><p>You will need Node.js and Python.</p>",
-}
+# Ticket storage: 'csv' loads the flat per-CSP CSVs, 'partitioned' reads CSP/year/month parquet partitions on demand,
+# 'sqlite' keeps tickets in a local SQLite file and pushes filters, counts and pages down into it
+TICKET_STORE = os.getenv("TICKET_STORE", "csv")
+TICKET_PARTITION_DIR = os.getenv("TICKET_PARTITION_DIR", "ticket_partitions")
+TICKET_DB_PATH = os.getenv("TICKET_DB_PATH", "tickets.db")
+TICKET_STORE_MEMORY_MB = int(os.getenv("TICKET_STORE_MEMORY_MB", "512"))
+TICKET_STORE_HOT_YEARS = int(os.getenv("TICKET_STORE_HOT_YEARS", "1"))
 
 app = FastAPI()
 
 # Include the ATC router to make its endpoints available
 app.include_router(atc.router, prefix="/api/atc", tags=["atc"])
+# The agent router imports and configures the generative AI client lazily on its first request
+app.include_router(agent.router, prefix="/api/agent", tags=["agent"])
+# Whitepaper pages with full-text search
+app.include_router(confluence.router, prefix="/api/confluence", tags=["confluence"])
+# Prometheus metrics at /metrics
+app.include_router(metrics.router, tags=["metrics"])
 
 tickets_df = None
+ticket_store = None
+ticket_db = None
+facet_index = None
+resolution_sketches = None
+trend_pyramid = None
+approx_sample = None
 aws_heartbeat_df = None
 gcp_heartbeat_df = None
 
@@ -84,20 +80,38 @@ class EnvironmentSummaryResponse(BaseModel):
     gcp: List[Dict[str, Any]]
     aws_stats: CSPStatistics
     gcp_stats: CSPStatistics
-
-@app.on_event("startup")
-def startup_event():
-    """Load and combine AWS and GCP ticket datasets into memory when the application starts."""
-    global tickets_df
+    # Only set for approx=true
+    approximate: Optional[Dict[str, Any]] = None
+
+# Set once the background load has finished; data-backed routes answer 503 until then
+data_ready = threading.Event()
+
+def load_data():
+    """Load and combine AWS and GCP ticket datasets into memory."""
+    global tickets_df, ticket_store, ticket_db, facet_index, resolution_sketches, trend_pyramid, approx_sample
+    facet_index = None
+    resolution_sketches = None
+    trend_pyramid = None
+    approx_sample = None
     try:
-        aws_df = pd.read_csv('aws_ticket_data.csv')
-        gcp_df = pd.read_csv('gcp_ticket_data.csv')
-        tickets_df = pd.concat([aws_df, gcp_df], ignore_index=True)
-        
-        tickets_df['tCreated'] = pd.to_datetime(tickets_df['tCreated'])
-        tickets_df['tResolved'] = pd.to_datetime(tickets_df['tResolved'], errors='coerce')
-        tickets_df['Priority'] = tickets_df['Priority'].fillna('unknown')
-        print("AWS and GCP ticket data loaded and combined successfully.")
+        if TICKET_STORE == 'sqlite':
+            ticket_db = SQLiteTicketStore(TICKET_DB_PATH)
+            print(f"SQLite ticket store opened at {TICKET_DB_PATH}.")
+        elif TICKET_STORE == 'partitioned':
+            ticket_store = PartitionedTicketStore(
+                TICKET_PARTITION_DIR,
+                memory_budget_bytes=TICKET_STORE_MEMORY_MB * 1024 * 1024,
+                hot_years=TICKET_STORE_HOT_YEARS,
+            )
+            ticket_store.warm()
+            print(f"Partitioned ticket store opened with years {ticket_store.years}.")
+        else:
+            aws_df = pd.read_csv('aws_ticket_data.csv')
+            gcp_df = pd.read_csv('gcp_ticket_data.csv')
+            tickets_df = prepare_tickets(pd.concat([aws_df, gcp_df], ignore_index=True))
+            print("AWS and GCP ticket data loaded and combined successfully.")
+            with metrics.span('facet_index'):
+                facet_index = FacetIndex(tickets_df)
     except FileNotFoundError as e:
         print(f"Error: {e.filename} not found. Starting with an empty DataFrame.")
         tickets_df = pd.DataFrame()
@@ -105,6 +119,21 @@ def startup_event():
         print(f"An error occurred during data loading: {e}")
         tickets_df = pd.DataFrame()
 
+    with metrics.span('sketch_index'):
+        sketches = ResolutionSketches()
+        trends = TrendPyramid()
+        sample = StratifiedSample()
+        for chunk in iter_ticket_chunks():
+            sketches.add(chunk)
+            trends.add(chunk)
+            sample.add(chunk)
+        sketches.finalize()
+        trends.finalize()
+        sample.finalize()
+        resolution_sketches = sketches
+        trend_pyramid = trends
+        approx_sample = sample
+
     global aws_heartbeat_df, gcp_heartbeat_df
     try:
         aws_heartbeat_df = pd.read_csv('aws_heartbeat_ticket_data.csv')
@@ -117,32 +146,240 @@ def startup_event():
         aws_heartbeat_df = pd.DataFrame()
         gcp_heartbeat_df = pd.DataFrame()
 
-def get_data(year: Optional[int] = None, environment: Optional[str] = None, narrow_environment: Optional[str] = None) -> pd.DataFrame:
+    # Results computed from previously loaded data must not be served again
+    query_cache.invalidate()
+
+def _load_data_in_background():
+    start = time.perf_counter()
+    try:
+        load_data()
+    except Exception as e:
+        logger.error(f"Data loading failed: {e}", exc_info=True)
+    finally:
+        data_ready.set()
+    logger.info(f"Data ready after {time.perf_counter() - start:.2f}s")
+    # Precompute the most requested widgets so the first dashboard loads after a (re)load are warm
+    query_cache.warm()
+
+@app.on_event("startup")
+def startup_event():
+    """Start loading the datasets in the background so the server accepts connections immediately."""
+    data_ready.clear()
+    query_cache.load_query_log()
+    query_cache.start_query_log_flusher()
+    threading.Thread(target=_load_data_in_background, name="data-loader", daemon=True).start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    query_cache.stop_query_log_flusher()
+
+# Routes that work without the ticket and heartbeat data
+READINESS_EXEMPT_PREFIXES = (
+    "/api/atc", "/api/agent", "/api/chatbot", "/api/confluence",
+    "/healthz", "/readyz", "/metrics", "/debug", "/docs", "/redoc", "/openapi.json",
+)
+
+class DataReadinessMiddleware:
+    """Answers data-backed routes with a fast 503 until the background data load has finished."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not data_ready.is_set() and not scope["path"].startswith(READINESS_EXEMPT_PREFIXES):
+            response = JSONResponse(
+                status_code=503, content={"detail": "Data is still loading."}, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: data is loaded and its indexes are built."""
+    if not data_ready.is_set():
+        return JSONResponse(status_code=503, content={"status": "loading"})
+    return {"status": "ready"}
+
+def get_tickets_frame(year: Optional[int] = None, csp: Optional[str] = None) -> pd.DataFrame:
     """
-    Helper function to get a copy of the dataframe, filtered by year and environment if provided.
+    Returns the tickets for a year and CSP without copying. With the partitioned store only the matching
+    partitions are read. The result may be shared, so callers must not mutate it.
     """
+    if ticket_db is not None:
+        return ticket_db.frame(year=year, csp=csp)
+    if ticket_store is not None:
+        return ticket_store.load(csps=[csp] if csp else None, years=[year] if year else None)
     if tickets_df is None:
         return pd.DataFrame()
-    df = tickets_df.copy()
+    df = tickets_df
     if year:
         df = df[df['tCreated'].dt.year == year]
+    if csp:
+        df = df[df['CSP'] == csp]
+    return df
+
+def iter_ticket_chunks():
+    """Yields all tickets in memory-friendly chunks (one CSP/year partition or year at a time), for index builds."""
+    if ticket_db is not None:
+        for year in ticket_db.years:
+            yield ticket_db.frame(year=year)
+    elif ticket_store is not None:
+        for csp in ticket_store.csps:
+            for year in ticket_store.years:
+                yield ticket_store.load(csps=[csp], years=[year])
+    elif tickets_df is not None and not tickets_df.empty:
+        yield tickets_df
+
+def filter_tickets(year: Optional[int] = None, environment: Optional[str] = None, narrow_environment: Optional[str] = None, csp: Optional[str] = None) -> pd.DataFrame:
+    """
+    Filters tickets by year, CSP and environment without copying; callers must not mutate the result.
+    """
+    with metrics.span('filter'):
+        if ticket_db is not None:
+            return ticket_db.frame(year=year, environment=environment, narrow_environment=narrow_environment, csp=csp)
+        df = get_tickets_frame(year, csp)
+        if df.empty:
+            return df
 
-    # Apply environment filters only if they are not 'All' or None
-    if environment and environment != 'All':
-        df = df[df['Environment'] == environment]
+        # Apply environment filters only if they are not 'All' or None
+        if environment and environment != 'All':
+            df = df[df['Environment'] == environment]
     
-    if narrow_environment and narrow_environment != 'All':
-        df = df[df['NarrowEnvironment'] == narrow_environment]
+        if narrow_environment and narrow_environment != 'All':
+            df = df[df['NarrowEnvironment'] == narrow_environment]
         
-    return df
+        return df
+
+def get_data(year: Optional[int] = None, environment: Optional[str] = None, narrow_environment: Optional[str] = None, csp: Optional[str] = None) -> pd.DataFrame:
+    """
+    Helper function to get a copy of the dataframe, filtered by year, CSP and environment if provided.
+    """
+    return filter_tickets(year, environment, narrow_environment, csp).copy()
 
-@app.get("/api/confluence/page-tree")
-async def get_confluence_page_tree():
-    return confluence_page_tree
+def contains_mask(values: pd.Series, pattern: str) -> pd.Series:
+    """Series.str.contains(pattern, case=False, na=False), also for columns holding no strings at all."""
+    try:
+        return values.str.contains(pattern, case=False, na=False)
+    except AttributeError:
+        # e.g. an AWS-only slice of Account is all integers; non-string values never match
+        return pd.Series(False, index=values.index)
+
+# Grouping keys derived from tCreated that count_tickets() accepts alongside real columns
+DERIVED_KEY_FORMATS = {'Month': '%Y-%m', 'MonthName': '%b', 'Day': '%Y-%m-%d'}
+
+def count_tickets(
+    by: List[str],
+    year: Optional[int] = None,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    csp: Optional[str] = None,
+    app_codes: Optional[List[str]] = None,
+    month: Optional[int] = None,
+    fillna: Optional[Dict[str, str]] = None,
+    contains: Optional[Dict[str, str]] = None,
+    approx: bool = False,
+) -> pd.DataFrame:
+    """
+    Counts tickets per group, i.e. `groupby(by).size()` as a frame with a 'count' column.
+    `contains` holds the table's column filters (case-insensitive substring per column).
+    With the SQLite store the filtering and grouping run inside the database.
+    With `approx` the counts are estimated from the stratified sample unless they can be answered
+    exactly without a scan, and the frame also has 'count_low'/'count_high' confidence bounds;
+    attrs['method'] says which it was.
+    """
+    derived = [column for column in by if column in pyramid.DERIVED_KEYS]
+    from_pyramid = (trend_pyramid is not None and not contains and len(derived) == 1
+                    and all(column in pyramid.DIMENSIONS for column in by if column not in derived))
+    if approx:
+        if approx_sample is not None and not contains and not from_pyramid:
+            with metrics.span('aggregate'):
+                counts = approx_sample.count(
+                    by, year=year, environment=environment, narrow_environment=narrow_environment,
+                    csp=csp, app_codes=app_codes, month=month, fillna=fillna,
+                )
+            counts.attrs['method'] = 'stratified_sample'
+            return counts
+        counts = count_tickets(by, year, environment, narrow_environment, csp, app_codes, month, fillna, contains)
+        counts = counts.assign(count_low=counts['count'], count_high=counts['count'])
+        counts.attrs['method'] = 'exact'
+        return counts
+
+    if from_pyramid:
+        # Time-bucketed counts come from the precomputed pyramid, whatever the ticket volume
+        with metrics.span('aggregate'):
+            return trend_pyramid.count(
+                by, year=year, environment=environment, narrow_environment=narrow_environment,
+                csp=csp, app_codes=app_codes, month=month, fillna=fillna,
+            )
+
+    if ticket_db is not None:
+        with metrics.span('aggregate'):
+            return ticket_db.count(
+                by, fillna=fillna, year=year, environment=environment, narrow_environment=narrow_environment,
+                csp=csp, app_codes=app_codes, month=month, contains=contains,
+            )
+
+    df = filter_tickets(year, environment, narrow_environment, csp)
+    if df.empty:
+        return pd.DataFrame(columns=by + ['count'])
+    if app_codes is not None:
+        df = df[df['AppCode'].isin(app_codes)]
+    if month:
+        df = df[df['tCreated'].dt.month == month]
+    for column, value in (contains or {}).items():
+        df = df[contains_mask(df[column], value)]
+
+    with metrics.span('aggregate'):
+        keys = []
+        for column in by:
+            key = df['tCreated'].dt.strftime(DERIVED_KEY_FORMATS[column]).rename(column) if column in DERIVED_KEY_FORMATS else df[column]
+            if fillna and column in fillna:
+                key = key.fillna(fillna[column])
+            keys.append(key)
+        return df.groupby(keys).size().reset_index(name='count')
+
+def ticket_facets(
+    year: Optional[int] = None,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    contains: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Distinct values with counts per facet column for the tickets matching the filters, from the facet index
+    when the tickets are in memory. Otherwise each column is counted through count_tickets, leaving out
+    its own column filter as the index does.
+    """
+    if facet_index is not None:
+        with metrics.span('facets'):
+            return facet_index.counts(year, environment, narrow_environment, contains)
+
+    contains = contains or {}
+    facets = {}
+    for column in FACET_COLUMNS:
+        others = {c: v for c, v in contains.items() if c != column}
+        counts = count_tickets([column], year, environment, narrow_environment, contains=others)
+        facets[column] = sorted(
+            ({"value": str(value), "count": int(count)} for value, count in zip(counts[column], counts['count'])),
+            key=lambda facet: facet["value"],
+        )
+    totals = count_tickets(['CSP'], year, environment, narrow_environment, fillna={'CSP': ''}, contains=contains)
+    return {"total_count": int(totals['count'].sum()), "facets": facets}
 
-@app.get("/api/confluence/page/{page_id}")
-async def get_confluence_page(page_id: str):
-    return {"html_content": confluence_pages.get(page_id, "<h1>Page Not Found</h1>")}
+app.add_middleware(DataReadinessMiddleware)
+# Inside the metrics middleware, so response sizes and latencies are the ones on the wire
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+# On-demand request profiling, mounted only when PROFILING_ENABLED is set so it costs nothing otherwise
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+    app.include_router(profiling.router, tags=["debug"])
 
 app.add_middleware(
     CORSMiddleware,
@@ -153,28 +390,91 @@ app.add_middleware(
 )
 
 @app.get("/api/tickets-filter-options")
+@query_cache.cached("/api/tickets-filter-options")
 def get_ticket_filter_options():
     """
     Provides the unique values for filterable ticket columns.
     """
     try:
-        if tickets_df is None or tickets_df.empty:
-            return {
-                "Priority": [], "CSP": [], "AppCode": [], 
-                "Environment": [], "NarrowEnvironment": []
-            }
-        options = {
-            "Priority": sorted([str(p) for p in tickets_df['Priority'].unique()]),
-            "CSP": sorted([str(c) for c in tickets_df['CSP'].unique()]),
-            "AppCode": sorted([str(a) for a in tickets_df['AppCode'].unique()]),
-            "Environment": sorted([str(e) for e in tickets_df['Environment'].dropna().unique()]),
-            "NarrowEnvironment": sorted([str(n) for n in tickets_df['NarrowEnvironment'].dropna().unique()]),
-        }
-        return options
+        facets = ticket_facets()["facets"]
+        return {column: [facet["value"] for facet in facets[column]] for column in FILTER_OPTION_COLUMNS}
     except Exception as e:
         logger.error(f"Error in /api/tickets-filter-options: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/tickets-facets")
+# Key, Summary and Account filters are typed search strings, kept out of the query log
+@query_cache.cached("/api/tickets-facets", free_text=('Key', 'Summary', 'Account'))
+def get_ticket_facets(
+    # Same global and per-column filters as /api/tickets
+    year: Optional[int] = None,
+    global_environment: Optional[str] = None,
+    global_narrow_environment: Optional[str] = None,
+    Key: Optional[str] = None,
+    Summary: Optional[str] = None,
+    Priority: Optional[str] = None,
+    CSP: Optional[str] = None,
+    AppCode: Optional[str] = None,
+    column_environment: Optional[str] = None,
+    column_narrow_environment: Optional[str] = None,
+    AlertType: Optional[str] = None,
+    ConfigRule: Optional[str] = None,
+    Account: Optional[str] = None
+):
+    """
+    Facet counts for the filter dropdowns: per column, the values still reachable under the active
+    filters and how many tickets each would match. A column's own filter does not narrow its values.
+    """
+    try:
+        column_filters = {
+            'Key': Key, 'Summary': Summary, 'Priority': Priority, 'CSP': CSP, 'AppCode': AppCode,
+            'Environment': column_environment, 'NarrowEnvironment': column_narrow_environment,
+            'AlertType': AlertType, 'ConfigRule': ConfigRule, 'Account': Account,
+        }
+        column_filters = {column: value for column, value in column_filters.items() if value}
+        return ticket_facets(year, global_environment, global_narrow_environment, column_filters)
+    except Exception as e:
+        logger.error(f"Error in /api/tickets-facets: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/resolution-time")
+@query_cache.cached("/api/resolution-time")
+def get_resolution_time(
+    group_by: Optional[str] = None,
+    percentiles: str = "50,90,99",
+    year: Optional[int] = None,
+    csp: Optional[str] = None,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    app_codes: Optional[str] = None,
+    config_rules: Optional[str] = None,
+    priority: Optional[str] = None,
+):
+    """
+    Resolution-time (MTTR) statistics in hours: ticket count, mean and percentiles, overall or per
+    CSP, Environment, NarrowEnvironment, AppCode, ConfigRule, Priority or Month.
+    - percentiles, app_codes, config_rules, priority: comma-separated lists.
+    Percentiles come from merged quantile sketches and are accurate to within 1%.
+    """
+    if group_by and group_by not in RESOLUTION_GROUP_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(RESOLUTION_GROUP_COLUMNS)}.")
+    try:
+        requested = [float(p) for p in percentiles.split(',')]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be a comma-separated list of numbers.")
+    if not requested or any(not 0 <= p <= 100 for p in requested):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100.")
+
+    def split(values: Optional[str]) -> Optional[List[str]]:
+        return [value.strip() for value in values.split(',')] if values else None
+
+    with metrics.span('aggregate'):
+        groups = resolution_sketches.query(
+            group_by, requested, year=year, environment=environment, narrow_environment=narrow_environment,
+            csp=csp, app_codes=split(app_codes), config_rules=split(config_rules), priorities=split(priority),
+        )
+    return {"group_by": group_by, "groups": groups}
+
 @app.get("/api/tickets")
 def get_tickets(
     page: int = 1,
@@ -199,59 +499,63 @@ def get_tickets(
 ):
     """Endpoint to get a paginated list of tickets with optional filtering and sorting."""
     try:
-        # 1. Apply global filters first.
-        df = get_data(year, global_environment, global_narrow_environment)
-
-        # 2. Apply per-column filters from the table UI.
-        # Note: The 'Environment' and 'NarrowEnvironment' params here are from the table's column filters.
-        if Key:
-            df = df[df['Key'].str.contains(Key, case=False, na=False)]
-        if Summary:
-            df = df[df['Summary'].str.contains(Summary, case=False, na=False)]
-        if Priority:
-            df = df[df['Priority'].str.contains(Priority, case=False, na=False)]
-        if CSP:
-            df = df[df['CSP'].str.contains(CSP, case=False, na=False)]
-        if AppCode:
-            df = df[df['AppCode'].str.contains(AppCode, case=False, na=False)]
-        if column_environment: # This is the per-column filter
-            df = df[df['Environment'].str.contains(column_environment, case=False, na=False)]
-        if column_narrow_environment: # This is the per-column filter
-            df = df[df['NarrowEnvironment'].str.contains(column_narrow_environment, case=False, na=False)]
-        if AlertType:
-            df = df[df['AlertType'].str.contains(AlertType, case=False, na=False)]
-        if ConfigRule:
-            df = df[df['ConfigRule'].str.contains(ConfigRule, case=False, na=False)]
-        if Account:
-            df = df[df['Account'].str.contains(Account, case=False, na=False)]
-
-        # 3. Sorting
-        if sort_by and sort_order:
-            ascending = sort_order == 'asc'
-            if sort_by == 'Key':
-                # Use a numeric sort for the 'Key' column
-                df['sort_key'] = df['Key'].str.extract('(\\d+)').astype(int)
-                df = df.sort_values(by='sort_key', ascending=ascending).drop(columns=['sort_key'])
-            elif sort_by in df.columns:
-                df = df.sort_values(by=sort_by, ascending=ascending)
-
-        # 4. Get total count *after* all filtering and sorting
-        total_count = len(df)
-
-        # 5. Pagination
-        total_pages = (total_count + size - 1) // size
+        # Per-column filters from the table UI.
+        # Note: The 'Environment' and 'NarrowEnvironment' filters here are from the table's column filters.
+        column_filters = {
+            'Key': Key, 'Summary': Summary, 'Priority': Priority, 'CSP': CSP, 'AppCode': AppCode,
+            'Environment': column_environment, 'NarrowEnvironment': column_narrow_environment,
+            'AlertType': AlertType, 'ConfigRule': ConfigRule, 'Account': Account,
+        }
+        column_filters = {column: value for column, value in column_filters.items() if value}
         start_index = (page - 1) * size
-        end_index = start_index + size
-        paginated_df = df.iloc[start_index:end_index].copy()
-
-        for col in ['tCreated', 'tResolved']:
-            if col in paginated_df.columns:
-                paginated_df[col] = paginated_df[col].apply(lambda x: x.isoformat() if pd.notna(x) else None)
 
-        paginated_df.fillna('', inplace=True)
+        if ticket_db is not None:
+            # Filtering, sorting and pagination all run inside the database
+            with metrics.span('query'):
+                paginated_df, total_count = ticket_db.page(
+                    sort_by if sort_order else None, sort_order == 'asc', start_index, size,
+                    year=year, environment=global_environment, narrow_environment=global_narrow_environment,
+                    contains=column_filters,
+                )
+            total_pages = (total_count + size - 1) // size
+        else:
+            # 1. Apply global filters first.
+            df = get_data(year, global_environment, global_narrow_environment)
+
+            # 2. Apply per-column filters from the table UI.
+            with metrics.span('filter'):
+                for column, value in column_filters.items():
+                    df = df[contains_mask(df[column], value)]
+
+            # 3. Sorting (stable, so rows with equal values keep their original order)
+            with metrics.span('sort'):
+                if sort_by and sort_order:
+                    ascending = sort_order == 'asc'
+                    if sort_by == 'Key':
+                        # Use a numeric sort for the 'Key' column
+                        df['sort_key'] = df['Key'].str.extract('(\\d+)').astype(int)
+                        df = df.sort_values(by='sort_key', ascending=ascending, kind='stable').drop(columns=['sort_key'])
+                    elif sort_by in df.columns:
+                        df = df.sort_values(by=sort_by, ascending=ascending, kind='stable')
+
+            # 4. Get total count *after* all filtering and sorting
+            total_count = len(df)
+
+            # 5. Pagination
+            total_pages = (total_count + size - 1) // size
+            end_index = start_index + size
+            paginated_df = df.iloc[start_index:end_index].copy()
+
+        with metrics.span('serialize'):
+            for col in ['tCreated', 'tResolved']:
+                if col in paginated_df.columns:
+                    paginated_df[col] = paginated_df[col].apply(lambda x: x.isoformat() if pd.notna(x) else None)
+
+            paginated_df.fillna('', inplace=True)
+            tickets = paginated_df.to_dict(orient='records')
 
         return {
-            "tickets": paginated_df.to_dict(orient='records'),
+            "tickets": tickets,
             "total_count": total_count,
             "total_pages": total_pages
         }
@@ -260,61 +564,66 @@ def get_tickets(
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/csp-vs-priority")
-async def get_csp_vs_priority():
-    csp_priority_counts = tickets_df.groupby(['CSP', 'Priority']).size().unstack(fill_value=0)
+@query_cache.cached("/api/csp-vs-priority")
+def get_csp_vs_priority():
+    csp_priority_counts = count_tickets(['CSP', 'Priority']).set_index(['CSP', 'Priority'])['count'].unstack(fill_value=0)
     for priority in ['Low', 'Medium', 'High', 'unknown']:
         if priority not in csp_priority_counts.columns:
             csp_priority_counts[priority] = 0
     return csp_priority_counts.to_dict(orient='index')
 
 @app.get("/api/appcode-vs-priority")
-async def get_appcode_vs_priority():
-    heatmap_data = tickets_df.groupby(['AppCode', 'Priority']).size().unstack(fill_value=0)
+@query_cache.cached("/api/appcode-vs-priority")
+def get_appcode_vs_priority():
+    heatmap_data = count_tickets(['AppCode', 'Priority']).set_index(['AppCode', 'Priority'])['count'].unstack(fill_value=0)
     for priority in ['Low', 'Medium', 'High', 'unknown']:
         if priority not in heatmap_data.columns:
             heatmap_data[priority] = 0
     heatmap_data = heatmap_data[['Low', 'Medium', 'High', 'unknown']]
     return heatmap_data.reset_index().to_dict(orient='records')
 
-@app.get("/api/environment-summary", response_model=EnvironmentSummaryResponse)
-def get_environment_summary(year: Optional[int] = None, environment: Optional[str] = None, narrow_environment: Optional[str] = None):
-    logger.info(f"--- Starting /api/environment-summary (year: {year}) ---")
+@app.get("/api/environment-summary", response_model=EnvironmentSummaryResponse, response_model_exclude_none=True)
+@query_cache.cached("/api/environment-summary")
+def get_environment_summary(year: Optional[int] = None, environment: Optional[str] = None, narrow_environment: Optional[str] = None, approx: bool = False):
+    """
+    Monthly ticket counts per CSP stacked by environment. approx=true may estimate the counts from the
+    stratified sample; "approximate" then gives the method and a confidence interval per count.
+    """
+    logger.debug(f"--- Starting /api/environment-summary (year: {year}) ---")
     try:
-        df = get_data(year, environment, narrow_environment)
-
-        if df.empty:
-            logger.warning(f"No ticket data found for year {year} and other filters. Returning empty summary.")
-            empty_stats = CSPStatistics(total_tickets=0, monthly_average=0)
-            return EnvironmentSummaryResponse(
-                aws=[], gcp=[], aws_stats=empty_stats, gcp_stats=empty_stats
-            )
-
-        df['tCreated'] = pd.to_datetime(df['tCreated'])
-        df['Month'] = df['tCreated'].dt.to_period('M').astype(str)
         if environment and environment != 'All':
             stack_by_column = 'NarrowEnvironment'
         else:
             stack_by_column = 'Environment'
 
-        df[stack_by_column] = df[stack_by_column].fillna('Unknown')
+        counts = count_tickets(
+            ['CSP', 'Month', stack_by_column], year, environment, narrow_environment,
+            fillna={stack_by_column: 'Unknown'}, approx=approx,
+        )
+        approximate = sampling.describe(counts, ['CSP', 'Month', stack_by_column]) if approx else None
+
+        if counts.empty:
+            logger.warning(f"No ticket data found for year {year} and other filters. Returning empty summary.")
+            empty_stats = CSPStatistics(total_tickets=0, monthly_average=0)
+            return EnvironmentSummaryResponse(
+                aws=[], gcp=[], aws_stats=empty_stats, gcp_stats=empty_stats, approximate=approximate
+            )
         
-        all_stack_values = sorted(df[stack_by_column].unique().tolist())
-        logger.info(f"Stacking by '{stack_by_column}'. Found unique values: {all_stack_values}")
+        all_stack_values = sorted(counts[stack_by_column].unique().tolist())
+        logger.debug(f"Stacking by '{stack_by_column}'. Found unique values: {all_stack_values}")
 
-        summary = df.groupby(['CSP', 'Month', stack_by_column]).size().unstack(fill_value=0)
+        summary = counts.set_index(['CSP', 'Month', stack_by_column])['count'].unstack(fill_value=0)
 
         for value in all_stack_values:
             if value not in summary.columns:
                 summary[value] = 0
         
         summary = summary.reset_index()
-        logger.info(f"Summary table head:\n{summary.head()}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Summary table head:\n{summary.head()}")
 
-        df_aws = df[df['CSP'] == 'AWS']
-        df_gcp = df[df['CSP'] == 'GCP']
-
-        aws_total = int(df_aws.shape[0])
-        gcp_total = int(df_gcp.shape[0])
+        aws_total = int(counts.loc[counts['CSP'] == 'AWS', 'count'].sum())
+        gcp_total = int(counts.loc[counts['CSP'] == 'GCP', 'count'].sum())
 
         current_year = 2025
         current_month = 7 
@@ -330,75 +639,73 @@ def get_environment_summary(year: Optional[int] = None, environment: Optional[st
         aws_stats = CSPStatistics(total_tickets=aws_total, monthly_average=aws_monthly_avg)
         gcp_stats = CSPStatistics(total_tickets=gcp_total, monthly_average=gcp_monthly_avg)
 
-        aws_summary = summary[summary['CSP'] == 'AWS'].drop(columns='CSP')
-        gcp_summary = summary[summary['CSP'] == 'GCP'].drop(columns='CSP')
+        with metrics.span('serialize'):
+            aws_summary = summary[summary['CSP'] == 'AWS'].drop(columns='CSP')
+            gcp_summary = summary[summary['CSP'] == 'GCP'].drop(columns='CSP')
 
-        aws_summary_dict = aws_summary.to_dict(orient='records')
-        gcp_summary_dict = gcp_summary.to_dict(orient='records')
+            aws_summary_dict = aws_summary.to_dict(orient='records')
+            gcp_summary_dict = gcp_summary.to_dict(orient='records')
 
         return EnvironmentSummaryResponse(
             aws=aws_summary_dict, 
             gcp=gcp_summary_dict,
             aws_stats=aws_stats,
-            gcp_stats=gcp_stats
+            gcp_stats=gcp_stats,
+            approximate=approximate,
         )
     except Exception as e:
         logger.error(f"Error in /api/environment-summary: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/reports/ticket-count-by-appcode")
-async def get_ticket_count_by_appcode(year: int, csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None):
-    df = get_data(year, environment, narrow_environment)
-    df_csp = df[df['CSP'] == csp].copy()
-    df_csp['Month'] = pd.to_datetime(df_csp['tCreated']).dt.strftime('%b')
-    
+@query_cache.cached("/api/reports/ticket-count-by-appcode")
+def get_ticket_count_by_appcode(year: int, csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None, approx: bool = False):
     months_order = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
     
-    grouped = df_csp.groupby(['Month', 'AppCode']).size().reset_index(name='count')
+    grouped = count_tickets(['MonthName', 'AppCode'], year, environment, narrow_environment, csp=csp, approx=approx)
+    approximate = sampling.describe(grouped, ['MonthName', 'AppCode']) if approx else None
+    grouped = grouped.rename(columns={'MonthName': 'Month'})
     
     pivot_df = grouped.pivot(index='Month', columns='AppCode', values='count').fillna(0).astype(int)
     
     pivot_df = pivot_df.reindex(months_order, fill_value=0)
     
-    app_codes = sorted(df_csp['AppCode'].unique().tolist())
+    app_codes = sorted(grouped['AppCode'].unique().tolist())
     
     pivot_df = pivot_df.reindex(columns=app_codes, fill_value=0)
     
     chart_data = pivot_df.reset_index().to_dict(orient='records')
     
-    return {
+    result = {
         "data": chart_data,
         "app_codes": app_codes
     }
+    if approximate is not None:
+        result["approximate"] = approximate
+    return result
 
 @app.get("/api/appcode-trends-daily")
+@query_cache.cached("/api/appcode-trends-daily")
 def get_appcode_trends_daily(year: int, month: int, csp: str, app_codes: str):
     """
     Provides daily trend data for a given list of AppCodes within a specific month.
     """
-    df = get_data(year=year)
-    df_csp = df[df['CSP'] == csp].copy()
-    
     selected_app_codes = [code.strip() for code in app_codes.split(',')]
-    
-    df['tCreated'] = pd.to_datetime(df['tCreated'])
-    df_month = df_csp[df_csp['tCreated'].dt.month == month]
 
-    df_filtered = df_month[df_month['AppCode'].isin(selected_app_codes)]
+    counts = count_tickets(['Day', 'AppCode'], year=year, csp=csp, app_codes=selected_app_codes, month=month)
 
-    if df_filtered.empty:
+    if counts.empty:
         return {"daily_trend": [], "daily_heatmap": [], "app_codes": selected_app_codes}
 
-    df_filtered['Day'] = df_filtered['tCreated'].dt.strftime('%Y-%m-%d')
-    days_order = sorted(df_filtered['Day'].unique())
+    days_order = sorted(counts['Day'].unique())
 
     # 1. Daily Trend data (Line chart)
-    daily_trend_df = df_filtered.groupby('Day').size().reset_index(name='count')
+    daily_trend_df = counts.groupby('Day')['count'].sum().reset_index(name='count')
     daily_trend_df = daily_trend_df.set_index('Day').reindex(days_order, fill_value=0).reset_index()
     daily_trend_data = daily_trend_df.to_dict(orient='records')
 
     # 2. Daily Heatmap data (for per-appcode lines)
-    daily_heatmap_df = df_filtered.groupby(['Day', 'AppCode']).size().unstack(fill_value=0)
+    daily_heatmap_df = counts.set_index(['Day', 'AppCode'])['count'].unstack(fill_value=0)
     daily_heatmap_df = daily_heatmap_df.reindex(days_order, fill_value=0)
     daily_heatmap_df = daily_heatmap_df.reindex(columns=selected_app_codes, fill_value=0)
     daily_heatmap_data = daily_heatmap_df.reset_index().to_dict(orient='records')
@@ -411,6 +718,7 @@ def get_appcode_trends_daily(year: int, month: int, csp: str, app_codes: str):
 
 
 @app.get("/api/appcode-configrule-trends")
+@query_cache.cached("/api/appcode-configrule-trends")
 def get_appcode_configrule_trends(
     year: int,
     csp: str,
@@ -421,24 +729,21 @@ def get_appcode_configrule_trends(
     """
     Provides monthly trend data for ConfigRules related to a given list of AppCodes.
     """
-    df = get_data(year=year, environment=environment, narrow_environment=narrow_environment)
-    df_csp = df[df['CSP'] == csp].copy()
-    
     selected_app_codes = [code.strip() for code in app_codes.split(',')]
-    df_filtered = df_csp[df_csp['AppCode'].isin(selected_app_codes)]
+    counts = count_tickets(
+        ['Month', 'ConfigRule'], year, environment, narrow_environment, csp=csp, app_codes=selected_app_codes
+    )
     
-    # Drop rows where ConfigRule is NaN or empty, as they can't be trended
-    df_filtered = df_filtered.dropna(subset=['ConfigRule'])
-    df_filtered = df_filtered[df_filtered['ConfigRule'] != '']
+    # Rows where ConfigRule is NaN are dropped by the grouping; empty ones can't be trended either
+    counts = counts[counts['ConfigRule'] != '']
 
-    if df_filtered.empty:
+    if counts.empty:
         return {"trend_data": [], "config_rules": []}
 
-    df_filtered['Month'] = pd.to_datetime(df_filtered['tCreated']).dt.strftime('%Y-%m')
-    months_order = sorted(df_filtered['Month'].unique())
-    config_rules_order = sorted(df_filtered['ConfigRule'].unique())
+    months_order = sorted(counts['Month'].unique())
+    config_rules_order = sorted(counts['ConfigRule'].unique())
 
-    trend_df = df_filtered.groupby(['Month', 'ConfigRule']).size().unstack(fill_value=0)
+    trend_df = counts.set_index(['Month', 'ConfigRule'])['count'].unstack(fill_value=0)
     trend_df = trend_df.reindex(months_order, fill_value=0)
     trend_df = trend_df.reindex(columns=config_rules_order, fill_value=0)
     trend_df['Total'] = trend_df.apply(pd.to_numeric).sum(axis=1)
@@ -450,85 +755,8 @@ def get_appcode_configrule_trends(
         "config_rules": config_rules_order
     }
 
-class ChatRequest(BaseModel):
-    prompt: str
-    model: Optional[str] = 'gemini-pro'
-
-@app.get("/api/agent/models")
-async def list_agent_models():
-    try:
-        # Filter models that support the 'generateContent' method
-        models = [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-        # We only want the user-friendly name (e.g., 'gemini-pro') not 'models/gemini-pro'
-        cleaned_models = [name.replace('models/', '') for name in models]
-        return {"models": cleaned_models}
-    except Exception as e:
-        logger.error(f"Error listing models: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail="Failed to retrieve models.")
-
-def run_aws_command(command: str) -> str:
-    """Executes an AWS CLI command and returns the output."""
-    try:
-        # Security Note: In a real-world scenario, you'd want to sanitize this command string.
-        # For this demo, we'll assume the commands are safe.
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Error executing command: {e}\nStderr: {e.stderr}"
-
-def run_gcp_command(command: str) -> str:
-    """Executes a GCP CLI (gcloud) command and returns the output."""
-    try:
-        result = subprocess.run(command, shell=True, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        return f"Error executing command: {e}\nStderr: {e.stderr}"
-
-@app.post("/api/agent/chat")
-async def agent_chat(request: ChatRequest):
-    try:
-        model_name = request.model if request.model else 'gemini-pro'
-        
-        # Define the tools the model can use. The library inspects the function signature.
-        tools = [run_aws_command, run_gcp_command]
-        model = genai.GenerativeModel(model_name=model_name, tools=tools)
-        
-        # Start a chat session
-        chat = model.start_chat()
-        response = chat.send_message(request.prompt)
-
-        # Handle tool calls from the model
-        while response.parts and response.parts[0].function_call:
-            function_call = response.parts[0].function_call
-            
-            available_tools = {
-                "run_aws_command": run_aws_command,
-                "run_gcp_command": run_gcp_command
-            }
-            
-            function_name = function_call.name
-            tool_function = available_tools.get(function_name)
-
-            if tool_function:
-                function_args = {key: value for key, value in function_call.args.items()}
-                tool_output = tool_function(**function_args)
-                
-                # Send the tool's output back to the model in the correct format
-                response = chat.send_message(
-                    [dict(function_response=dict(name=function_name, response={"output": tool_output}))]
-                )
-            else:
-                response = chat.send_message(
-                    [dict(function_response=dict(name=function_name, response={"error": f"Tool '{function_name}' not found."}))]
-                )
-
-        return {"response": response.text}
-    except Exception as e:
-        logger.error(f"Error in /api/agent/chat: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=str(e))
-
-
 @app.get("/api/appcode-trends")
+@query_cache.cached("/api/appcode-trends")
 def get_appcode_trends(
     year: int, 
     csp: str, 
@@ -540,26 +768,24 @@ def get_appcode_trends(
     Provides historical trend data for a given list of AppCodes.
     - app_codes: A comma-separated string of AppCodes.
     """
-    df = get_data(year=year, environment=environment, narrow_environment=narrow_environment)
-    df_csp = df[df['CSP'] == csp].copy()
-    
     selected_app_codes = [code.strip() for code in app_codes.split(',')]
     
-    df_filtered = df_csp[df_csp['AppCode'].isin(selected_app_codes)]
+    counts = count_tickets(
+        ['Month', 'AppCode'], year, environment, narrow_environment, csp=csp, app_codes=selected_app_codes
+    )
     
-    if df_filtered.empty:
+    if counts.empty:
         return {"monthly_trend": [], "monthly_heatmap": [], "app_codes": selected_app_codes}
 
-    df_filtered['Month'] = pd.to_datetime(df_filtered['tCreated']).dt.strftime('%Y-%m')
-    months_order = sorted(df_filtered['Month'].unique())
+    months_order = sorted(counts['Month'].unique())
 
     # 1. Monthly Trend data (Line chart)
-    monthly_trend_df = df_filtered.groupby('Month').size().reset_index(name='count')
+    monthly_trend_df = counts.groupby('Month')['count'].sum().reset_index(name='count')
     monthly_trend_df = monthly_trend_df.set_index('Month').reindex(months_order, fill_value=0).reset_index()
     monthly_trend_data = monthly_trend_df.to_dict(orient='records')
 
     # 2. Monthly Heatmap data
-    monthly_heatmap_df = df_filtered.groupby(['Month', 'AppCode']).size().unstack(fill_value=0)
+    monthly_heatmap_df = counts.set_index(['Month', 'AppCode'])['count'].unstack(fill_value=0)
     monthly_heatmap_df = monthly_heatmap_df.reindex(months_order, fill_value=0)
     monthly_heatmap_df = monthly_heatmap_df.reindex(columns=selected_app_codes, fill_value=0)
     monthly_heatmap_data = monthly_heatmap_df.reset_index().to_dict(orient='records')
@@ -570,18 +796,77 @@ def get_appcode_trends(
         "app_codes": selected_app_codes
     }
 
-@app.get("/api/reports/total-ticket-count-by-appcode")
-def get_total_ticket_count_by_appcode(year: int, csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None):
-    df_full = get_data(year, environment, narrow_environment)
-    df_filtered = df_full[df_full['CSP'] == csp]
+@app.get("/api/trends")
+@query_cache.cached("/api/trends")
+def get_trends(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    resolution: str = 'auto',
+    max_points: int = Query(500, ge=1),
+    group_by: Optional[str] = None,
+    csp: Optional[str] = None,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    app_codes: Optional[str] = None,
+    config_rules: Optional[str] = None,
+):
+    """
+    Ticket counts over any date range, answered from the precomputed trend pyramid.
+    - start, end: dates or timestamps (UTC), both inclusive; default to the range covered by the data.
+    - resolution: hour, day, week, month, or auto to pick the finest one giving at most max_points buckets.
+    - group_by: CSP, AppCode, ConfigRule, Environment or NarrowEnvironment, to add one series per value.
+    - app_codes, config_rules: comma-separated lists.
+    """
+    if resolution != 'auto' and resolution not in pyramid.LEVELS:
+        raise HTTPException(status_code=400, detail=f"resolution must be auto or one of {', '.join(pyramid.LEVELS)}.")
+    if group_by and group_by not in pyramid.DIMENSIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of {', '.join(pyramid.DIMENSIONS)}.")
 
-    if df_filtered.empty:
-        return {}
+    extent = trend_pyramid.extent
+    try:
+        start_ts = pd.Timestamp(start) if start else (extent[0] if extent else None)
+        end_ts = pd.Timestamp(end) if end else (extent[1] if extent else None)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format.")
+    if start_ts is None or end_ts is None:
+        return {"resolution": None, "buckets": [], "total": [], **({"series": []} if group_by else {})}
+    tz = trend_pyramid.timezone
+    start_ts = start_ts.tz_localize(tz) if start_ts.tzinfo is None else start_ts.tz_convert(tz)
+    end_ts = end_ts.tz_localize(tz) if end_ts.tzinfo is None else end_ts.tz_convert(tz)
+    if end and len(end) == 10:
+        # A plain end date covers that whole day
+        end_ts = end_ts + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
+    if end_ts < start_ts:
+        raise HTTPException(status_code=400, detail="end must not be before start.")
+
+    if resolution == 'auto':
+        level = trend_pyramid.choose_level(start_ts, end_ts, max_points)
+    elif trend_pyramid.bucket_count(start_ts, end_ts, resolution) > max_points:
+        raise HTTPException(status_code=400, detail=f"More than {max_points} {resolution} buckets in this range; use a coarser resolution.")
+    else:
+        level = resolution
 
+    def split(values: Optional[str]) -> Optional[List[str]]:
+        return [value.strip() for value in values.split(',')] if values else None
+
+    with metrics.span('aggregate'):
+        result = trend_pyramid.series(
+            start_ts, end_ts, level, group_by, csp=csp, environment=environment,
+            narrow_environment=narrow_environment, app_codes=split(app_codes), config_rules=split(config_rules),
+        )
+    return {"start": start_ts.isoformat(), "end": end_ts.isoformat(), **result}
+
+@app.get("/api/reports/total-ticket-count-by-appcode")
+@query_cache.cached("/api/reports/total-ticket-count-by-appcode")
+def get_total_ticket_count_by_appcode(year: int, csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None, approx: bool = False):
+    """Ticket count per AppCode. With approx=true: {"counts": {...}, "approximate": {...}}."""
     # Group by AppCode and count tickets
-    total_counts = df_filtered.groupby('AppCode').size()
+    total_counts = count_tickets(['AppCode'], year, environment, narrow_environment, csp=csp, approx=approx)
+    counts = {} if total_counts.empty else total_counts.set_index('AppCode')['count'].to_dict()
 
-    return total_counts.to_dict()
+    if approx:
+        return {"counts": counts, "approximate": sampling.describe(total_counts, ['AppCode'])}
+    return counts
 
 @app.get("/api/download_tickets")
 def download_tickets(
@@ -680,48 +965,134 @@ def download_tickets(
     return StreamingResponse(output, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=tickets.csv"})
 
 
+def appcode_configrule_matrix(
+    counts: pd.DataFrame,
+    encoding: Optional[str],
+    top_app_codes: Optional[int],
+    top_config_rules: Optional[int],
+    row_offset: int,
+    row_limit: Optional[int],
+    column_offset: int,
+    column_limit: Optional[int],
+    approx: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    The AppCode x ConfigRule matrix as a sparse/top-N/tiled view when any of those options is set;
+    None when the caller should return its default dense response. With `approx` the view's
+    "approximate" covers only its own cells, "(other)" ones with the summed intervals.
+    """
+    options = (encoding, top_app_codes, top_config_rules, row_limit, column_limit)
+    if all(option is None for option in options) and not row_offset and not column_offset:
+        return None
+    encoding = encoding or 'dense'
+    if encoding not in heatmap.ENCODINGS:
+        raise HTTPException(status_code=400, detail=f"encoding must be one of {', '.join(heatmap.ENCODINGS)}.")
+    with metrics.span('serialize'):
+        view = heatmap.matrix_view(
+            counts, 'AppCode', 'ConfigRule', encoding, top_app_codes, top_config_rules,
+            row_offset, row_limit, column_offset, column_limit,
+        )
+    # Same names as the dense responses for the axis labels
+    view["app_codes"] = view.pop("rows")
+    view["config_rules"] = view.pop("columns")
+    if approx:
+        cells = heatmap.tile_counts(
+            counts, 'AppCode', 'ConfigRule', top_app_codes, top_config_rules,
+            row_offset, row_limit, column_offset, column_limit,
+        )
+        view["approximate"] = sampling.describe(cells, ['AppCode', 'ConfigRule'])
+    return view
+
 @app.get("/api/reports/control-count-by-appcode")
-async def get_control_count_by_appcode(year: int, csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None):
-    df = get_data(year, environment, narrow_environment)
-    df_csp = df[df['CSP'] == csp]
-    
-    grouped = df_csp.groupby(['AppCode', 'ConfigRule']).size().reset_index(name='count')
-    
-    pivot_df = grouped.pivot(index='AppCode', columns='ConfigRule', values='count').fillna(0).astype(int)
-    
-    config_rules = sorted(df_csp['ConfigRule'].unique().tolist())
-    
-    # Ensure all config rules are present in the columns
-    pivot_df = pivot_df.reindex(columns=config_rules, fill_value=0)
-    
-    chart_data = pivot_df.reset_index().to_dict(orient='records')
-    
-    return {
-        "data": chart_data,
-        "config_rules": config_rules
-    }
+@query_cache.cached("/api/reports/control-count-by-appcode")
+def get_control_count_by_appcode(
+    year: int,
+    csp: str,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    # Large-matrix options, see /api/reports/heatmap
+    encoding: Optional[str] = None,
+    top_app_codes: Optional[int] = Query(None, ge=1),
+    top_config_rules: Optional[int] = Query(None, ge=1),
+    row_offset: int = Query(0, ge=0),
+    row_limit: Optional[int] = Query(None, ge=1),
+    column_offset: int = Query(0, ge=0),
+    column_limit: Optional[int] = Query(None, ge=1),
+    approx: bool = False,
+):
+    grouped = count_tickets(['AppCode', 'ConfigRule'], year, environment, narrow_environment, csp=csp, approx=approx)
+    view = appcode_configrule_matrix(
+        grouped, encoding, top_app_codes, top_config_rules, row_offset, row_limit, column_offset, column_limit, approx
+    )
+    result = view
+    if view is None:
+        pivot_df = grouped.pivot(index='AppCode', columns='ConfigRule', values='count').fillna(0).astype(int)
+        
+        config_rules = sorted(grouped['ConfigRule'].unique().tolist())
+        
+        # Ensure all config rules are present in the columns
+        pivot_df = pivot_df.reindex(columns=config_rules, fill_value=0)
+        
+        chart_data = pivot_df.reset_index().to_dict(orient='records')
+        
+        result = {
+            "data": chart_data,
+            "config_rules": config_rules
+        }
+        if approx:
+            result["approximate"] = sampling.describe(grouped, ['AppCode', 'ConfigRule'])
+    return result
 
 @app.get("/api/reports/heatmap")
-async def get_heatmap_data(year: int, csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None):
-    df = get_data(year, environment, narrow_environment)
-    df_csp = df[df['CSP'] == csp]
-    
-    heatmap_df = pd.crosstab(df_csp['AppCode'], df_csp['ConfigRule'])
-    
-    app_codes = sorted(heatmap_df.index.tolist())
-    config_rules = sorted(heatmap_df.columns.tolist())
-    
-    heatmap_data = heatmap_df.values.tolist()
-    
-    return {
-        "data": heatmap_data,
-        "app_codes": app_codes,
-        "config_rules": config_rules
-    }
+@query_cache.cached("/api/reports/heatmap")
+def get_heatmap_data(
+    year: int,
+    csp: str,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    encoding: Optional[str] = None,
+    top_app_codes: Optional[int] = Query(None, ge=1),
+    top_config_rules: Optional[int] = Query(None, ge=1),
+    row_offset: int = Query(0, ge=0),
+    row_limit: Optional[int] = Query(None, ge=1),
+    column_offset: int = Query(0, ge=0),
+    column_limit: Optional[int] = Query(None, ge=1),
+    approx: bool = False,
+):
+    """
+    AppCode x ConfigRule ticket counts. Without options: the full dense matrix. For large matrices:
+    - encoding=coo: only the non-zero cells, as row/column/value triplets.
+    - top_app_codes / top_config_rules: keep the N rows/columns with the most tickets, the rest summed as "(other)".
+    - row_offset/row_limit, column_offset/column_limit: return one tile; total_rows/total_columns give the full size.
+    - approx=true: estimate the counts from the stratified sample; "approximate" gives a confidence interval per cell.
+    """
+    counts = count_tickets(['AppCode', 'ConfigRule'], year, environment, narrow_environment, csp=csp, approx=approx)
+    view = appcode_configrule_matrix(
+        counts, encoding, top_app_codes, top_config_rules, row_offset, row_limit, column_offset, column_limit, approx
+    )
+    result = view
+    if view is None:
+        heatmap_df = counts.pivot(index='AppCode', columns='ConfigRule', values='count').fillna(0).astype(int)
+        
+        app_codes = sorted(heatmap_df.index.tolist())
+        config_rules = sorted(heatmap_df.columns.tolist())
+        
+        heatmap_data = heatmap_df.values.tolist()
+        
+        result = {
+            "data": heatmap_data,
+            "app_codes": app_codes,
+            "config_rules": config_rules
+        }
+        if approx:
+            result["approximate"] = sampling.describe(counts, ['AppCode', 'ConfigRule'])
+    return result
 
 @app.get("/api/configrule-heartbeat")
-async def get_configrule_heartbeat(csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None):
-    logger.info(f"--- Starting /api/configrule-heartbeat (csp: {csp}) ---")
+# Without explicit dates the window is the last 7 days, so entries also expire
+@query_cache.cached("/api/configrule-heartbeat", dataset='heartbeats', ttl_seconds=3600)
+def get_configrule_heartbeat(csp: str, environment: Optional[str] = None, narrow_environment: Optional[str] = None, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    logger.debug(f"--- Starting /api/configrule-heartbeat (csp: {csp}) ---")
     try:
         if csp.lower() == 'aws':
             df = aws_heartbeat_df.copy()
@@ -760,10 +1131,11 @@ async def get_configrule_heartbeat(csp: str, environment: Optional[str] = None,
             logger.warning(f"No heartbeat data for {csp} after filtering.")
             return {}
 
-        df['Date'] = df['tCreated'].dt.strftime('%Y-%m-%d')
+        with metrics.span('aggregate'):
+            df['Date'] = df['tCreated'].dt.strftime('%Y-%m-%d')
 
-        summary = df.groupby(['ConfigRule', 'Date']).size().reset_index(name='count')
-        pivot_df = summary.pivot_table(index='Date', columns='ConfigRule', values='count').fillna(0)
+            summary = df.groupby(['ConfigRule', 'Date']).size().reset_index(name='count')
+            pivot_df = summary.pivot_table(index='Date', columns='ConfigRule', values='count').fillna(0)
 
         # Determine the date range from the request or default
         if start_date and end_date:
@@ -810,6 +1182,7 @@ def chatbot_response(request: dict):
     return {"responses": responses}
 
 @app.get("/api/heartbeat-status")
+@query_cache.cached("/api/heartbeat-status", dataset='heartbeats')
 def get_heartbeat_status(csp: str, year: Optional[int] = None, environment: Optional[str] = None, narrow_environment: Optional[str] = None):
     """Endpoint to get heartbeat ticket status for line graphs."""
     if csp.lower() == 'aws':
@@ -826,10 +1199,11 @@ def get_heartbeat_status(csp: str, year: Optional[int] = None, environment: Opti
     if year:
         df = df[df['tCreated'].dt.year == year]
 
-    df['Date'] = df['tCreated'].dt.date
-    # Derive status from the Summary field
-    df['Status'] = df['Summary'].apply(lambda x: 'Success' if 'Success' in str(x) else 'Failed')
-    status_counts = df.groupby(['Date', 'Status']).size().unstack(fill_value=0)
+    with metrics.span('aggregate'):
+        df['Date'] = df['tCreated'].dt.date
+        # Derive status from the Summary field
+        df['Status'] = df['Summary'].apply(lambda x: 'Success' if 'Success' in str(x) else 'Failed')
+        status_counts = df.groupby(['Date', 'Status']).size().unstack(fill_value=0)
     
     if 'Success' not in status_counts:
         status_counts['Success'] = 0
@@ -846,4 +1220,123 @@ def get_heartbeat_status(csp: str, year: Optional[int] = None, environment: Opti
     }
 
 
+def heartbeat_times(values: pd.Series, errors: str = 'raise') -> pd.Series:
+    """
+    Parses ingested timestamps into the timezone of the loaded heartbeat data (naive, from the CSVs),
+    whatever offsets the client sent, so appending a batch never turns the column into objects.
+    """
+    times = pd.to_datetime(values, utc=True, errors=errors)
+    loaded = aws_heartbeat_df if aws_heartbeat_df is not None and 'tCreated' in aws_heartbeat_df else gcp_heartbeat_df
+    tz = getattr(loaded['tCreated'].dt, 'tz', None) if loaded is not None and 'tCreated' in loaded else None
+    return times.dt.tz_convert(tz)
+
+@app.post("/api/heartbeats")
+def ingest_heartbeats(records: List[Dict[str, Any]] = Body(...)):
+    """Appends a batch of heartbeat tickets to the in-memory heartbeat data for their CSP."""
+    global aws_heartbeat_df, gcp_heartbeat_df
+    if not records:
+        return {"ingested": 0}
+    try:
+        batch = pd.DataFrame(records)
+        batch['tCreated'] = heartbeat_times(batch['tCreated'])
+        if 'tResolved' in batch.columns:
+            batch['tResolved'] = heartbeat_times(batch['tResolved'], errors='coerce')
+        csps = batch['CSP'].str.upper()
+        aws_batch = batch[csps == 'AWS']
+        gcp_batch = batch[csps == 'GCP']
+        # Also checks the Summary and ConfigRule columns the heartbeat endpoints need
+        deltas = heartbeat_stream.heartbeat_deltas(batch[csps.isin(['AWS', 'GCP'])])
+    except (KeyError, ValueError, TypeError, AttributeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid heartbeat batch: {e}")
+
+    # Appending and publishing under the broadcaster lock keeps live subscribers' snapshots consistent
+    with heartbeat_stream.broadcaster.lock:
+        if not aws_batch.empty:
+            aws_heartbeat_df = pd.concat([aws_heartbeat_df, aws_batch], ignore_index=True)
+        if not gcp_batch.empty:
+            gcp_heartbeat_df = pd.concat([gcp_heartbeat_df, gcp_batch], ignore_index=True)
+        heartbeat_stream.broadcaster.publish(deltas)
+    query_cache.invalidate('heartbeats')
+
+    return {"ingested": len(aws_batch) + len(gcp_batch)}
+
+
+def heartbeat_snapshot(csp: Optional[str], days: Optional[int]):
+    """
+    Snapshot for a live heartbeat subscriber: counts over the last `days` days of heartbeat data
+    (up to its latest ticket), or all of it. Called with the broadcaster lock held.
+    """
+    csp = csp.lower() if csp else None
+    frames = [df for name, df in (('aws', aws_heartbeat_df), ('gcp', gcp_heartbeat_df))
+              if (csp is None or csp == name) and df is not None and not df.empty]
+    if not frames:
+        return {}
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    if days:
+        start = df['tCreated'].max().normalize() - pd.Timedelta(days=days - 1)
+        df = df[df['tCreated'] >= start]
+    return heartbeat_stream.heartbeat_deltas(df)
+
+
+def heartbeat_subscription(csp: Optional[str], environment: Optional[str], narrow_environment: Optional[str], days: Optional[int]):
+    if csp and csp.lower() not in ('aws', 'gcp'):
+        raise HTTPException(status_code=400, detail="Invalid CSP specified")
+    return heartbeat_stream.Subscription(
+        asyncio.get_running_loop(), lambda: heartbeat_snapshot(csp, days), csp, environment, narrow_environment,
+    )
+
+
+@app.get("/api/heartbeats/stream")
+async def stream_heartbeats(
+    csp: Optional[str] = None,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    days: Optional[int] = Query(7, ge=0),
+):
+    """
+    Server-sent events with live heartbeat success/failure counts per (csp, config rule, date): a
+    "snapshot" event with the last `days` days (0 for all), then a "delta" event with the counts added
+    since the previous event as batches are ingested. Add deltas to the snapshot; a new "snapshot"
+    replaces everything (sent when the client fell too far behind).
+    """
+    subscription = heartbeat_subscription(csp, environment, narrow_environment, days)
+    snapshot = await run_in_threadpool(heartbeat_stream.broadcaster.subscribe, subscription)
+
+    async def events():
+        try:
+            yield heartbeat_stream.sse_format(snapshot)
+            while True:
+                yield heartbeat_stream.sse_format(await heartbeat_stream.broadcaster.next_event(subscription))
+        finally:
+            heartbeat_stream.broadcaster.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
+
+@app.websocket("/api/heartbeats/ws")
+async def heartbeats_websocket(
+    websocket: WebSocket,
+    csp: Optional[str] = None,
+    environment: Optional[str] = None,
+    narrow_environment: Optional[str] = None,
+    days: Optional[int] = Query(7, ge=0),
+):
+    """
+    Same events as /api/heartbeats/stream, as JSON messages over a WebSocket, plus a {"type": "keep-alive"}
+    message whenever nothing was sent for the keep-alive interval, so a dead client is noticed while idle.
+    """
+    if csp and csp.lower() not in ('aws', 'gcp'):
+        await websocket.close(code=1008, reason="Invalid CSP specified")
+        return
+    await websocket.accept()
+    subscription = heartbeat_subscription(csp, environment, narrow_environment, days)
+    try:
+        await websocket.send_json(await run_in_threadpool(heartbeat_stream.broadcaster.subscribe, subscription))
+        while True:
+            event = await heartbeat_stream.broadcaster.next_event(subscription)
+            await websocket.send_json(event if event is not None else {"type": "keep-alive"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        heartbeat_stream.broadcaster.unsubscribe(subscription)
@@ -0,0 +1,199 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, List, Dict, Tuple, Sequence
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# The ASGI scope of the request being handled, so spans can label themselves with its route
+_current_scope: ContextVar[Optional[dict]] = ContextVar('metrics_current_scope', default=None)
+# Set (e.g. by the request profiler) to also collect each span of a single request as {stage, duration_ms}
+stage_recorder: ContextVar[Optional[list]] = ContextVar('metrics_stage_recorder', default=None)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def render(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}'] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {value}' for labels, value in items]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (last one is +Inf), sum]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        lines = []
+        for labels, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket_label = f'le="{le}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, bucket_label)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Request latency by route.', ['method', 'route', 'status'], LATENCY_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'http_response_size_bytes', 'Response body size by route.', ['method', 'route'], SIZE_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being handled.', ['method'])
+STAGE_DURATION = Histogram(
+    'app_stage_duration_seconds', 'Time spent in named stages inside request handlers.', ['route', 'stage'], LATENCY_BUCKETS
+)
+
+
+def _route_label(scope: Optional[dict]) -> str:
+    route = scope.get('route') if scope else None
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+@contextmanager
+def span(stage: str):
+    """
+    Times a stage of the current request, e.g. `with metrics.span('aggregate'): ...`.
+    Outside a request the stage is recorded under the 'background' route.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        scope = _current_scope.get()
+        route = _route_label(scope) if scope is not None else 'background'
+        STAGE_DURATION.observe(elapsed, route, stage)
+        recorder = stage_recorder.get()
+        if recorder is not None:
+            recorder.append({"stage": stage, "duration_ms": round(elapsed * 1000, 3)})
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, response size and in-flight requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        method = scope['method']
+        status = [500]
+        size = [0]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            elif message['type'] == 'http.response.body':
+                size[0] += len(message.get('body', b''))
+            await send(message)
+
+        token = _current_scope.set(scope)
+        REQUESTS_IN_FLIGHT.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            REQUESTS_IN_FLIGHT.dec(method)
+            _current_scope.reset(token)
+            route = _route_label(scope)
+            REQUEST_DURATION.observe(elapsed, method, route, str(status[0]))
+            RESPONSE_SIZE.observe(size[0], method, route)
+
+
+@router.get("/metrics")
+def get_metrics():
+    """Prometheus text exposition of all registered metrics."""
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import random
+import inspect
+import itertools
+import threading
+from collections import deque, Counter
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+import metrics
+
+# Profiling is off unless PROFILING_ENABLED is set; when off neither the middleware nor the routes are mounted
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+# Fraction of all requests to profile in addition to explicitly flagged ones
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "5"))
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "50"))
+# When set, the X-Debug-Profile header (or debug_profile query flag) must carry this token
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN")
+
+PROFILE_HEADER = b'x-debug-profile'
+PROFILE_QUERY_FLAG = 'debug_profile'
+
+router = APIRouter()
+
+_profiles: deque = deque(maxlen=PROFILING_BUFFER_SIZE)
+_profile_ids = itertools.count(1)
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    marker = 'site-packages' + os.sep
+    if marker in filename:
+        filename = filename.split(marker, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def _pandas_operation(stack: List[Any]) -> Optional[str]:
+    """The outermost pandas function on a stack (root first), i.e. the pandas call the app made."""
+    for code in stack:
+        if f'{os.sep}pandas{os.sep}' in code.co_filename:
+            return code.co_qualname
+    return None
+
+
+class _Sampler(threading.Thread):
+    """Samples the stacks of threads currently executing the request's endpoint."""
+
+    def __init__(self, scope: dict, interval: float):
+        super().__init__(daemon=True, name='request-profiler')
+        self.scope = scope
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.pandas_samples: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own_ident = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            endpoint = self.scope.get('endpoint')
+            # Decorated endpoints (e.g. query_cache.cached) run the handler itself further down the stack
+            endpoint_code = getattr(inspect.unwrap(endpoint), '__code__', None) if endpoint is not None else None
+            if endpoint_code is None:
+                continue
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame.f_code)
+                    frame = frame.f_back
+                stack.reverse()
+                # Only keep the part of the stack below this request's endpoint
+                for depth, code in enumerate(stack):
+                    if code is endpoint_code:
+                        stack = stack[depth:]
+                        break
+                else:
+                    continue
+                self.stacks[';'.join(_frame_name(code) for code in stack)] += 1
+                operation = _pandas_operation(stack)
+                if operation:
+                    self.pandas_samples[operation] += 1
+                self.samples += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def _call_tree(folded: Dict[str, int]) -> Dict[str, Any]:
+    """Builds a nested {name, value, children} tree (d3-flamegraph format) from folded stacks."""
+    root = {"name": "root", "value": 0, "children": {}}
+    for stack, count in folded.items():
+        root["value"] += count
+        node = root
+        for name in stack.split(';'):
+            child = node["children"].get(name)
+            if child is None:
+                child = node["children"][name] = {"name": name, "value": 0, "children": {}}
+            child["value"] += count
+            node = child
+
+    def finish(node):
+        children = sorted(node["children"].values(), key=lambda c: c["value"], reverse=True)
+        return {"name": node["name"], "value": node["value"], "children": [finish(c) for c in children]}
+
+    return finish(root)
+
+
+def _is_requested(scope: dict) -> bool:
+    flagged = None
+    for name, value in scope.get('headers', []):
+        if name == PROFILE_HEADER:
+            flagged = value.decode('latin-1')
+            break
+    if flagged is None:
+        values = parse_qs(scope.get('query_string', b'').decode('latin-1')).get(PROFILE_QUERY_FLAG)
+        flagged = values[0] if values else None
+    if flagged is not None:
+        return flagged == PROFILING_TOKEN if PROFILING_TOKEN else flagged.lower() not in ('0', 'false')
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that runs flagged or randomly sampled requests under the sampling profiler and keeps
+    the results in a bounded ring buffer.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'].startswith('/debug/profiles') or not _is_requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        interval = PROFILING_INTERVAL_MS / 1000
+        sampler = _Sampler(scope, interval)
+        stages: List[Dict[str, Any]] = []
+        token = metrics.stage_recorder.set(stages)
+        started_at = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - start
+            metrics.stage_recorder.reset(token)
+            _profiles.append({
+                "id": next(_profile_ids),
+                "method": scope['method'],
+                "path": scope['path'],
+                "query": scope.get('query_string', b'').decode('latin-1'),
+                "status": status[0],
+                "started_at": started_at.isoformat(),
+                "duration_ms": round(duration * 1000, 3),
+                "interval_ms": PROFILING_INTERVAL_MS,
+                "samples": sampler.samples,
+                "stages": stages,
+                "pandas_operations": [
+                    {"operation": op, "samples": n, "estimated_ms": round(n * PROFILING_INTERVAL_MS, 3)}
+                    for op, n in sampler.pandas_samples.most_common()
+                ],
+                "folded": dict(sampler.stacks),
+            })
+
+
+def _get_profile(profile_id: int) -> Dict[str, Any]:
+    for profile in _profiles:
+        if profile["id"] == profile_id:
+            return profile
+    raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found.")
+
+
+@router.get("/debug/profiles")
+def list_profiles():
+    """Summaries of the stored profiles, newest first."""
+    return [
+        {key: value for key, value in profile.items() if key not in ("folded", "stages", "pandas_operations")}
+        for profile in reversed(_profiles)
+    ]
+
+
+@router.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: int):
+    """A stored profile with its stage timings, pandas operation timings and call tree."""
+    profile = _get_profile(profile_id)
+    result = {key: value for key, value in profile.items() if key != "folded"}
+    result["call_tree"] = _call_tree(profile["folded"])
+    return result
+
+
+@router.get("/debug/profiles/{profile_id}/folded")
+def get_profile_folded(profile_id: int):
+    """The profile as folded stacks, ready for flamegraph.pl or speedscope."""
+    profile = _get_profile(profile_id)
+    lines = [f"{stack} {count}" for stack, count in sorted(profile["folded"].items())]
+    return PlainTextResponse('\n'.join(lines) + '\n')
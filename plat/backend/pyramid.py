@@ -0,0 +1,213 @@
+import logging
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Dimensions kept at every level; counts for any filter/grouping on these come from the pyramid
+DIMENSIONS = ['CSP', 'AppCode', 'ConfigRule', 'Environment', 'NarrowEnvironment']
+# Finest to coarsest, with the level each one is rolled up from (weeks straddle months, so both come from days)
+LEVELS = ['hour', 'day', 'week', 'month']
+_ROLLUP_SOURCE = {'day': 'hour', 'week': 'day', 'month': 'day'}
+_FREQUENCIES = {'hour': 'h', 'day': 'D', 'week': 'W-MON', 'month': 'MS'}
+_LABEL_FORMATS = {'hour': '%Y-%m-%dT%H:00', 'day': '%Y-%m-%d', 'week': '%Y-%m-%d', 'month': '%Y-%m'}
+# Grouping keys derived from tCreated, the level that answers them and how they are formatted
+DERIVED_KEYS = {'Month': ('month', '%Y-%m'), 'MonthName': ('month', '%b'), 'Day': ('day', '%Y-%m-%d')}
+
+
+def _floor(timestamps: pd.Series, level: str) -> pd.Series:
+    """
+    Bucket starts in wall-clock time: tz-aware buckets begin at local midnights (and local hours)
+    on both sides of a DST change.
+    """
+    tz = getattr(timestamps.dt, 'tz', None)
+    if level == 'hour':
+        # Subtracting the time past the hour keeps each instant's own offset, so the repeated hour of a
+        # DST change is never ambiguous
+        return timestamps - pd.to_timedelta(timestamps.dt.minute * 60 + timestamps.dt.second, unit='s') \
+            - pd.to_timedelta(timestamps.dt.microsecond * 1000 + timestamps.dt.nanosecond, unit='ns')
+    wall = timestamps.dt.tz_localize(None) if tz is not None else timestamps
+    if level == 'day':
+        floored = wall.dt.floor('D')
+    else:
+        # Weeks start on Monday
+        floored = wall.dt.to_period('W-SUN' if level == 'week' else 'M').dt.start_time.dt.as_unit(wall.dt.unit)
+    if tz is None:
+        return floored
+    # Midnight can be skipped or repeated by a DST change in some zones; take the first valid instant
+    return floored.dt.tz_localize(tz, ambiguous=np.ones(len(floored), dtype=bool), nonexistent='shift_forward')
+
+
+def _floor_one(timestamp: pd.Timestamp, level: str) -> pd.Timestamp:
+    return _floor(pd.Series([timestamp]), level).iloc[0]
+
+
+class TrendPyramid:
+    """
+    Ticket counts per (DIMENSIONS, time bucket) at hourly, daily, weekly and monthly resolution,
+    precomputed at load. Each level is sorted by bucket, so a date range is a binary search and a query
+    touches only the cells of the buckets it returns, however many tickets they stand for.
+    """
+
+    def __init__(self):
+        self._parts: List[pd.DataFrame] = []
+        self._levels: Dict[str, pd.DataFrame] = {}
+
+    def add(self, df: pd.DataFrame):
+        """Adds a chunk of tickets to the hourly base level."""
+        if df.empty:
+            return
+        cells = df[DIMENSIONS].assign(bucket=_floor(df['tCreated'], 'hour'))
+        grouped = cells.groupby(DIMENSIONS + ['bucket'], dropna=False, observed=True).size()
+        self._parts.append(grouped.reset_index(name='count'))
+
+    def finalize(self):
+        """Merges the chunks into the hourly level and rolls it up into the coarser levels."""
+        if self._parts:
+            base = pd.concat(self._parts, ignore_index=True)
+        else:
+            base = pd.DataFrame({**{d: pd.Series(dtype=object) for d in DIMENSIONS},
+                                 'bucket': pd.Series(dtype='datetime64[ns, UTC]'), 'count': pd.Series(dtype='int64')})
+        self._parts = []
+        for column in DIMENSIONS:
+            # Sorted categories, so grouped results come back in the same order as grouping the raw strings
+            base[column] = base[column].astype('category')
+        for level in LEVELS:
+            source = self._levels[_ROLLUP_SOURCE[level]] if level in _ROLLUP_SOURCE else base
+            cells = source.assign(bucket=_floor(source['bucket'], level))
+            cells = cells.groupby(DIMENSIONS + ['bucket'], dropna=False, observed=True)['count'].sum().reset_index()
+            self._levels[level] = cells.sort_values('bucket', kind='stable').reset_index(drop=True)
+        logger.info("Built trend pyramid: " + ', '.join(f"{level} {len(self._levels[level])} cells" for level in LEVELS))
+
+    @property
+    def timezone(self):
+        """Timezone of the buckets (that of the tickets' tCreated), None if they are naive."""
+        hours = self._levels.get('hour')
+        return getattr(hours['bucket'].dt, 'tz', None) if hours is not None else None
+
+    @property
+    def extent(self) -> Optional[tuple]:
+        hours = self._levels.get('hour')
+        if hours is None or hours.empty:
+            return None
+        return hours['bucket'].iloc[0], hours['bucket'].iloc[-1]
+
+    def _cells(
+        self,
+        level: str,
+        start: Optional[pd.Timestamp] = None,
+        end: Optional[pd.Timestamp] = None,
+        csp: Optional[str] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+        app_codes: Optional[List[str]] = None,
+        config_rules: Optional[List[str]] = None,
+    ) -> pd.DataFrame:
+        cells = self._levels[level]
+        buckets = cells['bucket']
+        lo = 0 if start is None else buckets.searchsorted(start, side='left')
+        hi = len(cells) if end is None else buckets.searchsorted(end, side='right')
+        cells = cells.iloc[lo:hi]
+        mask = np.ones(len(cells), dtype=bool)
+        if csp:
+            mask &= (cells['CSP'] == csp).to_numpy()
+        if environment and environment != 'All':
+            mask &= (cells['Environment'] == environment).to_numpy()
+        if narrow_environment and narrow_environment != 'All':
+            mask &= (cells['NarrowEnvironment'] == narrow_environment).to_numpy()
+        if app_codes is not None:
+            mask &= cells['AppCode'].isin(app_codes).to_numpy()
+        if config_rules is not None:
+            mask &= cells['ConfigRule'].isin(config_rules).to_numpy()
+        return cells[mask]
+
+    @staticmethod
+    def _restore_dtypes(result: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+        for column in columns:
+            if isinstance(result[column].dtype, pd.CategoricalDtype):
+                result[column] = result[column].astype(result[column].cat.categories.dtype)
+        return result
+
+    def count(
+        self,
+        by: List[str],
+        year: Optional[int] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+        csp: Optional[str] = None,
+        app_codes: Optional[List[str]] = None,
+        month: Optional[int] = None,
+        fillna: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Same result as count_tickets() for groupings on DIMENSIONS plus one tCreated-derived key
+        (Month, MonthName or Day), answered from the month or day level.
+        """
+        derived = [column for column in by if column in DERIVED_KEYS]
+        level = DERIVED_KEYS[derived[0]][0] if derived else 'month'
+        start = end = None
+        if year:
+            start = pd.Timestamp(year=year, month=month or 1, day=1, tz=self.timezone)
+            end = start + pd.offsets.MonthEnd(1) if month else pd.Timestamp(year=year, month=12, day=31, tz=self.timezone)
+        cells = self._cells(level, start, end, csp, environment, narrow_environment, app_codes)
+        if month:
+            cells = cells[cells['bucket'].dt.month == month]
+
+        keys = []
+        for column in by:
+            if column in DERIVED_KEYS:
+                # Format each distinct bucket once rather than every cell
+                codes, buckets = pd.factorize(cells['bucket'])
+                labels = np.asarray(buckets.strftime(DERIVED_KEYS[column][1]), dtype=object)
+                key = pd.Series(labels[codes], index=cells.index, name=column, dtype=str)
+            else:
+                key = cells[column]
+                if fillna and column in fillna:
+                    key = key.astype(key.cat.categories.dtype).fillna(fillna[column])
+            keys.append(key)
+        result = cells['count'].groupby(keys, observed=True).sum().reset_index(name='count')
+        result = result[result['count'] > 0].reset_index(drop=True)
+        result['count'] = result['count'].astype('int64')
+        return self._restore_dtypes(result, [column for column in by if column not in DERIVED_KEYS])
+
+    def choose_level(self, start: pd.Timestamp, end: pd.Timestamp, max_points: int) -> str:
+        """The finest level whose bucket count over [start, end] is at most max_points."""
+        for level in LEVELS:
+            if self.bucket_count(start, end, level) <= max_points:
+                return level
+        return LEVELS[-1]
+
+    @staticmethod
+    def bucket_count(start: pd.Timestamp, end: pd.Timestamp, level: str) -> int:
+        return len(pd.date_range(_floor_one(start, level), end, freq=_FREQUENCIES[level]))
+
+    def series(
+        self,
+        start: pd.Timestamp,
+        end: pd.Timestamp,
+        level: str,
+        group_by: Optional[str] = None,
+        **filters,
+    ) -> Dict[str, Any]:
+        """Counts per bucket over [start, end], in total and per value of `group_by`, zero-filled."""
+        bucket_starts = pd.date_range(_floor_one(start, level), end, freq=_FREQUENCIES[level])
+        cells = self._cells(level, bucket_starts[0] if len(bucket_starts) else start, end, **filters)
+        positions = np.searchsorted(bucket_starts.as_unit('ns').asi8, pd.DatetimeIndex(cells['bucket']).as_unit('ns').asi8)
+
+        total = np.bincount(positions, weights=cells['count'].to_numpy(), minlength=len(bucket_starts)).astype(np.int64)
+        result = {
+            "resolution": level,
+            "buckets": bucket_starts.strftime(_LABEL_FORMATS[level]).tolist(),
+            "total": total.tolist(),
+        }
+        if group_by:
+            groups = pd.DataFrame({'key': cells[group_by].to_numpy(), 'position': positions, 'count': cells['count'].to_numpy()})
+            groups = groups.dropna(subset=['key'])
+            series = []
+            for key, group in groups.groupby('key', sort=True):
+                counts = np.bincount(group['position'], weights=group['count'], minlength=len(bucket_starts))
+                series.append({"key": str(key), "counts": counts.astype(np.int64).tolist()})
+            result["series"] = series
+        return result
@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import inspect
+import functools
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple, Sequence
+
+from fastapi import Response
+from pydantic.fields import FieldInfo
+from starlette.concurrency import run_in_threadpool
+
+import metrics
+import compression
+
+logger = logging.getLogger(__name__)
+
+# Result cache for the GET analytics routes, keyed by endpoint + normalized parameters + data version
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "512"))
+# Compact log of how often each parameter set was requested, used to warm the cache after a (re)load
+QUERY_LOG_PATH = os.getenv("QUERY_LOG_PATH", "query_log.json")
+QUERY_LOG_MAX_ENTRIES = int(os.getenv("QUERY_LOG_MAX_ENTRIES", "500"))
+QUERY_LOG_FLUSH_SECONDS = float(os.getenv("QUERY_LOG_FLUSH_SECONDS", "60"))
+# Warming precomputes the most frequent parameter sets until either limit is reached
+CACHE_WARM_TOP_N = int(os.getenv("CACHE_WARM_TOP_N", "50"))
+CACHE_WARM_BUDGET_SECONDS = float(os.getenv("CACHE_WARM_BUDGET_SECONDS", "30"))
+
+CACHE_REQUESTS = metrics.Counter(
+    'query_cache_requests_total',
+    'Cached endpoint lookups by result: hit, warm_hit (served from a warmed entry), coalesced '
+    '(waited for an identical in-flight computation) or miss.',
+    ['endpoint', 'result'],
+)
+CACHE_WARMED = metrics.Counter('query_cache_warmed_total', 'Entries precomputed by cache warming.', ['endpoint'])
+CACHE_ENTRIES = metrics.Gauge('query_cache_entries', 'Entries currently held in the query cache.')
+CACHE_LAST_WARM_SECONDS = metrics.Gauge('query_cache_last_warm_seconds', 'Duration of the most recent warming run.')
+
+# endpoint name -> {func: undecorated handler, dataset: data it reads, ttl_seconds}
+_endpoints: Dict[str, Dict[str, Any]] = {}
+_versions: Dict[str, int] = {}
+_entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+# (endpoint, params, version) -> the computation identical concurrent requests share
+_in_flight: Dict[Tuple[str, str, int], "_Flight"] = {}
+_lock = threading.Lock()
+
+_query_log: Dict[str, Dict[str, int]] = {}
+_query_log_lock = threading.Lock()
+_query_log_dirty = False
+# Background writer of the query log, so requests never wait on the file
+_flusher: Optional[threading.Thread] = None
+_flusher_stop = threading.Event()
+
+
+def normalize_params(params: Dict[str, Any]) -> str:
+    """Canonical form of a parameter set: unset parameters dropped, keys sorted."""
+    return json.dumps({k: v for k, v in params.items() if v is not None}, sort_keys=True, default=str)
+
+
+def data_version(dataset: str) -> int:
+    return _versions.get(dataset, 0)
+
+
+def invalidate(dataset: Optional[str] = None):
+    """Bumps the version of one dataset (or all of them) and drops the cached results computed from it."""
+    with _lock:
+        datasets = [dataset] if dataset else list({e['dataset'] for e in _endpoints.values()})
+        for name in datasets:
+            _versions[name] = _versions.get(name, 0) + 1
+        for key in [k for k in _entries if _endpoints[k[0]]['dataset'] in datasets]:
+            del _entries[key]
+        CACHE_ENTRIES.set(value=len(_entries))
+
+
+def _lookup(key: Tuple[str, str], version: int) -> Optional[Dict[str, Any]]:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if entry["version"] != version or (entry["expires_at"] and entry["expires_at"] < time.monotonic()):
+            del _entries[key]
+            CACHE_ENTRIES.set(value=len(_entries))
+            return None
+        _entries.move_to_end(key)
+        return entry
+
+
+def _store(key: Tuple[str, str], version: int, value: Any, warmed: bool) -> Optional[Dict[str, Any]]:
+    settings = _endpoints[key[0]]
+    # Responses built by the handler (e.g. error JSONResponses) are not cached, nor results of superseded data
+    if isinstance(value, Response) or version != data_version(settings["dataset"]):
+        return None
+    ttl_seconds = settings["ttl_seconds"]
+    entry = {
+        "value": value,
+        "version": version,
+        "expires_at": time.monotonic() + ttl_seconds if ttl_seconds else None,
+        "warmed": warmed,
+    }
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > QUERY_CACHE_SIZE:
+            _entries.popitem(last=False)
+        CACHE_ENTRIES.set(value=len(_entries))
+    return entry
+
+
+def _served(entry: Optional[Dict[str, Any]]):
+    """Lets the compression middleware keep this response's compressed bytes in its cache entry."""
+    if entry is not None:
+        compression.attach_cache_entry(entry)
+
+
+class _Flight:
+    """
+    A computation in progress. The first request computes; identical requests arriving meanwhile wait
+    for it on the event loop and get the same result (or exception).
+    """
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.value = None
+        # The cache entry the leader stored, so followers' responses also reuse its compressed bytes
+        self.entry: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def _join_flight(key: Tuple[str, str], version: int) -> Tuple["_Flight", bool]:
+    """Returns the flight for this query and whether the caller leads (computes) it."""
+    flight_key = key + (version,)
+    with _lock:
+        flight = _in_flight.get(flight_key)
+        if flight is not None:
+            return flight, False
+        flight = _in_flight[flight_key] = _Flight()
+        return flight, True
+
+
+def _land_flight(key: Tuple[str, str], version: int, flight: "_Flight"):
+    with _lock:
+        _in_flight.pop(key + (version,), None)
+    flight.done.set()
+
+
+def _record_query(endpoint: str, params: str):
+    global _query_log_dirty
+    with _query_log_lock:
+        counts = _query_log.setdefault(endpoint, {})
+        counts[params] = counts.get(params, 0) + 1
+        if len(counts) > QUERY_LOG_MAX_ENTRIES:
+            # Forget the rarest half so the log stays compact
+            keep = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:QUERY_LOG_MAX_ENTRIES // 2]
+            _query_log[endpoint] = dict(keep)
+        _query_log_dirty = True
+
+
+def load_query_log():
+    """Reads the query log written by a previous run, if any."""
+    if not os.path.exists(QUERY_LOG_PATH):
+        return
+    try:
+        with open(QUERY_LOG_PATH) as f:
+            loaded = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable query log {QUERY_LOG_PATH}: {e}")
+        return
+    with _query_log_lock:
+        for endpoint, counts in loaded.items():
+            merged = _query_log.setdefault(endpoint, {})
+            for params, count in counts.items():
+                merged[params] = merged.get(params, 0) + count
+
+
+def flush_query_log():
+    global _query_log_dirty
+    with _query_log_lock:
+        if not _query_log_dirty:
+            return
+        snapshot = json.dumps(_query_log)
+        _query_log_dirty = False
+    try:
+        tmp_path = f"{QUERY_LOG_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(snapshot)
+        os.replace(tmp_path, QUERY_LOG_PATH)
+    except OSError as e:
+        logger.warning(f"Could not write query log {QUERY_LOG_PATH}: {e}")
+        with _query_log_lock:
+            _query_log_dirty = True
+
+
+def _flush_periodically():
+    while not _flusher_stop.wait(QUERY_LOG_FLUSH_SECONDS):
+        flush_query_log()
+
+
+def start_query_log_flusher():
+    """Writes the query log every QUERY_LOG_FLUSH_SECONDS from a background thread."""
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    _flusher_stop.clear()
+    _flusher = threading.Thread(target=_flush_periodically, name="query-log-flusher", daemon=True)
+    _flusher.start()
+
+
+def stop_query_log_flusher():
+    """Stops the background writer and writes the log a last time."""
+    _flusher_stop.set()
+    if _flusher is not None:
+        _flusher.join()
+    flush_query_log()
+
+
+def cached(endpoint: str, dataset: str = 'tickets', ttl_seconds: Optional[float] = None, free_text: Sequence[str] = ()):
+    """
+    Caches a GET handler's result per normalized parameter set and data version, coalesces identical
+    concurrent calls into one computation, and records the parameter set in the query log.
+    Parameter sets with any `free_text` parameter (typed search strings) are never logged.
+    Works for both sync and async handlers; sync ones are run in the threadpool.
+    """
+    def decorator(func):
+        _endpoints[endpoint] = {"func": func, "dataset": dataset, "ttl_seconds": ttl_seconds}
+
+        def prepare(kwargs):
+            params = normalize_params(kwargs)
+            if not any(kwargs.get(name) for name in free_text):
+                _record_query(endpoint, params)
+            return (endpoint, params), data_version(dataset)
+
+        def hit(entry):
+            CACHE_REQUESTS.inc(endpoint, 'warm_hit' if entry["warmed"] else 'hit')
+            _served(entry)
+            return entry["value"]
+
+        is_async = asyncio.iscoroutinefunction(func)
+
+        # Sync handlers run in the threadpool from this async wrapper, so callers waiting for another
+        # request's computation wait on the event loop instead of holding a worker thread
+        @functools.wraps(func)
+        async def wrapper(**kwargs):
+            key, version = prepare(kwargs)
+            entry = _lookup(key, version)
+            if entry is not None:
+                return hit(entry)
+            flight, leader = _join_flight(key, version)
+            if not leader:
+                CACHE_REQUESTS.inc(endpoint, 'coalesced')
+                await flight.done.wait()
+                value = flight.result()
+                _served(flight.entry)
+                return value
+            CACHE_REQUESTS.inc(endpoint, 'miss')
+            try:
+                flight.value = await func(**kwargs) if is_async else await run_in_threadpool(func, **kwargs)
+                flight.entry = _store(key, version, flight.value, warmed=False)
+                _served(flight.entry)
+            except BaseException as e:
+                flight.error = e
+                raise
+            finally:
+                _land_flight(key, version, flight)
+            return flight.value
+        return wrapper
+
+    return decorator
+
+
+def _top_queries(limit: int) -> List[Tuple[str, str]]:
+    with _query_log_lock:
+        ranked = [
+            (count, endpoint, params)
+            for endpoint, counts in _query_log.items() if endpoint in _endpoints
+            for params, count in counts.items()
+        ]
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [(endpoint, params) for _, endpoint, params in ranked[:limit]]
+
+
+def _with_defaults(func, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """The logged parameters plus the defaults FastAPI would fill in for the rest (Query(...) unwrapped)."""
+    for name, parameter in inspect.signature(func).parameters.items():
+        if name not in kwargs and isinstance(parameter.default, FieldInfo):
+            kwargs[name] = parameter.default.default
+    return kwargs
+
+
+def warm(top_n: int = CACHE_WARM_TOP_N, budget_seconds: float = CACHE_WARM_BUDGET_SECONDS) -> int:
+    """Precomputes the most frequently logged parameter sets; returns how many entries were filled."""
+    start = time.perf_counter()
+    warmed = 0
+    for endpoint, params in _top_queries(min(top_n, QUERY_CACHE_SIZE)):
+        if time.perf_counter() - start >= budget_seconds:
+            logger.info(f"Cache warming stopped after {budget_seconds}s budget")
+            break
+        func = _endpoints[endpoint]["func"]
+        key, version = (endpoint, params), data_version(_endpoints[endpoint]["dataset"])
+        if _lookup(key, version) is not None:
+            continue
+        try:
+            kwargs = _with_defaults(func, json.loads(params))
+            value = asyncio.run(func(**kwargs)) if asyncio.iscoroutinefunction(func) else func(**kwargs)
+        except Exception as e:
+            logger.warning(f"Cache warming skipped {endpoint} {params}: {e}")
+            continue
+        _store(key, version, value, warmed=True)
+        CACHE_WARMED.inc(endpoint)
+        warmed += 1
+    duration = time.perf_counter() - start
+    CACHE_LAST_WARM_SECONDS.set(value=round(duration, 3))
+    logger.info(f"Cache warming filled {warmed} entries in {duration:.2f}s")
+    return warmed
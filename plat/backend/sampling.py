@@ -0,0 +1,147 @@
+import os
+import logging
+from statistics import NormalDist
+from typing import Optional, List, Dict, Any
+
+import numpy as np
+import pandas as pd
+
+from pyramid import DERIVED_KEYS
+
+logger = logging.getLogger(__name__)
+
+# Fraction of each stratum kept, with a floor so small strata still get a usable sample
+APPROX_SAMPLE_RATE = float(os.getenv("APPROX_SAMPLE_RATE", "0.05"))
+APPROX_MIN_PER_STRATUM = int(os.getenv("APPROX_MIN_PER_STRATUM", "5"))
+APPROX_CONFIDENCE = float(os.getenv("APPROX_CONFIDENCE", "0.95"))
+_Z = NormalDist().inv_cdf((1 + APPROX_CONFIDENCE) / 2)
+
+# Columns kept per sampled ticket: those count() filters and groups on
+SAMPLE_COLUMNS = ['CSP', 'Environment', 'NarrowEnvironment', 'AppCode', 'ConfigRule', 'Priority', 'tCreated']
+
+
+class StratifiedSample:
+    """
+    A stratified random sample of the tickets, drawn at load, that estimates count_tickets() results
+    by scaling each sampled ticket up to its stratum, with a confidence interval per group from the
+    stratified-sampling variance. A query reads the sample instead of every ticket, so it costs
+    O(sample size) however many years and environments it covers.
+    """
+
+    def __init__(self, seed: int = 0):
+        self._rng = np.random.default_rng(seed)
+        self._parts: List[pd.DataFrame] = []
+        self._population: List[np.ndarray] = []
+        self._size: List[np.ndarray] = []
+        self._num_strata = 0
+        self._sample: Optional[pd.DataFrame] = None
+        self.population = np.zeros(0, dtype=np.int64)
+        self.size = np.zeros(0, dtype=np.int64)
+
+    def add(self, df: pd.DataFrame):
+        """Samples a chunk of tickets; a stratum must not be split across chunks (iter_ticket_chunks never does)."""
+        if df.empty:
+            return
+        created = df['tCreated']
+        # A stratum is one CSP, year, month and AppCode. A count comes out exact only when each group it
+        # sums is covered by fully-sampled strata (or by strata wholly inside the group, which scale back
+        # to their exact size); a group holding part of a partly sampled stratum is an estimate.
+        strata = df.groupby([df['CSP'], created.dt.year, created.dt.month, df['AppCode']], dropna=False, sort=False).ngroup().to_numpy()
+        population = np.bincount(strata)
+        size = np.minimum(population, np.maximum(APPROX_MIN_PER_STRATUM, np.ceil(population * APPROX_SAMPLE_RATE))).astype(np.int64)
+
+        # Shuffle within each stratum and keep its first `size` tickets
+        order = np.lexsort((self._rng.random(len(df)), strata))
+        sorted_strata = strata[order]
+        starts = np.searchsorted(sorted_strata, np.arange(len(population)))
+        rank = np.arange(len(df)) - starts[sorted_strata]
+        keep = np.sort(order[rank < size[sorted_strata]])
+
+        sample = df.iloc[keep][SAMPLE_COLUMNS].reset_index(drop=True)
+        sample['stratum'] = strata[keep] + self._num_strata
+        self._parts.append(sample)
+        self._population.append(population)
+        self._size.append(size)
+        self._num_strata += len(population)
+
+    def finalize(self):
+        if self._parts:
+            self._sample = pd.concat(self._parts, ignore_index=True)
+            self.population = np.concatenate(self._population)
+            self.size = np.concatenate(self._size)
+        else:
+            self._sample = pd.DataFrame(columns=SAMPLE_COLUMNS + ['stratum'])
+        self._parts, self._population, self._size = [], [], []
+        logger.info(f"Drew a stratified sample of {len(self._sample)} of {int(self.population.sum())} tickets over {len(self.population)} strata")
+
+    def count(
+        self,
+        by: List[str],
+        year: Optional[int] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+        csp: Optional[str] = None,
+        app_codes: Optional[List[str]] = None,
+        month: Optional[int] = None,
+        fillna: Optional[Dict[str, str]] = None,
+    ) -> pd.DataFrame:
+        """
+        Estimated count_tickets() result: the columns of `by`, the estimated 'count' and the
+        'count_low'/'count_high' bounds of its APPROX_CONFIDENCE interval.
+        """
+        df = self._sample
+        mask = np.ones(len(df), dtype=bool)
+        if year:
+            mask &= (df['tCreated'].dt.year == year).to_numpy()
+        if month:
+            mask &= (df['tCreated'].dt.month == month).to_numpy()
+        if csp:
+            mask &= (df['CSP'] == csp).to_numpy()
+        if environment and environment != 'All':
+            mask &= (df['Environment'] == environment).to_numpy()
+        if narrow_environment and narrow_environment != 'All':
+            mask &= (df['NarrowEnvironment'] == narrow_environment).to_numpy()
+        if app_codes is not None:
+            mask &= df['AppCode'].isin(app_codes).to_numpy()
+        df = df[mask]
+        if df.empty:
+            return pd.DataFrame(columns=by + ['count', 'count_low', 'count_high'])
+
+        keys = []
+        for column in by:
+            key = df['tCreated'].dt.strftime(DERIVED_KEYS[column][1]).rename(column) if column in DERIVED_KEYS else df[column]
+            if fillna and column in fillna:
+                key = key.fillna(fillna[column])
+            keys.append(key)
+        hits = df.groupby(keys + [df['stratum']]).size().reset_index(name='hits')
+
+        # Per (group, stratum): scaled-up count and the variance of estimating a proportion of the stratum
+        stratum = hits['stratum'].to_numpy()
+        population = self.population[stratum].astype(float)
+        size = self.size[stratum].astype(float)
+        share = hits['hits'].to_numpy() / size
+        hits['estimate'] = population * share
+        hits['variance'] = population ** 2 * (1 - size / population) * share * (1 - share) / np.maximum(size - 1, 1)
+
+        result = hits.groupby(by, sort=True)[['estimate', 'variance', 'hits']].sum().reset_index()
+        margin = _Z * np.sqrt(result['variance'].to_numpy())
+        estimate = result['estimate'].to_numpy()
+        result['count'] = np.round(estimate).astype(np.int64)
+        # Every sampled ticket exists, so the lower bound never drops below the sampled count
+        result['count_low'] = np.maximum(np.floor(estimate - margin), result['hits'].to_numpy()).astype(np.int64)
+        result['count_high'] = np.ceil(estimate + margin).astype(np.int64)
+        return result[by + ['count', 'count_low', 'count_high']]
+
+
+def describe(counts: pd.DataFrame, by: List[str]) -> Dict[str, Any]:
+    """The "approximate" marker of an approx=true response: how its counts were computed and their intervals."""
+    sampled = counts.attrs.get('method') == 'stratified_sample'
+    return {
+        "method": counts.attrs.get('method', 'exact'),
+        "confidence": APPROX_CONFIDENCE if sampled else 1.0,
+        "sample_rate": APPROX_SAMPLE_RATE if sampled else 1.0,
+        "intervals": [
+            {**{column: row[column] for column in by}, "count": int(row['count']), "low": int(row['count_low']), "high": int(row['count_high'])}
+            for row in counts[by + ['count', 'count_low', 'count_high']].to_dict(orient='records')
+        ],
+    }
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import time
+import urllib.request
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+HEARTBEAT_COLUMNS = [
+    'CSP', 'Environment', 'NarrowEnvironment', 'AlertType', 'Priority', 'Key', 'AppCode',
+    'ConfigRule', 'Summary', 'Account', 'tCreated', 'tResolved', 'TimeToResolve'
+]
+
+# A burst is (offset_seconds, duration_seconds, failure_rate, fraction_of_rules_affected)
+Burst = Tuple[float, float, float, float]
+
+
+def generate_heartbeat_stream(
+    csp: str,
+    num_rules: int = 1000,
+    interval_seconds: float = 30,
+    duration_seconds: float = 3600,
+    start: Optional[datetime] = None,
+    failure_rate: float = 0.05,
+    bursts: Optional[List[Burst]] = None,
+    jitter_seconds: float = 0,
+    seed: Optional[int] = None,
+) -> pd.DataFrame:
+    """
+    Generates a heartbeat stream where every ConfigRule reports once per interval.
+    All columns are built with numpy in one pass, so millions of events take seconds.
+    """
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(start or datetime.now()).floor('s')
+
+    rules = np.array([f'{csp}-{i:05d}' for i in range(num_rules)])
+    offsets = np.arange(0, duration_seconds, interval_seconds)
+    n = len(offsets) * num_rules
+
+    # Tick-major order: every rule for tick 0, then every rule for tick 1, ...
+    event_offsets = np.repeat(offsets, num_rules)
+    rule_idx = np.tile(np.arange(num_rules), len(offsets))
+    if jitter_seconds:
+        event_offsets = event_offsets + rng.uniform(0, jitter_seconds, n)
+
+    failed = rng.random(n) < failure_rate
+    for burst_offset, burst_duration, burst_rate, rule_fraction in bursts or []:
+        affected_rules = rng.random(num_rules) < rule_fraction
+        in_window = (event_offsets >= burst_offset) & (event_offsets < burst_offset + burst_duration)
+        in_burst = in_window & affected_rules[rule_idx]
+        failed[in_burst] = rng.random(int(in_burst.sum())) < burst_rate
+
+    created = start + pd.to_timedelta(event_offsets, unit='s')
+    resolve_delta = pd.to_timedelta(rng.integers(5, 30, n), unit='m')
+    resolved = pd.Series(created + resolve_delta).where(~failed)
+
+    df = pd.DataFrame({
+        'CSP': csp,
+        'Environment': 'PROD',
+        'NarrowEnvironment': 'Prod',
+        'AlertType': 'Heartbeat',
+        'Priority': 'Critical',
+        'Key': np.char.add(f'HB-{csp}-SIM-', np.arange(1, n + 1).astype(str)),
+        'AppCode': 'MONITOR',
+        'ConfigRule': rules[rule_idx],
+        'Summary': np.where(failed, 'Heartbeat Check - Failed', 'Heartbeat Check - Success'),
+        'Account': rng.integers(10**11, 10**12 - 1, n).astype(str),
+        'tCreated': created,
+        'tResolved': resolved,
+    })
+    df['TimeToResolve'] = df['tResolved'] - df['tCreated']
+    return df.sort_values('tCreated', kind='stable', ignore_index=True)
+
+
+def _to_records(batch: pd.DataFrame) -> List[dict]:
+    batch = batch.copy()
+    batch['tCreated'] = batch['tCreated'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    batch['tResolved'] = batch['tResolved'].dt.strftime('%Y-%m-%dT%H:%M:%S')
+    batch['TimeToResolve'] = batch['TimeToResolve'].astype(str).replace('NaT', None)
+    batch = batch.astype(object).where(batch.notna(), None)
+    return batch[HEARTBEAT_COLUMNS].to_dict(orient='records')
+
+
+def append_to_file(batch: pd.DataFrame, path: str):
+    """Appends a batch to a heartbeat CSV, writing the header only when the file is new."""
+    write_header = not os.path.exists(path) or os.path.getsize(path) == 0
+    batch[HEARTBEAT_COLUMNS].to_csv(path, mode='a', header=write_header, index=False)
+
+
+def post_to_backend(batch: pd.DataFrame, url: str):
+    """Posts a batch to the backend heartbeat ingest endpoint."""
+    body = json.dumps(_to_records(batch)).encode('utf-8')
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'}, method='POST')
+    with urllib.request.urlopen(request) as response:
+        response.read()
+
+
+def replay(df: pd.DataFrame, sink, speed: float = 1.0, batch_seconds: float = 1.0) -> dict:
+    """
+    Replays a stream against the clock in batches of `batch_seconds` event time.
+    speed=1 is real time, speed=60 plays one hour per minute and speed=0 sends as fast as possible.
+    """
+    if df.empty:
+        return {"events": 0, "batches": 0, "elapsed_seconds": 0.0, "events_per_second": 0.0}
+
+    event_seconds = (df['tCreated'] - df['tCreated'].iloc[0]).dt.total_seconds().to_numpy()
+    batch_ids = (event_seconds // batch_seconds).astype(np.int64)
+    boundaries = np.flatnonzero(np.diff(batch_ids)) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(df)]))
+
+    wall_start = time.perf_counter()
+    for batch_start, batch_end in zip(starts, ends):
+        if speed > 0:
+            due = batch_ids[batch_start] * batch_seconds / speed
+            delay = due - (time.perf_counter() - wall_start)
+            if delay > 0:
+                time.sleep(delay)
+        sink(df.iloc[batch_start:batch_end])
+    elapsed = time.perf_counter() - wall_start
+
+    return {
+        "events": len(df),
+        "batches": len(starts),
+        "elapsed_seconds": round(elapsed, 3),
+        "events_per_second": round(len(df) / elapsed, 1) if elapsed > 0 else float('inf'),
+    }
+
+
+def _parse_burst(value: str) -> Burst:
+    parts = [float(p) for p in value.split(':')]
+    if len(parts) != 4:
+        raise argparse.ArgumentTypeError("Burst must be offset:duration:failure_rate:rule_fraction")
+    return tuple(parts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and replay a synthetic heartbeat feed.")
+    parser.add_argument('--csp', default='AWS', choices=['AWS', 'GCP'])
+    parser.add_argument('--rules', type=int, default=1000, help="Number of ConfigRules reporting heartbeats.")
+    parser.add_argument('--interval', type=float, default=30, help="Seconds between heartbeats per rule.")
+    parser.add_argument('--duration', type=float, default=3600, help="Seconds of event time to generate.")
+    parser.add_argument('--failure-rate', type=float, default=0.05)
+    parser.add_argument('--burst', type=_parse_burst, action='append', default=[],
+                        help="Failure burst as offset:duration:failure_rate:rule_fraction (repeatable).")
+    parser.add_argument('--jitter', type=float, default=0, help="Uniform jitter in seconds added to each heartbeat.")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed multiplier; 0 sends as fast as possible.")
+    parser.add_argument('--batch-seconds', type=float, default=1.0, help="Event-time window sent per batch.")
+    parser.add_argument('--file', help="Append the stream to this CSV file.")
+    parser.add_argument('--url', help="POST the stream to this ingest URL, e.g. http://localhost:8000/api/heartbeats")
+    args = parser.parse_args()
+
+    df = generate_heartbeat_stream(
+        args.csp, num_rules=args.rules, interval_seconds=args.interval, duration_seconds=args.duration,
+        failure_rate=args.failure_rate, bursts=args.burst, jitter_seconds=args.jitter, seed=args.seed,
+    )
+    print(f"Generated {len(df)} heartbeats for {args.rules} {args.csp} ConfigRules.")
+
+    if args.url:
+        stats = replay(df, lambda batch: post_to_backend(batch, args.url), args.speed, args.batch_seconds)
+    elif args.file:
+        stats = replay(df, lambda batch: append_to_file(batch, args.file), args.speed, args.batch_seconds)
+    else:
+        print("No --file or --url given; nothing replayed.")
+        return
+    print(f"Replayed {stats['events']} events in {stats['batches']} batches "
+          f"over {stats['elapsed_seconds']}s ({stats['events_per_second']} events/s).")
+
+
+if __name__ == "__main__":
+    main()
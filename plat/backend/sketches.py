@@ -0,0 +1,144 @@
+import math
+import logging
+from typing import Optional, List, Dict, Any, Sequence
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Relative accuracy of every reported percentile: the estimate is within 1% of the true value
+RELATIVE_ACCURACY = 0.01
+_GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+
+# Dimensions each sketch cell is kept for; any filter or grouping on these is answered by merging cells
+CELL_COLUMNS = ['CSP', 'Environment', 'NarrowEnvironment', 'AppCode', 'ConfigRule', 'Priority', 'year', 'month']
+GROUP_COLUMNS = {
+    'CSP': 'CSP', 'Environment': 'Environment', 'NarrowEnvironment': 'NarrowEnvironment', 'AppCode': 'AppCode',
+    'ConfigRule': 'ConfigRule', 'Priority': 'Priority', 'Month': 'ym',
+}
+
+
+def bucket_index(seconds: np.ndarray) -> np.ndarray:
+    """Log-spaced bucket of each duration; durations under a second share the first bucket."""
+    return np.ceil(np.log(np.maximum(seconds, 1.0)) / _LOG_GAMMA).astype(np.int32)
+
+
+def bucket_value(index: np.ndarray) -> np.ndarray:
+    """The representative duration of a bucket, within RELATIVE_ACCURACY of every value in it."""
+    return 2 * np.power(_GAMMA, index) / (_GAMMA + 1)
+
+
+def quantiles(buckets: np.ndarray, counts: np.ndarray, qs: Sequence[float]) -> List[float]:
+    """Quantiles of one merged sketch given as (sorted bucket, count) pairs."""
+    cumulative = np.cumsum(counts)
+    total = cumulative[-1]
+    ranks = [q * (total - 1) for q in qs]
+    positions = np.searchsorted(cumulative, np.array(ranks), side='right')
+    return bucket_value(buckets[positions]).tolist()
+
+
+class ResolutionSketches:
+    """
+    Mergeable quantile sketches of ticket resolution time (tResolved - tCreated), one per cell of
+    CELL_COLUMNS. A sketch is a count per log-spaced bucket, so merging sketches is adding their counts
+    and any filter/grouping over the cell dimensions is answered from the (small) cell table instead of
+    sorting the matching tickets. This is the DDSketch construction, chosen over t-digest/KLL because
+    its merges are exact and it needs nothing beyond numpy.
+    """
+
+    def __init__(self):
+        self._parts: List[pd.DataFrame] = []
+        self._cells: Optional[pd.DataFrame] = None
+
+    def add(self, df: pd.DataFrame):
+        """Adds a chunk of tickets; chunks can arrive in any order (e.g. one partition at a time)."""
+        if df.empty or 'tResolved' not in df.columns:
+            return
+        resolved = df[df['tResolved'].notna()]
+        seconds = (resolved['tResolved'] - resolved['tCreated']).dt.total_seconds().to_numpy()
+        keep = seconds >= 0
+        resolved = resolved[keep]
+        cells = pd.DataFrame({
+            'CSP': resolved['CSP'],
+            'Environment': resolved['Environment'],
+            'NarrowEnvironment': resolved['NarrowEnvironment'],
+            'AppCode': resolved['AppCode'],
+            'ConfigRule': resolved['ConfigRule'],
+            'Priority': resolved['Priority'],
+            'year': resolved['tCreated'].dt.year,
+            'month': resolved['tCreated'].dt.month,
+            'bucket': bucket_index(seconds[keep]),
+            'seconds': seconds[keep],
+        })
+        grouped = cells.groupby(CELL_COLUMNS + ['bucket'], dropna=False, observed=True)['seconds'].agg(['size', 'sum'])
+        self._parts.append(grouped.reset_index().rename(columns={'size': 'count'}))
+
+    def finalize(self):
+        """Merges the added chunks into the cell table used for queries."""
+        if not self._parts:
+            self._cells = pd.DataFrame(columns=CELL_COLUMNS + ['bucket', 'count', 'sum', 'ym'])
+            return
+        merged = pd.concat(self._parts, ignore_index=True)
+        self._parts = []
+        merged = merged.groupby(CELL_COLUMNS + ['bucket'], dropna=False, observed=True)[['count', 'sum']].sum().reset_index()
+        merged['ym'] = merged['year'].astype(str) + '-' + merged['month'].astype(str).str.zfill(2)
+        # Low-cardinality dimensions as categoricals keep the table small and the filters cheap
+        for column in ['CSP', 'Environment', 'NarrowEnvironment', 'AppCode', 'ConfigRule', 'Priority', 'ym']:
+            merged[column] = merged[column].astype('category')
+        self._cells = merged
+        logger.info(f"Built {len(merged)} resolution-time sketch buckets")
+
+    def query(
+        self,
+        group_by: Optional[str] = None,
+        percentiles: Sequence[float] = (50, 90, 99),
+        year: Optional[int] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+        csp: Optional[str] = None,
+        app_codes: Optional[List[str]] = None,
+        config_rules: Optional[List[str]] = None,
+        priorities: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Resolution-time count, mean and percentiles in hours, overall or per value of `group_by`
+        (a key of GROUP_COLUMNS), for the tickets matching the filters.
+        """
+        cells = self._cells
+        mask = np.ones(len(cells), dtype=bool)
+        if year:
+            mask &= (cells['year'] == year).to_numpy()
+        if csp:
+            mask &= (cells['CSP'] == csp).to_numpy()
+        if environment and environment != 'All':
+            mask &= (cells['Environment'] == environment).to_numpy()
+        if narrow_environment and narrow_environment != 'All':
+            mask &= (cells['NarrowEnvironment'] == narrow_environment).to_numpy()
+        for column, values in (('AppCode', app_codes), ('ConfigRule', config_rules), ('Priority', priorities)):
+            if values is not None:
+                mask &= cells[column].isin(values).to_numpy()
+        cells = cells[mask]
+
+        keys = [GROUP_COLUMNS[group_by]] if group_by else []
+        # Merging the matching cells' sketches: add up their counts per bucket
+        merged = cells.groupby(keys + ['bucket'], observed=True)[['count', 'sum']].sum().reset_index()
+        merged = merged[merged['count'] > 0]
+        qs = [p / 100 for p in percentiles]
+
+        results = []
+        groups = merged.groupby(keys, observed=True, sort=True) if keys else [((None,), merged)]
+        for key, sketch in groups:
+            if sketch.empty:
+                continue
+            sketch = sketch.sort_values('bucket')
+            counts = sketch['count'].to_numpy()
+            total = int(counts.sum())
+            row = {"key": key[0] if isinstance(key, tuple) else key} if group_by else {}
+            row["count"] = total
+            row["mean_hours"] = round(float(sketch['sum'].sum()) / total / 3600, 2)
+            for p, value in zip(percentiles, quantiles(sketch['bucket'].to_numpy(), counts, qs)):
+                row[f"p{p:g}_hours"] = round(value / 3600, 2)
+            results.append(row)
+        return results
@@ -1,5 +1,10 @@
+import sys
+
 import pandas as pd
 
+from ticket_db import build_database
+from ticket_store import prepare_tickets, write_partitions
+
 def split_ticket_data():
     """Reads the combined ticket data, splits it by CSP, and saves to separate CSV files."""
     try:
@@ -21,5 +26,42 @@ def split_ticket_data():
     except Exception as e:
         print(f"An error occurred: {e}")
 
+def partition_ticket_data(output_dir='ticket_partitions'):
+    """Writes the per-CSP CSV files as a CSP/year/month partitioned parquet layout for the partitioned store."""
+    try:
+        written = 0
+        for filename in ['aws_ticket_data.csv', 'gcp_ticket_data.csv']:
+            # Each CSP is written separately so column types stay the same as when the CSVs are loaded directly
+            df = prepare_tickets(pd.read_csv(filename))
+            written += write_partitions(df, output_dir)
+
+        print(f"Successfully wrote {written} partitions to {output_dir}")
+
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found. Run split_data.py first.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+def build_ticket_database(db_path='tickets.db'):
+    """Loads the per-CSP CSV files into a local SQLite database for the SQLite ticket store."""
+    try:
+        aws_df = pd.read_csv('aws_ticket_data.csv')
+        gcp_df = pd.read_csv('gcp_ticket_data.csv')
+        # Same concatenation order as the CSV loader, so row order (and therefore tie order) matches
+        df = prepare_tickets(pd.concat([aws_df, gcp_df], ignore_index=True))
+        build_database(df, db_path)
+
+        print(f"Successfully wrote {len(df)} tickets to {db_path}")
+
+    except FileNotFoundError as e:
+        print(f"Error: {e.filename} not found. Run split_data.py first.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
 if __name__ == "__main__":
-    split_ticket_data()
+    if '--partition' in sys.argv:
+        partition_ticket_data()
+    elif '--sqlite' in sys.argv:
+        build_ticket_database()
+    else:
+        split_ticket_data()
@@ -0,0 +1,58 @@
+import gzip
+import json
+import time
+import asyncio
+
+import compression
+import query_cache
+
+
+def _entry(path):
+    return next(entry for (endpoint, _), entry in query_cache._entries.items() if endpoint == path)
+
+
+def test_cache_entry_keeps_only_negotiated_encodings(client):
+    query_cache.invalidate()
+    path, params = "/api/reports/heatmap", {"year": 2024, "csp": "AWS"}
+    first = client.get(path, params=params, headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip"
+
+    encoded = _entry(path)["encoded"]
+    assert set(encoded) == {"digest", "gzip"}
+    body = json.dumps(first.json(), separators=(",", ":")).encode()
+    assert gzip.decompress(encoded["gzip"]) == body
+    assert encoded["digest"] == compression._digest(body)
+
+    reused = compression.COMPRESSED_RESPONSES.value('gzip', 'precompressed')
+    second = client.get(path, params=params, headers={"Accept-Encoding": "gzip"})
+    assert second.json() == first.json()
+    assert compression.COMPRESSED_RESPONSES.value('gzip', 'precompressed') == reused + 1
+    assert set(_entry(path)["encoded"]) == {"digest", "gzip"}
+
+
+def test_coalesced_requests_get_the_leaders_entry():
+    calls = []
+
+    @query_cache.cached("/test/coalesced")
+    def handler(x: int = 0):
+        calls.append(x)
+        time.sleep(0.2)
+        return {"x": x}
+
+    async def request():
+        slot = {}
+        compression._cache_slot.set(slot)
+        assert await handler(x=1) == {"x": 1}
+        return slot
+
+    async def requests():
+        return await asyncio.gather(*[request() for _ in range(5)])
+
+    try:
+        slots = asyncio.run(requests())
+        assert calls == [1]
+        assert query_cache.CACHE_REQUESTS.value("/test/coalesced", "coalesced") == 4
+        assert all(slot["entry"] is _entry("/test/coalesced") for slot in slots)
+    finally:
+        query_cache.invalidate()
+        query_cache._endpoints.pop("/test/coalesced")
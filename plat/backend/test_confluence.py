@@ -0,0 +1,80 @@
+import asyncio
+import copy
+
+import pytest
+
+import confluence
+
+
+@pytest.fixture
+def pages(client):
+    tree, contents = copy.deepcopy(confluence.confluence_page_tree), dict(confluence.confluence_pages)
+    yield client
+    confluence.confluence_page_tree[:] = tree
+    confluence.confluence_pages.clear()
+    confluence.confluence_pages.update(contents)
+    confluence.index = confluence.SearchIndex()
+    confluence.build_index()
+
+
+def _children(client, parent_id):
+    return [node["id"] for node in client.get("/api/confluence/page-tree", params={"parent_id": parent_id}).json()]
+
+
+def _search(client, q):
+    return client.get("/api/confluence/search", params={"q": q}).json()["results"]
+
+
+def test_full_tree_is_a_copy(pages):
+    assert pages.get("/api/confluence/page-tree").json() == confluence.confluence_page_tree
+    tree = asyncio.run(confluence.get_confluence_page_tree(parent_id=None, depth=None))
+    assert tree == confluence.confluence_page_tree
+    tree[0]["items"].clear()
+    assert confluence.confluence_page_tree[0]["items"]
+
+
+def test_pages_cannot_be_written_over_http(pages):
+    assert pages.put("/api/confluence/page/11", json={"html_content": "<script>alert(1)</script>"}).status_code == 405
+    assert pages.delete("/api/confluence/page/11").status_code == 405
+    assert "<script>" not in pages.get("/api/confluence/page/11").json()["html_content"]
+
+
+def test_upsert_page_reindexes_it(pages):
+    indexed = len(confluence.index)
+    assert confluence.upsert_page("14", "<p>Quarterly zeppelin budget</p>", title="Budget", parent_id="1") == indexed + 1
+    assert _children(pages, "1")[-1] == "14"
+    assert [item["id"] for item in _search(pages, "zeppelin")] == ["14"]
+    confluence.upsert_page("14", "<p>Quarterly airship budget</p>")
+    assert _search(pages, "zeppelin") == []
+    assert _search(pages, "airship")[0]["path"] == ["Project Alpha"]
+
+
+def test_upsert_page_moves_an_existing_page(pages):
+    confluence.upsert_page("13", "<p>Design notes</p>", parent_id="2")
+    assert "13" not in _children(pages, "1")
+    assert _children(pages, "2")[-1] == "13"
+    assert _children(pages, "13") == ["131", "132"]
+    result = _search(pages, "API Design")
+    assert next(item for item in result if item["id"] == "131")["path"] == ["Onboarding Guide", "Design"]
+
+
+def test_upsert_page_keeps_the_parent_when_it_is_unchanged_or_omitted(pages):
+    confluence.upsert_page("131", "<p>a</p>", parent_id="13")
+    confluence.upsert_page("131", "<p>b</p>")
+    assert _children(pages, "13") == ["131", "132"]
+
+
+@pytest.mark.parametrize("parent_id, error", [("13", ValueError), ("131", ValueError), ("missing", KeyError)])
+def test_upsert_page_rejects_invalid_moves(pages, parent_id, error):
+    tree = copy.deepcopy(confluence.confluence_page_tree)
+    with pytest.raises(error):
+        confluence.upsert_page("13", "<p>x</p>", parent_id=parent_id)
+    assert confluence.confluence_page_tree == tree
+
+
+def test_remove_page_drops_its_subtree(pages):
+    assert confluence.remove_page("13") == ["13", "131", "132"]
+    assert _children(pages, "1") == ["11", "12"]
+    assert _search(pages, "Database Schema") == []
+    with pytest.raises(KeyError):
+        confluence.remove_page("13")
@@ -0,0 +1,162 @@
+import json
+import asyncio
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+import main
+import heartbeat_stream
+
+
+def test_ingest_converts_offset_timestamps(client):
+    before = client.get("/api/heartbeat-status", params={"csp": "aws"}).json()
+    record = {
+        "CSP": "AWS", "Environment": "PROD", "NarrowEnvironment": "Prod", "ConfigRule": "AWS-998",
+        "Summary": "Heartbeat Check - Success", "tCreated": "2026-10-18T10:00:00+02:00",
+        "tResolved": "2026-10-18T10:05:00Z",
+    }
+    response = client.post("/api/heartbeats", json=[record])
+    assert response.status_code == 200
+    assert response.json() == {"ingested": 1}
+
+    assert main.aws_heartbeat_df['tCreated'].dtype.kind == 'M'
+    assert main.aws_heartbeat_df['tCreated'].dt.tz is None
+    assert main.aws_heartbeat_df['tCreated'].iloc[-1] == main.pd.Timestamp("2026-10-18 08:00:00")
+
+    status = client.get("/api/heartbeat-status", params={"csp": "aws"})
+    assert status.status_code == 200
+    assert status.json()["dates"][-1] == "2026-10-18"
+    assert len(status.json()["dates"]) == len(before["dates"]) + 1
+    assert client.get("/api/configrule-heartbeat", params={"csp": "aws"}).status_code == 200
+
+
+def test_ingest_rejects_unparseable_timestamps(client):
+    record = {"CSP": "AWS", "ConfigRule": "AWS-998", "Summary": "Success", "tCreated": "not a date"}
+    assert client.post("/api/heartbeats", json=[record]).status_code == 400
+
+
+def _records(csp, config_rule, *summaries):
+    return [
+        {"CSP": csp, "Environment": "PROD", "NarrowEnvironment": "Prod", "ConfigRule": config_rule,
+         "Summary": summary, "tCreated": "2024-06-02T03:00:00Z"}
+        for summary in summaries
+    ]
+
+
+def _total(event):
+    return sum(row["success"] + row["failed"] for row in event["counts"])
+
+
+@pytest.mark.parametrize("missing", ["Summary", "ConfigRule"])
+def test_ingest_rejects_records_without_required_fields(client, missing):
+    record = _records("AWS", "AWS-998", "Heartbeat Check - Success")[0]
+    del record[missing]
+    assert client.post("/api/heartbeats", json=[record]).status_code == 400
+
+
+async def _asgi(scope, messages, on_send=None):
+    """Runs one ASGI connection of the app, feeding it `messages` and collecting what it sends."""
+    incoming, sent = asyncio.Queue(), asyncio.Queue()
+    for message in messages:
+        incoming.put_nowait(message)
+
+    async def send(message):
+        if on_send is not None:
+            on_send(message)
+        await sent.put(message)
+
+    task = asyncio.ensure_future(main.app(scope, incoming.get, send))
+    return task, incoming, sent
+
+
+def _scope(scope_type, path, query):
+    return {"type": scope_type, "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http" if scope_type == "http" else "ws", "path": path, "raw_path": path.encode(),
+            "query_string": query.encode(), "headers": [], "client": ("test", 1), "server": ("testserver", 80)}
+
+
+def test_sse_snapshot_delta_keep_alive_and_resync(client, monkeypatch):
+    monkeypatch.setattr(heartbeat_stream, "HEARTBEAT_STREAM_KEEPALIVE_SECONDS", 0.1)
+
+    async def run():
+        task, incoming, sent = await _asgi(_scope("http", "/api/heartbeats/stream", "csp=gcp&days=0"), [])
+
+        async def event():
+            while True:
+                message = await asyncio.wait_for(sent.get(), 5)
+                if message["type"] == "http.response.body":
+                    return message["body"].decode()
+
+        start = await asyncio.wait_for(sent.get(), 5)
+        assert start["status"] == 200
+        snapshot = await event()
+        assert snapshot.startswith("event: snapshot\n")
+        snapshot = json.loads(snapshot.split("data: ", 1)[1])
+        assert _total(snapshot) == len(main.gcp_heartbeat_df)
+
+        # Only GCP tickets reach this subscriber; the idle gap before them is filled with keep-alives
+        assert await event() == ": keep-alive\n\n"
+        main.ingest_heartbeats(_records("AWS", "AWS-998", "Success"))
+        main.ingest_heartbeats(_records("GCP", "GCP-SSE", "Heartbeat Check - Success", "Heartbeat Check - Failed"))
+        body = await event()
+        while body == ": keep-alive\n\n":
+            body = await event()
+        delta = json.loads(body.split("data: ", 1)[1])
+        assert delta["type"] == "delta" and delta["seq"] > snapshot["seq"]
+        assert delta["counts"] == [{"csp": "gcp", "config_rule": "GCP-SSE", "date": "2024-06-02", "success": 1, "failed": 1}]
+
+        # A subscriber too far behind gets a fresh snapshot instead of the delta
+        monkeypatch.setattr(heartbeat_stream, "HEARTBEAT_STREAM_MAX_PENDING", 0)
+        resyncs = heartbeat_stream.RESYNCS.value()
+        main.ingest_heartbeats(_records("GCP", "GCP-SSE", "Heartbeat Check - Success"))
+        body = await event()
+        while body == ": keep-alive\n\n":
+            body = await event()
+        resync = json.loads(body.split("data: ", 1)[1])
+        assert resync["type"] == "snapshot"
+        assert _total(resync) == _total(snapshot) + 3
+        assert heartbeat_stream.RESYNCS.value() == resyncs + 1
+
+        incoming.put_nowait({"type": "http.disconnect"})
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(run())
+    assert heartbeat_stream.broadcaster._subscriptions == []
+
+
+def test_websocket_snapshot_and_delta(client):
+    with client.websocket_connect("/api/heartbeats/ws?csp=aws&days=0") as websocket:
+        snapshot = websocket.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert _total(snapshot) == len(main.aws_heartbeat_df)
+        assert client.post("/api/heartbeats", json=_records("AWS", "AWS-WS", "Heartbeat Check - Failed")).status_code == 200
+        delta = websocket.receive_json()
+        assert delta == {"type": "delta", "seq": delta["seq"],
+                         "counts": [{"csp": "aws", "config_rule": "AWS-WS", "date": "2024-06-02", "success": 0, "failed": 1}]}
+        assert delta["seq"] > snapshot["seq"]
+
+
+def test_websocket_rejects_negative_days(client):
+    with pytest.raises(WebSocketDisconnect) as error:
+        with client.websocket_connect("/api/heartbeats/ws?days=-1"):
+            pass
+    assert error.value.code == 1008
+
+
+def test_websocket_keep_alive_unsubscribes_dead_clients(client, monkeypatch):
+    monkeypatch.setattr(heartbeat_stream, "HEARTBEAT_STREAM_KEEPALIVE_SECONDS", 0.05)
+    sent_messages = []
+
+    def on_send(message):
+        # The client is gone after the snapshot: the server's next send fails like a closed socket
+        if message["type"] == "websocket.send" and any(sent["type"] == "websocket.send" for sent in sent_messages):
+            raise OSError("connection reset")
+        sent_messages.append(message)
+
+    async def run():
+        task, _, _ = await _asgi(_scope("websocket", "/api/heartbeats/ws", "csp=aws"), [{"type": "websocket.connect"}], on_send)
+        await asyncio.wait_for(task, 5)
+
+    asyncio.run(run())
+    assert [message["type"] for message in sent_messages] == ["websocket.accept", "websocket.send"]
+    assert heartbeat_stream.broadcaster._subscriptions == []
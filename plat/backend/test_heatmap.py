@@ -0,0 +1,62 @@
+import warnings
+
+import pandas as pd
+import pytest
+
+import heatmap
+
+OPTIONS = [
+    {},
+    {"top_rows": 2},
+    {"top_rows": 2, "top_columns": 1},
+    {"top_rows": 3, "row_offset": 1, "row_limit": 2, "column_offset": 1, "column_limit": 1},
+]
+
+
+def _counts():
+    cells = [(f"APP{i}", f"RULE{j}", (i * 3 + j) % 5) for i in range(5) for j in range(3)]
+    counts = pd.DataFrame(cells, columns=['AppCode', 'ConfigRule', 'count'])
+    counts['count_low'] = counts['count'] - 1
+    counts['count_high'] = counts['count'] + 2
+    counts.attrs['method'] = 'stratified_sample'
+    return counts
+
+
+@pytest.mark.parametrize("options", OPTIONS)
+def test_tile_counts_are_the_view_cells(options):
+    counts = _counts()
+    view = heatmap.matrix_view(counts, 'AppCode', 'ConfigRule', 'coo', **options)
+    cells = heatmap.tile_counts(counts, 'AppCode', 'ConfigRule', **options)
+
+    coo = view["coo"]
+    expected = {(view["rows"][r], view["columns"][c]): v for r, c, v in zip(coo["row"], coo["column"], coo["value"])}
+    assert dict(zip(zip(cells['AppCode'], cells['ConfigRule']), cells['count'])) == expected
+    assert cells.attrs['method'] == 'stratified_sample'
+
+
+def test_other_cells_sum_their_bounds():
+    counts = _counts()
+    cells = heatmap.tile_counts(counts, 'AppCode', 'ConfigRule', top_rows=2)
+    other = cells[cells['AppCode'] == heatmap.OTHER_LABEL].set_index('ConfigRule')
+    folded = counts[~counts['AppCode'].isin(cells['AppCode'])].groupby('ConfigRule')[['count', 'count_low', 'count_high']].sum()
+    folded = folded[folded['count'] != 0]
+    assert other[['count', 'count_low', 'count_high']].sort_index().to_dict() == folded.sort_index().to_dict()
+
+
+def test_endpoint_intervals_cover_only_the_returned_view(client):
+    params = {"year": 2024, "csp": "AWS", "approx": "true", "top_app_codes": 3, "encoding": "coo"}
+    for path in ("/api/reports/heatmap", "/api/reports/control-count-by-appcode"):
+        view = client.get(path, params=params).json()
+        coo = view["coo"]
+        cells = {(view["app_codes"][r], view["config_rules"][c]): v for r, c, v in zip(coo["row"], coo["column"], coo["value"])}
+        intervals = view["approximate"]["intervals"]
+        assert {(i["AppCode"], i["ConfigRule"]): i["count"] for i in intervals} == cells
+        assert all(i["low"] <= i["count"] <= i["high"] for i in intervals)
+
+
+def test_tiles_do_not_warn():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        view = heatmap.matrix_view(_counts(), 'AppCode', 'ConfigRule', row_limit=3, column_offset=1)
+    assert view["rows"] == ["APP0", "APP1", "APP2"]
+    assert view["columns"] == ["RULE1", "RULE2"]
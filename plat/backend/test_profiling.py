@@ -0,0 +1,36 @@
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+import query_cache
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_cached_route_is_sampled(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_INTERVAL_MS", 1)
+    app = FastAPI()
+
+    @app.get("/test/profiled")
+    @query_cache.cached("/test/profiled")
+    def profiled(x: int = 0):
+        _busy(0.1)
+        return {"x": x}
+
+    app.add_middleware(profiling.ProfilingMiddleware)
+    try:
+        response = TestClient(app).get("/test/profiled", params={"x": 1}, headers={"X-Debug-Profile": "1"})
+        assert response.status_code == 200
+        profile = profiling._profiles[-1]
+        assert profile["path"] == "/test/profiled"
+        assert profile["samples"] > 0
+        assert all(stack.startswith("test_cached_route_is_sampled.<locals>.profiled") for stack in profile["folded"])
+    finally:
+        query_cache.invalidate()
+        query_cache._endpoints.pop("/test/profiled")
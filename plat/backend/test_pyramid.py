@@ -0,0 +1,73 @@
+from collections import Counter
+
+import pandas as pd
+import pytest
+
+import pyramid
+
+
+def _tickets(tz):
+    created = pd.date_range("2024-11-28", "2025-02-03", freq="7h", tz=tz)
+    return pd.DataFrame({
+        'CSP': ['AWS', 'GCP'] * (len(created) // 2) + ['AWS'] * (len(created) % 2),
+        'AppCode': 'APP', 'ConfigRule': 'RULE', 'Environment': 'PROD', 'NarrowEnvironment': 'Prod',
+        'tCreated': created,
+    })
+
+
+@pytest.mark.parametrize("tz", [None, "UTC", "Europe/Berlin"])
+@pytest.mark.parametrize("year, month", [(2024, None), (2024, 12), (2025, 1), (2025, None)])
+def test_count_bounds_follow_the_bucket_timezone(tz, year, month):
+    tickets = _tickets(tz)
+    trend = pyramid.TrendPyramid()
+    trend.add(tickets)
+    trend.finalize()
+    assert trend.timezone == tickets['tCreated'].dt.tz
+
+    counts = trend.count(['CSP', 'Day'], year=year, month=month)
+    created = tickets['tCreated']
+    selected = tickets[(created.dt.year == year) & ((created.dt.month == month) if month else True)]
+    expected = selected.groupby(['CSP', created.dt.strftime('%Y-%m-%d').rename('Day')]).size()
+    assert counts.set_index(['CSP', 'Day'])['count'].to_dict() == expected.to_dict()
+
+
+def _wall_clock_counts(created, level):
+    wall = created.dt.tz_localize(None) if created.dt.tz is not None else created
+    if level == 'hour':
+        keys = wall.dt.strftime('%Y-%m-%dT%H:00')
+    elif level == 'day':
+        keys = wall.dt.strftime('%Y-%m-%d')
+    else:
+        keys = wall.dt.to_period('W-SUN' if level == 'week' else 'M').dt.start_time.dt.strftime('%Y-%m-%d' if level == 'week' else '%Y-%m')
+    return keys.value_counts().to_dict()
+
+
+@pytest.mark.parametrize("tz", [None, "Europe/Berlin", "America/New_York"])
+@pytest.mark.parametrize("level", pyramid.LEVELS)
+def test_series_buckets_follow_wall_clock_across_dst_changes(tz, level):
+    # Every 37 minutes from September to mid-November, and around the spring change, crossing both DST changes
+    created = pd.Series(pd.date_range("2024-09-20", "2024-11-15", freq="37min", tz=tz).append(
+        pd.date_range("2025-03-01", "2025-04-10", freq="37min", tz=tz)))
+    tickets = pd.DataFrame({'CSP': 'AWS', 'AppCode': 'APP', 'ConfigRule': 'RULE', 'Environment': 'PROD',
+                            'NarrowEnvironment': 'Prod', 'tCreated': created})
+    trend = pyramid.TrendPyramid()
+    trend.add(tickets)
+    trend.finalize()
+
+    result = trend.series(created.iloc[0], created.iloc[-1], level)
+    # The repeated hour of a fall-back change is two buckets with the same label
+    counts = Counter()
+    for bucket, total in zip(result["buckets"], result["total"]):
+        counts[bucket] += total
+    assert +counts == _wall_clock_counts(created, level)
+
+
+def test_month_bucket_of_a_late_october_ticket():
+    created = pd.Series(pd.to_datetime(["2024-10-05 12:00", "2024-10-30 12:00"])).dt.tz_localize("Europe/Berlin")
+    trend = pyramid.TrendPyramid()
+    trend.add(pd.DataFrame({'CSP': 'AWS', 'AppCode': 'APP', 'ConfigRule': 'RULE', 'Environment': 'PROD',
+                            'NarrowEnvironment': 'Prod', 'tCreated': created}))
+    trend.finalize()
+    start, end = pd.Timestamp("2024-10-01", tz="Europe/Berlin"), pd.Timestamp("2024-11-30", tz="Europe/Berlin")
+    assert trend.series(start, end, 'month')["total"] == [2, 0]
+    assert trend.count(['Month'], year=2024, month=10)['count'].tolist() == [2]
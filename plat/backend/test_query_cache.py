@@ -0,0 +1,55 @@
+import json
+import time
+
+import query_cache
+
+
+def test_warm_fills_query_defaults(client):
+    path, params = "/api/reports/heatmap", {"year": 2024, "csp": "GCP"}
+    expected = client.get(path, params=params).json()
+    query_cache.invalidate()
+    warmed = query_cache.CACHE_WARMED.value(path)
+
+    query_cache.warm(top_n=query_cache.QUERY_CACHE_SIZE, budget_seconds=60)
+    assert query_cache.CACHE_WARMED.value(path) > warmed
+
+    hits = query_cache.CACHE_REQUESTS.value(path, "warm_hit")
+    assert client.get(path, params=params).json() == expected
+    assert query_cache.CACHE_REQUESTS.value(path, "warm_hit") == hits + 1
+
+
+def _logged(endpoint):
+    with query_cache._query_log_lock:
+        return list(query_cache._query_log.get(endpoint, {}))
+
+
+def test_free_text_queries_are_not_logged(client):
+    path = "/api/tickets-facets"
+    assert client.get(path, params={"Summary": "password reset for jdoe"}).status_code == 200
+    assert client.get(path, params={"Key": "CSD-10001", "CSP": "AWS"}).status_code == 200
+    assert client.get(path, params={"CSP": "GCP"}).status_code == 200
+    logged = _logged(path)
+    assert not any("jdoe" in params or "CSD-10001" in params for params in logged)
+    assert json.dumps({"CSP": "GCP"}) in logged
+
+
+def test_requests_leave_the_query_log_file_to_the_background_writer(client, tmp_path, monkeypatch):
+    log_path = tmp_path / "query_log.json"
+    query_cache.stop_query_log_flusher()
+    monkeypatch.setattr(query_cache, "QUERY_LOG_PATH", str(log_path))
+    monkeypatch.setattr(query_cache, "QUERY_LOG_FLUSH_SECONDS", 0)
+    try:
+        # However overdue a flush is, requests themselves never write the file
+        client.get("/api/reports/heatmap", params={"year": 2024, "csp": "GCP"})
+        assert not log_path.exists()
+
+        monkeypatch.setattr(query_cache, "QUERY_LOG_FLUSH_SECONDS", 0.05)
+        query_cache.start_query_log_flusher()
+        deadline = time.monotonic() + 5
+        while not log_path.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "/api/reports/heatmap" in json.loads(log_path.read_text())
+    finally:
+        query_cache.stop_query_log_flusher()
+        monkeypatch.undo()
+        query_cache.start_query_log_flusher()
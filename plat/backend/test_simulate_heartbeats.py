@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import simulate_heartbeats
+from simulate_heartbeats import generate_heartbeat_stream, replay
+
+START = datetime(2024, 6, 3)
+
+
+def _stream(**kwargs):
+    options = {"num_rules": 20, "interval_seconds": 30, "duration_seconds": 1800, "start": START, "seed": 7}
+    return generate_heartbeat_stream("AWS", **{**options, **kwargs})
+
+
+def test_every_rule_reports_once_per_tick_in_tick_major_order():
+    df = _stream()
+    assert len(df) == 60 * 20
+    assert df['tCreated'].is_monotonic_increasing
+    ticks = df['tCreated'].to_numpy().reshape(60, 20)
+    assert (ticks == ticks[:, :1]).all()
+    assert (np.diff(ticks[:, 0]) == np.timedelta64(30, 's')).all()
+    rules = df['ConfigRule'].to_numpy().reshape(60, 20)
+    assert (rules == [f"AWS-{i:05d}" for i in range(20)]).all()
+    assert df['Key'].is_unique
+
+
+def test_failed_heartbeats_are_unresolved():
+    df = _stream(failure_rate=0.3)
+    failed = df['Summary'] == 'Heartbeat Check - Failed'
+    assert 0 < failed.sum() < len(df)
+    assert df.loc[failed, 'tResolved'].isna().all()
+    resolve_minutes = (df.loc[~failed, 'tResolved'] - df.loc[~failed, 'tCreated']).dt.total_seconds() / 60
+    assert resolve_minutes.between(5, 30).all()
+
+
+def test_same_seed_same_stream():
+    pd.testing.assert_frame_equal(_stream(failure_rate=0.2, jitter_seconds=5), _stream(failure_rate=0.2, jitter_seconds=5))
+    assert not _stream(failure_rate=0.2).equals(_stream(failure_rate=0.2, seed=8))
+
+
+def test_bursts_fail_the_affected_rules_inside_their_window():
+    df = _stream(num_rules=200, failure_rate=0, bursts=[(600, 300, 1.0, 0.5)])
+    offsets = (df['tCreated'] - pd.Timestamp(START)).dt.total_seconds()
+    failed = df['Summary'] == 'Heartbeat Check - Failed'
+    in_window = (offsets >= 600) & (offsets < 900)
+    assert not failed[~in_window].any()
+
+    # The same rules fail at every tick of the burst, about rule_fraction of them
+    failing_rules = df[in_window & failed].groupby('ConfigRule').size()
+    assert (failing_rules == in_window.sum() // 200).all()
+    assert 60 <= len(failing_rules) <= 140
+
+
+def test_burst_rate_applies_within_the_window():
+    df = _stream(num_rules=500, failure_rate=1.0, bursts=[(0, 600, 0.0, 1.0)])
+    offsets = (df['tCreated'] - pd.Timestamp(START)).dt.total_seconds()
+    failed = df['Summary'] == 'Heartbeat Check - Failed'
+    assert not failed[offsets < 600].any()
+    assert failed[offsets >= 600].all()
+
+
+def test_replay_sends_every_event_once_in_event_time_batches():
+    df = _stream(jitter_seconds=20)
+    batches = []
+    stats = replay(df, batches.append, speed=0, batch_seconds=60)
+    assert stats["events"] == len(df) and stats["batches"] == len(batches)
+    pd.testing.assert_frame_equal(pd.concat(batches), df)
+
+    windows = [((batch['tCreated'] - df['tCreated'].iloc[0]).dt.total_seconds() // 60).unique() for batch in batches]
+    assert all(len(window) == 1 for window in windows)
+    assert [window[0] for window in windows] == sorted({window[0] for window in windows})
+
+
+def test_replay_paces_batches_by_speed():
+    df = _stream(num_rules=2, interval_seconds=1, duration_seconds=4)
+    stats = replay(df, lambda batch: None, speed=10, batch_seconds=1)
+    assert stats["batches"] == 4
+    # The last batch is due 3 event-seconds in, i.e. 0.3s at 10x
+    assert stats["elapsed_seconds"] >= 0.3
+
+
+def test_replay_of_an_empty_stream():
+    assert replay(_stream().iloc[:0], lambda batch: None)["events"] == 0
+
+
+def test_records_are_accepted_by_the_ingest_endpoint(client):
+    df = _stream(num_rules=5, duration_seconds=300, failure_rate=0.5)
+    response = client.post("/api/heartbeats", json=simulate_heartbeats._to_records(df))
+    assert response.status_code == 200
+    assert response.json() == {"ingested": len(df)}
+
+
+def test_append_to_file_writes_the_header_once(tmp_path):
+    path = tmp_path / "heartbeats.csv"
+    df = _stream(num_rules=3, duration_seconds=60)
+    simulate_heartbeats.append_to_file(df.iloc[:3], str(path))
+    simulate_heartbeats.append_to_file(df.iloc[3:], str(path))
+    written = pd.read_csv(path)
+    assert list(written.columns) == simulate_heartbeats.HEARTBEAT_COLUMNS
+    assert written['Key'].tolist() == df['Key'].tolist()
@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+import sketches
+
+PERCENTILES = [0, 1, 25, 50, 90, 99, 99.9, 100]
+
+
+def _tickets(n=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    created = pd.Timestamp("2024-01-01", tz="UTC") + pd.to_timedelta(rng.uniform(0, 365 * 86400, n), unit="s")
+    # Resolution times from a second to weeks, heavy-tailed like the real data
+    seconds = np.exp(rng.uniform(0, np.log(30 * 86400), n)).round()
+    return pd.DataFrame({
+        'CSP': rng.choice(['AWS', 'GCP'], n), 'Environment': rng.choice(['PROD', 'DEV'], n),
+        'NarrowEnvironment': rng.choice(['Prod', 'Dev', 'Uat'], n), 'AppCode': rng.choice(['APP1', 'APP2', 'APP3'], n),
+        'ConfigRule': rng.choice(['R1', 'R2'], n), 'Priority': rng.choice(['Low', 'High'], n),
+        'tCreated': created, 'tResolved': created + pd.to_timedelta(seconds, unit="s"),
+    })
+
+
+def _sketches(*chunks):
+    result = sketches.ResolutionSketches()
+    for chunk in chunks:
+        result.add(chunk)
+    result.finalize()
+    return result
+
+
+def _exact_hours(tickets, p):
+    seconds = (tickets['tResolved'] - tickets['tCreated']).dt.total_seconds().to_numpy()
+    # The sketch reports the order statistic at rank floor(q * (n - 1)), i.e. no interpolation
+    return np.percentile(seconds, p, method='lower') / 3600
+
+
+def _assert_close(estimate, exact):
+    # Percentiles are rounded to hundredths of an hour
+    assert abs(estimate - exact) <= sketches.RELATIVE_ACCURACY * exact + 0.005
+
+
+def test_quantiles_are_within_relative_accuracy():
+    tickets = _tickets()
+    [row] = _sketches(tickets).query(percentiles=PERCENTILES)
+    assert row["count"] == len(tickets)
+    for p in PERCENTILES:
+        _assert_close(row[f"p{p:g}_hours"], _exact_hours(tickets, p))
+
+
+def test_bucket_values_are_within_relative_accuracy():
+    seconds = np.exp(np.linspace(0, np.log(1e8), 100000))
+    estimates = sketches.bucket_value(sketches.bucket_index(seconds))
+    assert np.all(np.abs(estimates - seconds) <= sketches.RELATIVE_ACCURACY * seconds * (1 + 1e-9))
+
+
+def test_merged_sketches_match_a_sketch_of_the_combined_data():
+    tickets = _tickets()
+    combined = _sketches(tickets)
+    chunked = _sketches(*[tickets.iloc[i::3] for i in range(3)])
+    for group_by in [None, 'CSP', 'AppCode', 'Month']:
+        assert chunked.query(group_by, PERCENTILES) == combined.query(group_by, PERCENTILES)
+
+    # Merging the cells that match a filter gives the sketch of just those tickets
+    selected = tickets[(tickets['CSP'] == 'AWS') & tickets['AppCode'].isin(['APP1', 'APP3'])]
+    assert (combined.query(percentiles=PERCENTILES, csp='AWS', app_codes=['APP1', 'APP3'])
+            == _sketches(selected).query(percentiles=PERCENTILES))
+
+
+def test_unresolved_and_negative_durations_are_skipped():
+    tickets = _tickets(100)
+    tickets.loc[:9, 'tResolved'] = pd.NaT
+    tickets.loc[10:14, 'tResolved'] = tickets.loc[10:14, 'tCreated'] - pd.Timedelta(hours=1)
+    assert _sketches(tickets).query()[0]["count"] == 85
+
+
+def _resolved(csp=None, year=None):
+    tickets = main.tickets_df
+    tickets = tickets[tickets['tResolved'].notna() & (tickets['tResolved'] >= tickets['tCreated'])]
+    if csp:
+        tickets = tickets[tickets['CSP'] == csp]
+    if year:
+        tickets = tickets[tickets['tCreated'].dt.year == year]
+    return tickets
+
+
+def test_endpoint_groups_and_filters(client):
+    response = client.get("/api/resolution-time", params={"group_by": "CSP", "percentiles": "50,90"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["group_by"] == "CSP"
+    assert [group["key"] for group in body["groups"]] == sorted(_resolved()['CSP'].unique())
+    for group in body["groups"]:
+        tickets = _resolved(csp=group["key"])
+        assert group["count"] == len(tickets)
+        assert set(group) == {"key", "count", "mean_hours", "p50_hours", "p90_hours"}
+        for p in (50, 90):
+            _assert_close(group[f"p{p}_hours"], _exact_hours(tickets, p))
+
+    [overall] = client.get("/api/resolution-time", params={"csp": "AWS", "year": 2024}).json()["groups"]
+    tickets = _resolved(csp="AWS", year=2024)
+    assert overall["count"] == len(tickets)
+    _assert_close(overall["p99_hours"], _exact_hours(tickets, 99))
+
+    months = client.get("/api/resolution-time", params={"group_by": "Month", "year": 2024}).json()["groups"]
+    assert sum(group["count"] for group in months) == len(_resolved(year=2024))
+    assert all(group["key"].startswith("2024-") for group in months)
+
+
+@pytest.mark.parametrize("params", [{"group_by": "Summary"}, {"percentiles": "50,abc"}, {"percentiles": "101"}, {"percentiles": "-1"}])
+def test_endpoint_rejects_invalid_parameters(client, params):
+    assert client.get("/api/resolution-time", params=params).status_code == 400
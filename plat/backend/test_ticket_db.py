@@ -0,0 +1,256 @@
+import os
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+import query_cache
+from ticket_db import SQLiteTicketStore, build_database
+from ticket_store import prepare_tickets, write_partitions
+
+ENGINES = ['csv', 'partitioned', 'sqlite']
+
+# Column filters exercising regex metacharacters, which both engines treat as Series.str.contains regexes
+CONTAINS_FILTERS = [
+    {'Summary': 'disk'},
+    {'Summary': '95%'},
+    {'Summary': 'a.b'},
+    {'Summary': '(warn)'},
+    {'Summary': 'warn|error'},
+    {'Summary': '^Disk'},
+    {'Summary': '[xy]z'},
+    {'Summary': 'under_score'},
+    {'AppCode': 'ap'},
+    {'Account': 'unk'},
+    {'Account': '12'},
+    {'ConfigRule': 'rule-1', 'Summary': 'e'},
+]
+
+FILTERS = [
+    {},
+    {'year': 2024},
+    {'year': 2025, 'environment': 'PROD'},
+    {'environment': 'Non Prod', 'narrow_environment': 'Dev'},
+    {'csp': 'GCP'},
+    {'csp': 'AWS', 'app_codes': ['APP1', 'APP3'], 'month': 3},
+] + [{'contains': contains} for contains in CONTAINS_FILTERS]
+
+
+def _tickets() -> pd.DataFrame:
+    """A small fixed ticket set with sort ties, missing values and metacharacters in the text."""
+    rng = np.random.default_rng(7)
+    summaries = [
+        'Disk 95% full (warn)', 'disk almost full', 'a.b|c [xz] error', 'ab c', 'Under_score warning',
+        'underXscore', 'Memory error', 'CPU (warn) high', 'yz [yz]', 'plain text',
+    ]
+    rows = []
+    for i in range(160):
+        csp = 'AWS' if i % 3 else 'GCP'
+        created = pd.Timestamp('2024-01-01', tz='UTC') + pd.Timedelta(hours=int(rng.integers(0, 24 * 700)))
+        rows.append({
+            'CSP': csp,
+            'Environment': [None, 'PROD', 'Non Prod', 'Dev'][i % 4],
+            'NarrowEnvironment': [None, 'Prod', 'Dev', 'Uat', 'Dev'][i % 5],
+            'AlertType': ['Alert', 'System'][i % 2],
+            # Few distinct values, so sorting on them is mostly ties
+            'Priority': [None, 'high', 'low'][i % 3],
+            'Key': f'CSD-{10000 + (i * 37) % 160}',
+            'AppCode': [None, 'APP1', 'APP2', 'APP3'][i % 4] if i % 7 else 'APP1',
+            'ConfigRule': [None, 'rule-1', 'rule-2'][i % 3] if csp == 'AWS' else 'Unknown',
+            'Summary': None if i % 11 == 0 else summaries[i % len(summaries)],
+            'Account': 1234567 + i % 5 if csp == 'AWS' else 'Unknown',
+            'tCreated': created.isoformat(),
+            'tResolved': None if i % 6 == 0 else (created + pd.Timedelta(hours=int(rng.integers(1, 200)))).isoformat(),
+            'TimeToResolve': None if i % 6 == 0 else f'{i % 4}:00:00',
+        })
+    return pd.DataFrame(rows)
+
+
+@pytest.fixture(scope="module")
+def data_dir(tmp_path_factory):
+    root = tmp_path_factory.mktemp("tickets")
+    tickets = _tickets()
+    aws, gcp = tickets[tickets['CSP'] == 'AWS'], tickets[tickets['CSP'] == 'GCP']
+    aws.to_csv(root / 'aws_ticket_data.csv', index=False)
+    gcp.to_csv(root / 'gcp_ticket_data.csv', index=False)
+    # Built the way split_data.py builds them
+    for filename in ['aws_ticket_data.csv', 'gcp_ticket_data.csv']:
+        write_partitions(prepare_tickets(pd.read_csv(root / filename)), str(root / 'ticket_partitions'))
+    build_database(
+        prepare_tickets(pd.concat([pd.read_csv(root / 'aws_ticket_data.csv'), pd.read_csv(root / 'gcp_ticket_data.csv')], ignore_index=True)),
+        str(root / 'tickets.db'),
+    )
+    return root
+
+
+@pytest.fixture(scope="module")
+def csv_tickets(data_dir):
+    return prepare_tickets(pd.concat(
+        [pd.read_csv(data_dir / 'aws_ticket_data.csv'), pd.read_csv(data_dir / 'gcp_ticket_data.csv')], ignore_index=True
+    ))
+
+
+@pytest.fixture(scope="module")
+def store(data_dir):
+    return SQLiteTicketStore(str(data_dir / 'tickets.db'))
+
+
+def _filter(df: pd.DataFrame, year=None, environment=None, narrow_environment=None, csp=None, app_codes=None, month=None, contains=None):
+    if year:
+        df = df[df['tCreated'].dt.year == year]
+    if environment and environment != 'All':
+        df = df[df['Environment'] == environment]
+    if narrow_environment and narrow_environment != 'All':
+        df = df[df['NarrowEnvironment'] == narrow_environment]
+    if csp:
+        df = df[df['CSP'] == csp]
+    if app_codes is not None:
+        df = df[df['AppCode'].isin(app_codes)]
+    if month:
+        df = df[df['tCreated'].dt.month == month]
+    for column, value in (contains or {}).items():
+        df = df[main.contains_mask(df[column], value)]
+    return df
+
+
+def _records(df: pd.DataFrame):
+    """Rows as dicts with every missing value as None, so engines storing NaN/None/NaT compare equal."""
+    return [{k: None if pd.isna(v) else v for k, v in row.items()} for row in df.to_dict(orient='records')]
+
+
+def _assert_same_tickets(actual: pd.DataFrame, expected: pd.DataFrame):
+    assert list(actual.columns) == [c for c in expected.columns if c in actual.columns]
+    assert _records(actual) == _records(expected[actual.columns])
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_frame_matches_csv(store, csv_tickets, filters):
+    expected = _filter(csv_tickets, **filters)
+    actual = store.frame(**filters)
+    assert len(actual) == len(expected)
+    _assert_same_tickets(actual, expected)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("by, fillna", [
+    (['CSP'], None),
+    (['AppCode', 'ConfigRule'], None),
+    (['Environment'], {'Environment': 'Unknown'}),
+    (['CSP', 'Month', 'NarrowEnvironment'], {'NarrowEnvironment': 'Unknown'}),
+    (['MonthName', 'AppCode'], None),
+])
+def test_count_matches_csv(store, csv_tickets, filters, by, fillna):
+    df = _filter(csv_tickets, **filters)
+    keys = []
+    for column in by:
+        key = df['tCreated'].dt.strftime(main.DERIVED_KEY_FORMATS[column]).rename(column) if column in main.DERIVED_KEY_FORMATS else df[column]
+        if fillna and column in fillna:
+            key = key.fillna(fillna[column])
+        keys.append(key)
+    expected = df.groupby(keys).size().reset_index(name='count')
+    actual = store.count(by, fillna=fillna, **filters)
+    assert actual.to_dict(orient='records') == expected.to_dict(orient='records')
+
+
+@pytest.mark.parametrize("filters", [{}, {'year': 2024}, {'contains': {'Summary': '(warn)'}}, {'contains': {'Account': 'unk'}}])
+@pytest.mark.parametrize("sort_by", [None, 'Key', 'AppCode', 'Priority', 'Environment', 'tResolved', 'Account'])
+@pytest.mark.parametrize("ascending", [True, False])
+@pytest.mark.parametrize("offset, limit", [(0, 25), (20, 25), (150, 25)])
+def test_page_matches_csv(store, csv_tickets, filters, sort_by, ascending, offset, limit):
+    df = _filter(csv_tickets, **filters)
+    if sort_by == 'Key':
+        df = df.assign(sort_key=df['Key'].str.extract('(\\d+)', expand=False).astype(int))
+        df = df.sort_values('sort_key', ascending=ascending, kind='stable').drop(columns='sort_key')
+    elif sort_by == 'Account':
+        # Mixed ints and strings cannot be sorted by pandas; only the ticket count is compared
+        df = None
+    elif sort_by:
+        df = df.sort_values(sort_by, ascending=ascending, kind='stable')
+    page, total = store.page(sort_by, ascending, offset, limit, **filters)
+    assert total == len(_filter(csv_tickets, **filters))
+    if df is not None:
+        _assert_same_tickets(page, df.iloc[offset:offset + limit])
+
+
+ENDPOINT_URLS = [
+    '/api/tickets?page=1&size=25',
+    '/api/tickets?page=2&size=20&sort_by=AppCode&sort_order=asc',
+    '/api/tickets?page=3&size=20&sort_by=AppCode&sort_order=desc',
+    '/api/tickets?page=1&size=30&sort_by=Priority&sort_order=asc&year=2024',
+    '/api/tickets?page=2&size=30&sort_by=tResolved&sort_order=desc',
+    '/api/tickets?page=1&size=50&sort_by=Key&sort_order=asc&global_environment=PROD',
+    '/api/tickets?page=1&size=50&sort_by=Environment&sort_order=asc&global_environment=Non%20Prod&global_narrow_environment=Dev',
+    '/api/tickets?Summary=(warn)&sort_by=Key&sort_order=desc',
+    '/api/tickets?Summary=a.b',
+    '/api/tickets?Summary=warn%7Cerror&CSP=aws',
+    '/api/tickets?Summary=%5EDisk',
+    '/api/tickets?Summary=%5Bxy%5Dz',
+    '/api/tickets?Summary=95%25',
+    '/api/tickets?Summary=under_score',
+    '/api/tickets?Account=unk',
+    '/api/tickets?Account=12&AppCode=app',
+    '/api/tickets-filter-options',
+    '/api/tickets-facets',
+    '/api/tickets-facets?year=2025&Summary=(warn)',
+    '/api/tickets-facets?Summary=a.b%7Cdisk&environment=PROD',
+    '/api/environment-summary',
+    '/api/environment-summary?year=2024',
+    '/api/environment-summary?year=2025&environment=Non%20Prod',
+    '/api/environment-summary?environment=All&narrow_environment=Dev',
+    '/api/reports/heatmap?year=2024&csp=AWS',
+    '/api/reports/heatmap?year=2025&csp=GCP&environment=PROD',
+    '/api/reports/heatmap?year=2024&csp=AWS&encoding=coo&top_app_codes=2',
+    '/api/reports/control-count-by-appcode?year=2025&csp=AWS',
+    '/api/reports/ticket-count-by-appcode?year=2024&csp=AWS',
+    '/api/reports/total-ticket-count-by-appcode?year=2025&csp=GCP',
+]
+
+
+@pytest.fixture(scope="module")
+def engine_responses(data_dir):
+    """The JSON each engine returns for ENDPOINT_URLS, loading the fixture data the way startup does."""
+    cwd = os.getcwd()
+    saved = {name: getattr(main, name) for name in ['TICKET_STORE', 'TICKET_DB_PATH', 'TICKET_PARTITION_DIR', 'tickets_df', 'ticket_store', 'ticket_db']}
+    responses = {}
+    os.chdir(data_dir)
+    try:
+        for engine in ENGINES:
+            main.TICKET_STORE = engine
+            main.TICKET_DB_PATH = str(data_dir / 'tickets.db')
+            main.TICKET_PARTITION_DIR = str(data_dir / 'ticket_partitions')
+            main.tickets_df = main.ticket_store = main.ticket_db = None
+            main.load_data()
+            main.data_ready.set()
+            client = TestClient(main.app)
+            responses[engine] = {}
+            for url in ENDPOINT_URLS:
+                response = client.get(url)
+                assert response.status_code == 200, (engine, url, response.text)
+                responses[engine][url] = response.json()
+    finally:
+        os.chdir(cwd)
+        for name, value in saved.items():
+            setattr(main, name, value)
+        # Cached results came from the fixture data
+        query_cache.invalidate()
+    return responses
+
+
+@pytest.mark.parametrize("engine", ['partitioned', 'sqlite'])
+@pytest.mark.parametrize("url", ENDPOINT_URLS)
+def test_endpoint_matches_csv(engine_responses, engine, url):
+    assert json.dumps(engine_responses[engine][url], sort_keys=True) == json.dumps(engine_responses['csv'][url], sort_keys=True)
+
+
+def test_metacharacter_filters_are_regexes(engine_responses):
+    # '(warn)' is a group matching "warn", not the literal parentheses
+    tickets = engine_responses['sqlite']['/api/tickets?Summary=(warn)&sort_by=Key&sort_order=desc']['tickets']
+    assert {t['Summary'] for t in tickets} == {'Disk 95% full (warn)', 'CPU (warn) high', 'Under_score warning'}
+    # '.' matches any character
+    summaries = {t['Summary'] for t in engine_responses['sqlite']['/api/tickets?Summary=a.b']['tickets']}
+    assert summaries == {'a.b|c [xz] error'}
+    assert engine_responses['sqlite']['/api/tickets?Summary=under_score']['total_count'] == \
+        engine_responses['csv']['/api/tickets?Summary=under_score']['total_count']
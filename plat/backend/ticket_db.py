@@ -0,0 +1,251 @@
+import os
+import re
+import sqlite3
+import functools
+import logging
+import threading
+from typing import Optional, List, Dict, Tuple, Any
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TICKET_COLUMNS = [
+    'CSP', 'Environment', 'NarrowEnvironment', 'AlertType', 'Priority', 'Key', 'AppCode',
+    'ConfigRule', 'Summary', 'Account', 'tCreated', 'tResolved', 'TimeToResolve'
+]
+
+# Derived grouping keys, precomputed per row at build time so they are formatted exactly as pandas formats them
+DERIVED_COLUMNS = {
+    'Month': 'ym',            # tCreated '%Y-%m'
+    'MonthName': 'month_name',  # tCreated '%b'
+    'Day': 'day',             # tCreated '%Y-%m-%d'
+}
+
+# Sorting on timestamps uses the integer epoch columns rather than the ISO text
+SORT_COLUMNS = {'tCreated': 'created_ns', 'tResolved': 'resolved_ns'}
+
+INDEXES = [
+    ('idx_tickets_csp_year', ['CSP', 'year', 'Environment', 'NarrowEnvironment']),
+    ('idx_tickets_year', ['year', 'Environment', 'NarrowEnvironment']),
+    ('idx_tickets_csp_year_appcode', ['CSP', 'year', 'AppCode']),
+    ('idx_tickets_key_num', ['key_num']),
+]
+
+
+# Characters that make a column filter a regular expression rather than a plain substring
+_REGEX_METACHARACTERS = set('.^$*+?{}[]\\|()')
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(pattern: str) -> "re.Pattern":
+    return re.compile(pattern, re.IGNORECASE)
+
+
+def _regexp(pattern: str, value: Any) -> bool:
+    """SQLite REGEXP with the semantics of Series.str.contains(pattern, case=False, na=False)."""
+    return isinstance(value, str) and _compile(pattern).search(value) is not None
+
+
+def _quote(column: str) -> str:
+    return f'"{column}"'
+
+
+def _python_values(values: pd.Series) -> List[Any]:
+    """Converts a column to plain Python values so sqlite keeps ints as ints and text as text."""
+    values = values.astype(object).where(values.notna(), None)
+    return [v.item() if isinstance(v, np.generic) else v for v in values]
+
+
+def build_database(df: pd.DataFrame, db_path: str):
+    """
+    Writes prepared tickets (as loaded by the CSV path, in the same row order) to a SQLite file.
+    Columns are declared without a type so each value keeps the storage class it was inserted with,
+    e.g. numeric AWS accounts stay integers next to 'Unknown' GCP accounts, just like the pandas frame.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    created = df['tCreated']
+    resolved = df['tResolved']
+    columns = {
+        'row_id': list(range(len(df))),
+        **{col: _python_values(df[col]) for col in TICKET_COLUMNS if col not in ('tCreated', 'tResolved')},
+        'tCreated': [ts.isoformat() for ts in created],
+        'tResolved': [ts.isoformat() if pd.notna(ts) else None for ts in resolved],
+        'created_ns': [ts.value for ts in created],
+        'resolved_ns': [ts.value if pd.notna(ts) else None for ts in resolved],
+        'year': _python_values(created.dt.year),
+        'month': _python_values(created.dt.month),
+        'ym': _python_values(created.dt.strftime('%Y-%m')),
+        'month_name': _python_values(created.dt.strftime('%b')),
+        'day': _python_values(created.dt.strftime('%Y-%m-%d')),
+        'key_num': _python_values(df['Key'].str.extract('(\\d+)')[0].astype(float).astype('Int64')),
+    }
+    names = list(columns)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(f"CREATE TABLE tickets ({', '.join(_quote(n) for n in names)})")
+        conn.executemany(
+            f"INSERT INTO tickets VALUES ({', '.join('?' for _ in names)})",
+            zip(*columns.values()),
+        )
+        for name, index_columns in INDEXES:
+            conn.execute(f"CREATE INDEX {name} ON tickets ({', '.join(_quote(c) for c in index_columns)})")
+        conn.execute("ANALYZE")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class SQLiteTicketStore:
+    """
+    Serves ticket queries from a local SQLite file so filters, group counts and sorted pages run inside
+    the database and only the (small) results are materialized in pandas.
+    """
+
+    def __init__(self, db_path: str):
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite connections cannot be shared across threads, so each worker thread opens its own read-only one
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.create_function('regexp', 2, _regexp, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql: str, params: List[Any]) -> Tuple[List[str], List[tuple]]:
+        cursor = self._conn().execute(sql, params)
+        return [d[0] for d in cursor.description], cursor.fetchall()
+
+    @staticmethod
+    def _where(
+        year: Optional[int] = None,
+        environment: Optional[str] = None,
+        narrow_environment: Optional[str] = None,
+        csp: Optional[str] = None,
+        app_codes: Optional[List[str]] = None,
+        month: Optional[int] = None,
+        contains: Optional[Dict[str, str]] = None,
+    ) -> Tuple[List[str], List[Any]]:
+        clauses, params = [], []
+        if year:
+            clauses.append('year = ?')
+            params.append(year)
+        if csp:
+            clauses.append('"CSP" = ?')
+            params.append(csp)
+        if environment and environment != 'All':
+            clauses.append('"Environment" = ?')
+            params.append(environment)
+        if narrow_environment and narrow_environment != 'All':
+            clauses.append('"NarrowEnvironment" = ?')
+            params.append(narrow_environment)
+        if app_codes is not None:
+            clauses.append(f'"AppCode" IN ({", ".join("?" for _ in app_codes)})')
+            params.extend(app_codes)
+        if month:
+            clauses.append('month = ?')
+            params.append(month)
+        for column, value in (contains or {}).items():
+            # Mirrors Series.str.contains(case=False, na=False): a case-insensitive regex that only text values can match
+            if value.isascii() and not _REGEX_METACHARACTERS.intersection(value):
+                # A plain ASCII substring; LIKE is case-insensitive for ASCII and avoids a Python call per row
+                escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                clauses.append(f"typeof({_quote(column)}) = 'text' AND {_quote(column)} LIKE ? ESCAPE '\\'")
+                params.append(f'%{escaped}%')
+            else:
+                _compile(value)  # an invalid pattern raises re.error, as it does with pandas
+                clauses.append(f"{_quote(column)} REGEXP ?")
+                params.append(value)
+        return clauses, params
+
+    @staticmethod
+    def _frame(columns: List[str], rows: List[tuple]) -> pd.DataFrame:
+        df = pd.DataFrame.from_records(rows, columns=columns)
+        if 'tCreated' in df.columns:
+            df['tCreated'] = pd.to_datetime(df['tCreated'])
+        if 'tResolved' in df.columns:
+            df['tResolved'] = pd.to_datetime(df['tResolved'], errors='coerce')
+        return df
+
+    @property
+    def years(self) -> List[int]:
+        _, rows = self._query("SELECT DISTINCT year FROM tickets ORDER BY year", [])
+        return [row[0] for row in rows]
+
+    def frame(self, **filters) -> pd.DataFrame:
+        """Returns the matching tickets, in source order, as a frame shaped like the CSV-loaded one."""
+        clauses, params = self._where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        columns, rows = self._query(
+            f"SELECT {', '.join(_quote(c) for c in TICKET_COLUMNS)} FROM tickets {where} ORDER BY row_id", params
+        )
+        return self._frame(columns, rows)
+
+    def count(self, by: List[str], fillna: Optional[Dict[str, str]] = None, **filters) -> pd.DataFrame:
+        """
+        Equivalent of `df.groupby(by).size().reset_index(name='count')`: rows with a missing key are
+        dropped unless the key has a fill value, and groups come back sorted by key.
+        """
+        fillna = fillna or {}
+        clauses, params = self._where(**filters)
+        select, select_params = [], []
+        for column in by:
+            source = _quote(DERIVED_COLUMNS.get(column, column))
+            if column in fillna:
+                select.append(f"COALESCE({source}, ?) AS {_quote(column)}")
+                select_params.append(fillna[column])
+            else:
+                select.append(f"{source} AS {_quote(column)}")
+                clauses.append(f"{source} IS NOT NULL")
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        # Positional references, so a COALESCE alias never resolves to the raw column of the same name
+        group = ', '.join(str(i + 1) for i in range(len(by)))
+        columns, rows = self._query(
+            f"SELECT {', '.join(select)}, COUNT(*) AS count FROM tickets {where} GROUP BY {group} ORDER BY {group}",
+            select_params + params,
+        )
+        counts = pd.DataFrame.from_records(rows, columns=columns)
+        counts['count'] = counts['count'].astype('int64')
+        return counts
+
+    def page(
+        self,
+        sort_by: Optional[str],
+        ascending: bool,
+        offset: int,
+        limit: int,
+        **filters,
+    ) -> Tuple[pd.DataFrame, int]:
+        """Returns one sorted page of matching tickets and the total number of matches."""
+        clauses, params = self._where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        _, rows = self._query(f"SELECT COUNT(*) FROM tickets {where}", params)
+        total = rows[0][0]
+        # Resolve the window exactly as DataFrame.iloc[offset:offset + limit] would, including negative offsets
+        start, stop, _ = slice(offset, offset + limit).indices(total)
+
+        direction = 'ASC' if ascending else 'DESC'
+        if sort_by == 'Key':
+            order = f"key_num {direction}, row_id"
+        elif sort_by in TICKET_COLUMNS:
+            # Stable sort with missing values last, as in DataFrame.sort_values(kind='stable')
+            column = _quote(SORT_COLUMNS.get(sort_by, sort_by))
+            order = f"{column} IS NULL, {column} {direction}, row_id"
+        else:
+            order = "row_id"
+
+        columns, rows = self._query(
+            f"SELECT {', '.join(_quote(c) for c in TICKET_COLUMNS)} FROM tickets {where} "
+            f"ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [max(stop - start, 0), start],
+        )
+        return self._frame(columns, rows), total
@@ -0,0 +1,174 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Tuple, Iterable
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Partition layout: <root>/CSP=<csp>/year=<yyyy>/month=<mm>/part-0.parquet
+PartitionKey = Tuple[str, int]
+
+
+def prepare_tickets(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalizes raw ticket rows the same way regardless of where they were read from."""
+    df['tCreated'] = pd.to_datetime(df['tCreated'])
+    df['tResolved'] = pd.to_datetime(df['tResolved'], errors='coerce')
+    df['Priority'] = df['Priority'].fillna('unknown')
+    return df
+
+
+def write_partitions(df: pd.DataFrame, root: str) -> int:
+    """
+    Writes prepared tickets as one parquet file per CSP/year/month. Returns the number of files written.
+    The frame index is stored with each partition so reads can restore the source row order.
+    """
+    created = df['tCreated']
+    written = 0
+    for (csp, year, month), part in df.groupby(['CSP', created.dt.year, created.dt.month]):
+        part_dir = os.path.join(root, f'CSP={csp}', f'year={year}', f'month={month:02d}')
+        os.makedirs(part_dir, exist_ok=True)
+        part.to_parquet(os.path.join(part_dir, 'part-0.parquet'), index=True)
+        written += 1
+    return written
+
+
+def _partition_value(dirname: str, name: str) -> Optional[str]:
+    prefix = f'{name}='
+    return dirname[len(prefix):] if dirname.startswith(prefix) else None
+
+
+class PartitionedTicketStore:
+    """
+    Reads tickets from a CSP/year/month partitioned directory, touching only the partitions a query needs.
+    Loaded CSP/year partitions are kept in an LRU cache bounded by `memory_budget_bytes`; the most recent
+    `hot_years` per CSP are pinned in memory and never evicted.
+    """
+
+    def __init__(self, root: str, memory_budget_bytes: int = 512 * 1024 * 1024, hot_years: int = 1):
+        self.root = root
+        self.memory_budget_bytes = memory_budget_bytes
+        self.hot_years = hot_years
+        self._files: Dict[PartitionKey, List[str]] = self._discover()
+        self._cache: "OrderedDict[PartitionKey, pd.DataFrame]" = OrderedDict()
+        self._sizes: Dict[PartitionKey, int] = {}
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _discover(self) -> Dict[PartitionKey, List[str]]:
+        files: Dict[PartitionKey, List[str]] = {}
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(self.root)
+        for csp_dir in sorted(os.listdir(self.root)):
+            csp = _partition_value(csp_dir, 'CSP')
+            if csp is None:
+                continue
+            for year_dir in sorted(os.listdir(os.path.join(self.root, csp_dir))):
+                year = _partition_value(year_dir, 'year')
+                if year is None:
+                    continue
+                year_path = os.path.join(self.root, csp_dir, year_dir)
+                paths = []
+                for month_dir in sorted(os.listdir(year_path)):
+                    month_path = os.path.join(year_path, month_dir)
+                    if _partition_value(month_dir, 'month') is None:
+                        continue
+                    paths.extend(os.path.join(month_path, f) for f in sorted(os.listdir(month_path)) if f.endswith('.parquet'))
+                if paths:
+                    files[(csp, int(year))] = paths
+        return files
+
+    @property
+    def csps(self) -> List[str]:
+        return sorted({csp for csp, _ in self._files})
+
+    @property
+    def years(self) -> List[int]:
+        return sorted({year for _, year in self._files})
+
+    def warm(self):
+        """Loads and pins the most recent `hot_years` of every CSP."""
+        for csp in self.csps:
+            csp_years = sorted(year for c, year in self._files if c == csp)
+            for year in csp_years[-self.hot_years:] if self.hot_years > 0 else []:
+                self._pinned.add((csp, year))
+                self._get((csp, year))
+
+    def load(self, csps: Optional[Iterable[str]] = None, years: Optional[Iterable[int]] = None) -> pd.DataFrame:
+        """
+        Returns the tickets for the given CSPs and years (all of them when None).
+        The returned frame may share memory with the cache; callers must copy before mutating.
+        """
+        csps = set(csps) if csps is not None else None
+        years = set(years) if years is not None else None
+        keys = [
+            key for key in self._files
+            if (csps is None or key[0] in csps) and (years is None or key[1] in years)
+        ]
+        if not keys:
+            return self._empty()
+
+        # Rows come back in source order: CSPs in sorted order, each CSP in its original file order
+        frames = []
+        for csp in sorted({key[0] for key in keys}):
+            csp_frames = [self._get(key) for key in sorted(keys) if key[0] == csp]
+            frames.append(csp_frames[0] if len(csp_frames) == 1 else pd.concat(csp_frames).sort_index())
+        if len(frames) == 1:
+            return frames[0]
+        return pd.concat(frames, ignore_index=True)
+
+    def _empty(self) -> pd.DataFrame:
+        """An empty frame with the ticket columns, so filters on a year with no partitions still work."""
+        if not self._files:
+            return pd.DataFrame()
+        first = next(iter(self._files.values()))[0]
+        return prepare_tickets(pd.read_parquet(first).iloc[:0])
+
+    def _get(self, key: PartitionKey) -> pd.DataFrame:
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        df = pd.concat([pd.read_parquet(path) for path in self._files[key]]).sort_index()
+        df = prepare_tickets(df)
+        size = int(df.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self.loads += 1
+            self._cache[key] = df
+            self._sizes[key] = size
+            self._evict(keep=key)
+        logger.info(f"Loaded ticket partition {key[0]}/{key[1]} ({len(df)} rows, {size / 1e6:.1f} MB)")
+        return df
+
+    def _evict(self, keep: PartitionKey):
+        for key in list(self._cache):
+            if self.memory_bytes <= self.memory_budget_bytes:
+                break
+            if key == keep or key in self._pinned:
+                continue
+            del self._cache[key]
+            del self._sizes[key]
+            self.evictions += 1
+            logger.info(f"Evicted ticket partition {key[0]}/{key[1]} from memory")
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "partitions": len(self._files),
+                "cached": [f"{csp}/{year}" for csp, year in self._cache],
+                "pinned": [f"{csp}/{year}" for csp, year in sorted(self._pinned)],
+                "memory_bytes": self.memory_bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }